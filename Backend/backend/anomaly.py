@@ -1,46 +1,132 @@
 from __future__ import annotations
 
 from math import sqrt
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 import models
+from anomaly_detectors import score_runs, score_window, window_stats
 
+try:
+    import numpy as np
 
-def detect_daily_anomalies(
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+def _first_month_key(month: str, months: int) -> int:
+    """
+    month_key of the first month in the `months`-month window ending at
+    `month`; 0 for a malformed month, like models.month_key.
+    """
+    last = models.month_key(month)
+    if last == 0:
+        return 0
+    index = (last // 100) * 12 + last % 100 - 1 - (months - 1)
+    return (index // 12) * 100 + index % 12 + 1
+
+
+def _daily_expense_rows(
     db: Session,
     user_id: int,
     month: str,
-    z_threshold: float = 2.0,
-) -> Dict:
+    category_name: str | None = None,
+    baseline_months: int = 1,
+):
     """
-    Detect anomalous daily spending for a given user and month using Z-score.
-
-    Steps:
-      1. Aggregate total expense per day.
-      2. Compute mean and standard deviation of daily totals.
-      3. Mark a day as anomaly if |z_score| >= z_threshold.
+    Daily expense totals for (user, month) from daily_rollups, oldest first;
+    with baseline_months > 1, for the trailing window of that many months
+    ending at `month`. Rows expose .date and .total_amount. Touches at most
+    days x categories rollup rows, however many transactions the user logged.
     """
-
-    # 1) Aggregate daily totals (expense only)
-    daily_rows = (
+    last_key = models.month_key(month)
+    first_key = _first_month_key(month, baseline_months) if baseline_months > 1 else last_key
+    q = (
         db.query(
-            models.Transaction.transaction_date.label("date"),
-            func.sum(models.Transaction.amount).label("total_amount"),
+            models.DailyRollup.transaction_date.label("date"),
+            func.sum(models.DailyRollup.total_amount).label("total_amount"),
         )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
+        .join(models.Category, models.DailyRollup.category_id == models.Category.id)
+        .filter(models.DailyRollup.user_id == user_id)
+        .filter(models.DailyRollup.month_key.between(first_key, last_key))
         .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .group_by(models.Transaction.transaction_date)
-        .order_by(models.Transaction.transaction_date.asc())
+    )
+    if category_name is not None:
+        q = q.filter(models.Category.name == category_name)
+    return (
+        q.group_by(models.DailyRollup.transaction_date)
+        .order_by(models.DailyRollup.transaction_date.asc())
         .all()
     )
 
-    if not daily_rows:
-        # no data for that user/month
+
+def detect_daily_anomalies_windowed(
+    db: Session,
+    user_id: int,
+    month: str,
+    z_threshold: float = 2.0,
+    method: str = "zscore",
+    baseline_months: int = 1,
+) -> Dict:
+    """
+    Score the month's daily expense totals against every daily total in
+    the trailing `baseline_months` with one of anomaly_detectors.DETECTORS
+    (zscore, mad, iqr, ewma). Each point's z_score is that method's score;
+    mean/std describe the whole baseline window.
+    """
+    rows = _daily_expense_rows(db, user_id, month, baseline_months=baseline_months)
+    result = {
+        "user_id": user_id,
+        "month": month,
+        "mean": 0.0,
+        "std": 0.0,
+        "z_threshold": z_threshold,
+        "method": method,
+        "baseline_months": baseline_months,
+        "baseline_days": len(rows),
+        "points": [],
+    }
+    if not rows:
+        return result
+
+    totals = [float(row.total_amount) for row in rows]
+    scored = score_window(totals, method, z_threshold)
+    result["mean"], result["std"] = window_stats(totals)
+    result["lower_limit"] = scored["lower_limit"]
+    result["upper_limit"] = scored["upper_limit"]
+
+    scores, ewma = scored["scores"], scored["ewma"]
+    for i, row in enumerate(rows):
+        if not row.date.startswith(month):
+            continue  # baseline only
+        z = float(scores[i])
+        point = {
+            "date": row.date,
+            "total_amount": totals[i],
+            "z_score": z,
+            "is_anomaly": abs(z) >= z_threshold,
+        }
+        if ewma is not None:
+            point["ewma"] = float(ewma[i])
+        result["points"].append(point)
+    return result
+
+
+def _mean_std(values: List[float]) -> Tuple[float, float]:
+    """Mean and sample std (0 for a single value)."""
+    n = len(values)
+    mean = sum(values) / n
+    if n > 1:
+        return mean, sqrt(sum((x - mean) ** 2 for x in values) / (n - 1))
+    return mean, 0.0
+
+
+def _daily_points(user_id: int, month: str, z_threshold: float, day_totals: Dict[str, float]) -> Dict:
+    """detect_daily_anomalies' result for {date: total} (in date order)."""
+    if not day_totals:
         return {
             "user_id": user_id,
             "month": month,
@@ -49,38 +135,13 @@ def detect_daily_anomalies(
             "z_threshold": z_threshold,
             "points": [],
         }
-
-    totals = [float(row.total_amount) for row in daily_rows]
-    n = len(totals)
-
-    # 2) Compute mean
-    mean = sum(totals) / n
-
-    # 3) Compute standard deviation (sample std if n > 1)
-    if n > 1:
-        var = sum((x - mean) ** 2 for x in totals) / (n - 1)
-        std = sqrt(var)
-    else:
-        std = 0.0
-
-    points: List[Dict] = []
-    for row in daily_rows:
-        total = float(row.total_amount)
-        if std > 0:
-            z = (total - mean) / std
-        else:
-            z = 0.0  # if all days same, no anomalies
-
-        is_anomaly = abs(z) >= z_threshold
+    mean, std = _mean_std(list(day_totals.values()))
+    points = []
+    for date, total in day_totals.items():
+        z = (total - mean) / std if std > 0 else 0.0
         points.append(
-            {
-                "date": row.date,
-                "total_amount": total,
-                "z_score": z,
-                "is_anomaly": is_anomaly,
-            }
+            {"date": date, "total_amount": total, "z_score": z, "is_anomaly": abs(z) >= z_threshold}
         )
-
     return {
         "user_id": user_id,
         "month": month,
@@ -90,157 +151,176 @@ def detect_daily_anomalies(
         "points": points,
     }
 
-def detect_daily_anomalies_by_category(
-    db: Session,
-    user_id: int,
-    month: str,
-    category_name: str,
-    z_threshold: float = 2.0,
-) -> Dict:
-    """
-    Same as detect_daily_anomalies, but restricted to a single category (e.g. 'Food').
-    Uses exact match on Category.name (you can change to ilike for fuzzy).
-    """
-    daily_rows = (
-        db.query(
-            models.Transaction.transaction_date.label("date"),
-            func.sum(models.Transaction.amount).label("total_amount"),
-        )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(models.Category.name == category_name)
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .group_by(models.Transaction.transaction_date)
-        .order_by(models.Transaction.transaction_date.asc())
-        .all()
-    )
 
-    if not daily_rows:
+def _plot_series(user_id: int, month: str, bands_sigma: float, day_totals: Dict[str, float]) -> Dict:
+    """build_daily_plot_series' result for {date: total} (in date order)."""
+    if not day_totals:
         return {
             "user_id": user_id,
             "month": month,
             "mean": 0.0,
             "std": 0.0,
-            "z_threshold": z_threshold,
+            "upper_band": 0.0,
+            "lower_band": 0.0,
             "points": [],
-            "scope": f"category={category_name}",
         }
-
-    totals = [float(row.total_amount) for row in daily_rows]
-    n = len(totals)
-    mean = sum(totals) / n
-    if n > 1:
-        var = sum((x - mean) ** 2 for x in totals) / (n - 1)
-        std = sqrt(var)
-    else:
-        std = 0.0
-
-    points: List[Dict] = []
-    for row in daily_rows:
-        total = float(row.total_amount)
-        if std > 0:
-            z = (total - mean) / std
-        else:
-            z = 0.0
-        is_anomaly = abs(z) >= z_threshold
-        points.append(
-            {
-                "date": row.date,
-                "total_amount": total,
-                "z_score": z,
-                "is_anomaly": is_anomaly,
-            }
-        )
-
+    mean, std = _mean_std(list(day_totals.values()))
     return {
         "user_id": user_id,
         "month": month,
         "mean": mean,
         "std": std,
-        "z_threshold": z_threshold,
-        "points": points,
-        "scope": f"category={category_name}",
+        "upper_band": mean + bands_sigma * std,
+        "lower_band": max(0.0, mean - bands_sigma * std),
+        "points": [{"date": date, "total_amount": total} for date, total in day_totals.items()],
     }
 
-def detect_transaction_anomalies(
+
+def detect_daily_anomalies(
     db: Session,
     user_id: int,
     month: str,
     z_threshold: float = 2.0,
+    method: str = "zscore",
+    baseline_months: int = 1,
 ) -> Dict:
     """
-    Detect anomalous individual transactions using Z-score on transaction amounts.
+    Detect anomalous daily spending for a given user and month using Z-score.
+
+    Steps:
+      1. Aggregate total expense per day.
+      2. Compute mean and standard deviation of daily totals.
+      3. Mark a day as anomaly if |z_score| >= z_threshold.
+
+    Any other method, or a longer baseline, goes through
+    detect_daily_anomalies_windowed (see anomaly_detectors.py).
     """
-    tx_rows = (
-        db.query(
-            models.Transaction.id,
-            models.Transaction.transaction_date,
-            models.Transaction.amount,
-            models.Transaction.description,
-            models.Category.name.label("category_name"),
+    if method != "zscore" or baseline_months > 1:
+        return detect_daily_anomalies_windowed(
+            db, user_id, month, z_threshold, method, baseline_months
         )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .order_by(models.Transaction.transaction_date.asc(), models.Transaction.id.asc())
-        .all()
+
+    # 1) Daily totals (expense only), from daily_rollups
+    daily_rows = _daily_expense_rows(db, user_id, month)
+    day_totals = {row.date: float(row.total_amount) for row in daily_rows}
+
+    # 2) + 3) mean / sample std of the month, z-score of every day
+    return _daily_points(user_id, month, z_threshold, day_totals)
+
+
+def detect_daily_anomalies_by_category(
+    db: Session,
+    user_id: int,
+    month: str,
+    category_name: str,
+    z_threshold: float = 2.0,
+) -> Dict:
+    """
+    Same as detect_daily_anomalies, but restricted to a single category (e.g. 'Food').
+    Uses exact match on Category.name (you can change to ilike for fuzzy).
+    """
+    daily_rows = _daily_expense_rows(db, user_id, month, category_name)
+    result = _daily_points(
+        user_id, month, z_threshold, {row.date: float(row.total_amount) for row in daily_rows}
     )
+    result["scope"] = f"category={category_name}"
+    return result
 
-    if not tx_rows:
-        return {
-            "user_id": user_id,
-            "month": month,
-            "mean": 0.0,
-            "std": 0.0,
-            "z_threshold": z_threshold,
-            "points": [],
-        }
 
-    amounts = [float(row.amount) for row in tx_rows]
-    n = len(amounts)
-    mean = sum(amounts) / n
-    if n > 1:
-        var = sum((x - mean) ** 2 for x in amounts) / (n - 1)
-        std = sqrt(var)
-    else:
-        std = 0.0
+def detect_daily_anomalies_all_categories(
+    db: Session,
+    user_id: int,
+    month: str,
+    z_threshold: float = 2.0,
+    top_k: int | None = None,
+) -> Dict:
+    """
+    detect_daily_anomalies_by_category for every expense category of the
+    month at once: one query grouped by (category, date) on daily_rollups,
+    z-scores for all categories in one vectorized pass (score_runs).
 
-    points: List[Dict] = []
-    for row in tx_rows:
-        amt = float(row.amount)
-        if std > 0:
-            z = (amt - mean) / std
-        else:
-            z = 0.0
-        is_anomaly = abs(z) >= z_threshold
-        points.append(
-            {
-                "id": row.id,
-                "date": row.transaction_date,
-                "amount": amt,
-                "description": row.description,
-                "category_name": row.category_name,
-                "z_score": z,
-                "is_anomaly": is_anomaly,
-            }
-        )
+    Returns {"categories": {name: {mean, std, max_abs_z, anomaly_count,
+    points}}, "top": [...]}, where "top" names the top_k categories with
+    the largest |z| (ties: more anomalous days first); empty without top_k.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("numpy is not installed; query categories one at a time.")
 
-    return {
+    rows = (
+        db.query(
+            models.Category.name,
+            models.DailyRollup.transaction_date,
+            func.sum(models.DailyRollup.total_amount),
+        )
+        .join(models.Category, models.DailyRollup.category_id == models.Category.id)
+        .filter(models.DailyRollup.user_id == user_id)
+        .filter(models.DailyRollup.month_key == models.month_key(month))
+        .filter(models.Category.type == "expense")
+        .group_by(models.Category.name, models.DailyRollup.transaction_date)
+        .order_by(models.Category.name.asc(), models.DailyRollup.transaction_date.asc())
+        .all()
+    )
+    result = {
         "user_id": user_id,
         "month": month,
-        "mean": mean,
-        "std": std,
         "z_threshold": z_threshold,
-        "points": points,
+        "categories": {},
+        "top": [],
     }
+    if not rows:
+        return result
+
+    names = [row[0] for row in rows]
+    totals = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    change = np.fromiter((a != b for a, b in zip(names, names[1:])), dtype=bool, count=len(rows) - 1)
+    mean, std, z, starts = score_runs(totals, change)
+    flagged = np.abs(z) >= z_threshold
+    max_abs_z = np.maximum.reduceat(np.abs(z), starts)
+    anomaly_count = np.add.reduceat(flagged.astype(np.int64), starts)
+
+    bounds = list(starts) + [len(rows)]
+    for g, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        result["categories"][names[lo]] = {
+            "mean": float(mean[lo]),
+            "std": float(std[lo]),
+            "max_abs_z": float(max_abs_z[g]),
+            "anomaly_count": int(anomaly_count[g]),
+            "points": [
+                {
+                    "date": rows[i][1],
+                    "total_amount": float(totals[i]),
+                    "z_score": float(z[i]),
+                    "is_anomaly": bool(flagged[i]),
+                }
+                for i in range(lo, hi)
+            ],
+        }
+
+    if top_k:
+        ranked = sorted(
+            result["categories"].items(),
+            key=lambda item: (-item[1]["max_abs_z"], -item[1]["anomaly_count"], item[0]),
+        )
+        result["top"] = [name for name, _ in ranked[:top_k]]
+    return result
 
 
+def detect_transaction_anomalies(
+    db: Session,
+    user_id: int,
+    month: str,
+    z_threshold: float = 2.0,
+) -> Dict:
     """
     Detect anomalous individual transactions using Z-score on transaction amounts.
     """
-    tx_rows = (
+    tx_rows = _month_expense_transactions(db, user_id, month)
+    return _transaction_points(user_id, month, z_threshold, tx_rows)
+
+
+def _month_expense_transactions(db: Session, user_id: int, month: str):
+    """The month's expense transactions with category names, oldest first."""
+    return (
         db.query(
             models.Transaction.id,
             models.Transaction.transaction_date,
@@ -251,11 +331,14 @@ def detect_transaction_anomalies(
         .join(models.Category, models.Transaction.category_id == models.Category.id)
         .filter(models.Transaction.user_id == user_id)
         .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
+        .filter(models.Transaction.month_key == models.month_key(month))
         .order_by(models.Transaction.transaction_date.asc(), models.Transaction.id.asc())
         .all()
     )
 
+
+def _transaction_points(user_id: int, month: str, z_threshold: float, tx_rows) -> Dict:
+    """Z-score every transaction amount against the month's mean/std."""
     if not tx_rows:
         return {
             "user_id": user_id,
@@ -266,18 +349,12 @@ def detect_transaction_anomalies(
             "points": [],
         }
 
-    amounts = [float(row.amount) for row in tx_rows]
-    n = len(amounts)
-    mean = sum(amounts) / n
-    if n > 1:
-        var = sum((x - mean) ** 2 for x in amounts) / (n - 1)
-        std = sqrt(var)
-    else:
-        std = 0.0
+    amounts = [float(row[2]) for row in tx_rows]
+    mean, std = _mean_std(amounts)
 
     points: List[Dict] = []
-    for row in tx_rows:
-        amt = float(row.amount)
+    # rows unpacked as tuples: named Row attribute access costs more than the maths here
+    for (tx_id, date, _, description, category_name), amt in zip(tx_rows, amounts):
         if std > 0:
             z = (amt - mean) / std
         else:
@@ -285,11 +362,11 @@ def detect_transaction_anomalies(
         is_anomaly = abs(z) >= z_threshold
         points.append(
             {
-                "id": row.id,
-                "date": row.transaction_date,
+                "id": tx_id,
+                "date": date,
                 "amount": amt,
-                "description": row.description,
-                "category_name": row.category_name,
+                "description": description,
+                "category_name": category_name,
                 "z_score": z,
                 "is_anomaly": is_anomaly,
             }
@@ -314,58 +391,52 @@ def build_daily_plot_series(
     Returns daily totals plus mean and upper/lower bands (mean ± kσ).
     Frontend / notebook can plot this easily.
     """
-    daily_rows = (
-        db.query(
-            models.Transaction.transaction_date.label("date"),
-            func.sum(models.Transaction.amount).label("total_amount"),
-        )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .group_by(models.Transaction.transaction_date)
-        .order_by(models.Transaction.transaction_date.asc())
-        .all()
+    daily_rows = _daily_expense_rows(db, user_id, month)
+    return _plot_series(
+        user_id, month, bands_sigma, {row.date: float(row.total_amount) for row in daily_rows}
     )
 
-    if not daily_rows:
-        return {
-            "user_id": user_id,
-            "month": month,
-            "mean": 0.0,
-            "std": 0.0,
-            "upper_band": 0.0,
-            "lower_band": 0.0,
-            "points": [],
-        }
-
-    totals = [float(row.total_amount) for row in daily_rows]
-    n = len(totals)
-    mean = sum(totals) / n
-    if n > 1:
-        var = sum((x - mean) ** 2 for x in totals) / (n - 1)
-        std = sqrt(var)
-    else:
-        std = 0.0
-
-    upper = mean + bands_sigma * std
-    lower = max(0.0, mean - bands_sigma * std)
 
-    points = [
-        {"date": row.date, "total_amount": float(row.total_amount)}
-        for row in daily_rows
-    ]
+def build_anomaly_report(
+    db: Session,
+    user_id: int,
+    month: str,
+    z_threshold: float = 2.0,
+) -> Dict:
+    """
+    Everything the anomaly page shows, from one fetch of the month's
+    expense transactions: the results of detect_daily_anomalies,
+    detect_transaction_anomalies and build_daily_plot_series (bands at
+    z_threshold sigma), plus detect_daily_anomalies_by_category for every
+    category that has spending, keyed by category name.
+    """
+    tx_rows = _month_expense_transactions(db, user_id, month)
+
+    day_totals: Dict[str, float] = {}
+    category_days: Dict[str, Dict[str, float]] = {}
+    for _, date, amount, _, category_name in tx_rows:  # date order, so every dict below is too
+        amount = float(amount)
+        day_totals[date] = day_totals.get(date, 0.0) + amount
+        days = category_days.setdefault(category_name, {})
+        days[date] = days.get(date, 0.0) + amount
+
+    daily = _daily_points(user_id, month, z_threshold, day_totals)
+    by_category = {}
+    for name in sorted(category_days):
+        by_category[name] = _daily_points(user_id, month, z_threshold, category_days[name])
+        by_category[name]["scope"] = f"category={name}"
 
     return {
         "user_id": user_id,
         "month": month,
-        "mean": mean,
-        "std": std,
-        "upper_band": upper,
-        "lower_band": lower,
-        "points": points,
+        "z_threshold": z_threshold,
+        "daily": daily,
+        "transactions": _transaction_points(user_id, month, z_threshold, tx_rows),
+        "by_category": by_category,
+        "plot": _plot_series(user_id, month, z_threshold, day_totals),
     }
 
+
 def explain_anomalous_date(
     db: Session,
     user_id: int,
@@ -0,0 +1,177 @@
+"""
+Batch anomaly sweep: daily z-scores for every user and month in one pass.
+
+detect_daily_anomalies() scores one (user, month) at a time, so a nightly
+sweep over all users used to issue one query per pair and do the
+arithmetic in Python loops. Here a single query streams the daily expense
+totals of all users in a month range from daily_rollups, in primary-key
+order (user, month, day), so every (user, month) group arrives as one
+contiguous run. Rows are read in chunks of SWEEP_CHUNK_ROWS; each chunk is
+scored with NumPy segment reductions (np.add.reduceat over the group
+boundaries) and its flagged days are written to the anomalies table. A
+group cut off at the end of a chunk is carried over to the next one, so
+memory stays bounded by the chunk size however many transactions there are.
+
+Scores match detect_daily_anomalies(): the month's mean, sample std
+(n - 1), z = 0 when the std is 0, flagged when |z| >= z_threshold.
+
+    python anomaly_batch.py 2025-01 2025-12 [z_threshold]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.orm import Session
+
+import models
+from anomaly_detectors import score_runs
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+SWEEP_CHUNK_ROWS = int(os.environ.get("SWEEP_CHUNK_ROWS", 100_000))
+
+DETECTOR = "daily_zscore"
+
+DAILY_TOTALS_ALL_USERS = """
+    SELECT d.user_id, d.month_key, d.transaction_date, SUM(d.total_amount) AS total_amount
+    FROM daily_rollups d
+    JOIN categories c ON c.id = d.category_id
+    WHERE d.month_key BETWEEN :k0 AND :k1 AND c.type = 'expense'
+    GROUP BY d.user_id, d.month_key, d.transaction_date
+    ORDER BY d.user_id, d.month_key, d.transaction_date
+"""
+
+
+def score_groups(users, month_keys, totals) -> tuple:
+    """
+    Per-row (mean, std, z) of `totals` within each run of equal
+    (user, month_key); the arrays must be sorted by those two columns.
+    Returns (mean, std, z, number of groups), each array row-aligned.
+    """
+    change = (users[1:] != users[:-1]) | (month_keys[1:] != month_keys[:-1])
+    mean_rows, std_rows, z, starts = score_runs(totals, change)
+    return mean_rows, std_rows, z, len(starts)
+
+
+def _flush(conn, rows: List[tuple], z_threshold: float, detected_at: str) -> tuple:
+    """Score complete groups, insert the flagged days. Returns (groups, flagged)."""
+    users = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    keys = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    totals = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+
+    mean, std, z, groups = score_groups(users, keys, totals)
+    flagged = np.flatnonzero(np.abs(z) >= z_threshold)
+    if len(flagged):
+        conn.execute(
+            insert(models.Anomaly.__table__),
+            [
+                {
+                    "user_id": int(users[i]),
+                    "detector": DETECTOR,
+                    "month_key": int(keys[i]),
+                    "anomaly_date": rows[i][2],
+                    "total_amount": float(totals[i]),
+                    "mean": float(mean[i]),
+                    "std": float(std[i]),
+                    "z_score": float(z[i]),
+                    "z_threshold": z_threshold,
+                    "detected_at": detected_at,
+                }
+                for i in flagged
+            ],
+        )
+    return groups, len(flagged)
+
+
+def sweep_daily_anomalies(
+    db: Session,
+    month_from: str,
+    month_to: str,
+    z_threshold: float = 2.0,
+    chunk_rows: int = SWEEP_CHUNK_ROWS,
+) -> Dict:
+    """
+    Score every user's daily expense totals for months month_from..month_to
+    (YYYY-MM, inclusive) and replace the sweep's rows in `anomalies` for
+    those months, in one DB transaction.
+
+    Returns {"month_from", "month_to", "days", "groups", "flagged", "seconds"}.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("numpy is not installed; cannot run the anomaly sweep.")
+
+    start = time.perf_counter()
+    k0, k1 = models.month_key(month_from), models.month_key(month_to)
+    detected_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    conn = db.connection()
+
+    conn.execute(
+        delete(models.Anomaly.__table__)
+        .where(models.Anomaly.detector == DETECTOR)
+        .where(models.Anomaly.month_key.between(k0, k1))
+    )
+
+    days = groups = flagged = 0
+    carry: List[tuple] = []
+    result = conn.execution_options(stream_results=True).execute(
+        text(DAILY_TOTALS_ALL_USERS), {"k0": k0, "k1": k1}
+    )
+    for part in result.partitions(chunk_rows):
+        rows = carry + list(part)
+        # the last (user, month) may continue in the next chunk
+        cut = len(rows)
+        last = rows[-1][:2]
+        while cut and rows[cut - 1][:2] == last:
+            cut -= 1
+        carry = rows[cut:]
+        if cut:
+            g, f = _flush(conn, rows[:cut], z_threshold, detected_at)
+            days, groups, flagged = days + cut, groups + g, flagged + f
+    if carry:
+        g, f = _flush(conn, carry, z_threshold, detected_at)
+        days, groups, flagged = days + len(carry), groups + g, flagged + f
+
+    db.commit()
+    return {
+        "month_from": month_from,
+        "month_to": month_to,
+        "days": days,
+        "groups": groups,
+        "flagged": flagged,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    from db import SessionLocal, engine, Base
+    from migrate import run_migrations
+
+    if len(sys.argv) < 3:
+        print("usage: python anomaly_batch.py MONTH_FROM MONTH_TO [z_threshold]")
+        sys.exit(2)
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+    session = SessionLocal()
+    try:
+        stats = sweep_daily_anomalies(session, sys.argv[1], sys.argv[2], threshold)
+        print(
+            f"Scored {stats['days']} days in {stats['groups']} user-months "
+            f"({stats['month_from']}..{stats['month_to']}), flagged {stats['flagged']} "
+            f"in {stats['seconds']:.1f}s."
+        )
+    finally:
+        session.close()
@@ -0,0 +1,181 @@
+"""
+Robust scoring of daily expense totals over a trailing baseline window.
+
+detect_daily_anomalies() with the default method ("zscore" over the
+queried month) judges each day against the mean and std of that month
+alone: with two spending days the scores are meaningless, and a single
+large day inflates the std it is measured against. The detectors here
+score the queried month's days against a baseline of every daily total in
+the trailing `baseline_months` (the queried month included):
+
+  - zscore: (x - mean) / std of the window.
+  - mad:    modified z-score, (x - median) / (1.4826 * MAD). With MAD = 0
+            (over half the days identical) the scale falls back to
+            1.2533 * mean absolute deviation from the median.
+  - iqr:    Tukey fences. The score is the distance beyond Q1 / Q3 in
+            IQR units (0 inside the box), so z_threshold plays the part
+            of the usual k = 1.5 multiplier.
+  - ewma:   EWMA control chart (lambda EWMA_LAMBDA, 0.3) run through the
+            window in date order, centred on the median with the robust
+            scale above. The score is the EWMA's distance from the centre
+            in units of its own (time-varying) std, so a run of high days
+            is flagged even when no single day stands out.
+
+Each detector works on the whole window with NumPy array operations
+(partition-based medians and percentiles, the EWMA as one convolution),
+so a 24-month baseline costs about as much as the query that loads it.
+As elsewhere in anomaly.py, a zero scale gives score 0.
+
+score_runs() applies the plain z-score to many series at once (every
+category of a month, every user-month of the batch sweep) with segment
+reductions over one sorted array.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Callable, Dict
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+EWMA_LAMBDA = float(os.environ.get("EWMA_LAMBDA", 0.3))
+
+# EWMA weights below this are dropped from the convolution kernel
+_EWMA_TAIL = 1e-12
+
+# MAD / mean absolute deviation -> std for normally distributed data
+_MAD_SCALE = 1.4826
+_MEAN_AD_SCALE = 1.2533
+
+
+def _ratio(num, den):
+    """num / den element-wise, 0 where den is 0."""
+    den = np.broadcast_to(np.asarray(den, dtype=np.float64), np.shape(num))
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+def _robust_scale(totals, center: float) -> float:
+    dev = np.abs(totals - center)
+    mad = float(np.median(dev))
+    if mad > 0:
+        return _MAD_SCALE * mad
+    return _MEAN_AD_SCALE * float(dev.mean())
+
+
+def score_zscore(totals, threshold: float) -> Dict:
+    mean = float(totals.mean())
+    std = float(totals.std(ddof=1)) if len(totals) > 1 else 0.0
+    return {
+        "scores": _ratio(totals - mean, std),
+        "lower_limit": mean - threshold * std,
+        "upper_limit": mean + threshold * std,
+    }
+
+
+def score_mad(totals, threshold: float) -> Dict:
+    center = float(np.median(totals))
+    scale = _robust_scale(totals, center)
+    return {
+        "scores": _ratio(totals - center, scale),
+        "lower_limit": center - threshold * scale,
+        "upper_limit": center + threshold * scale,
+    }
+
+
+def score_iqr(totals, threshold: float) -> Dict:
+    q1, q3 = (float(q) for q in np.percentile(totals, [25, 75]))
+    iqr = q3 - q1
+    beyond = np.where(totals > q3, totals - q3, np.where(totals < q1, totals - q1, 0.0))
+    return {
+        "scores": _ratio(beyond, iqr),
+        "lower_limit": q1 - threshold * iqr,
+        "upper_limit": q3 + threshold * iqr,
+    }
+
+
+def ewma_series(totals, start: float, lam: float = EWMA_LAMBDA):
+    """
+    e[i] = lam * x[i] + (1 - lam) * e[i - 1], with e[-1] = start, computed as
+    one convolution with the (truncated) kernel lam * (1 - lam)^k.
+    """
+    n = len(totals)
+    decay = 1.0 - lam
+    if decay <= 0:
+        return totals.astype(np.float64)
+    k = min(n, int(math.ceil(math.log(_EWMA_TAIL) / math.log(decay))) + 1)
+    kernel = lam * decay ** np.arange(k)
+    return np.convolve(totals, kernel)[:n] + start * decay ** np.arange(1, n + 1)
+
+
+def score_ewma(totals, threshold: float, lam: float = EWMA_LAMBDA) -> Dict:
+    center = float(np.median(totals))
+    scale = _robust_scale(totals, center)
+    ewma = ewma_series(totals, center, lam)
+    steps = np.arange(1, len(totals) + 1)
+    ewma_std = scale * np.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * steps)))
+    limit = threshold * scale * math.sqrt(lam / (2 - lam))
+    return {
+        "scores": _ratio(ewma - center, ewma_std),
+        "lower_limit": center - limit,
+        "upper_limit": center + limit,
+        "ewma": ewma,
+    }
+
+
+DETECTORS: Dict[str, Callable[..., Dict]] = {
+    "zscore": score_zscore,
+    "mad": score_mad,
+    "iqr": score_iqr,
+    "ewma": score_ewma,
+}
+
+
+def score_window(totals, method: str, threshold: float) -> Dict:
+    """
+    Score a window of daily totals (date order) with DETECTORS[method].
+
+    Returns {"scores": array, "lower_limit", "upper_limit", "ewma": array or
+    None}; limits are in daily-total units (for ewma they bound the EWMA,
+    at its steady-state width).
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("numpy is not installed; only the one-month zscore detector is available.")
+    if method not in DETECTORS:
+        raise ValueError(f"unknown anomaly method {method!r}; expected one of {sorted(DETECTORS)}")
+    result = DETECTORS[method](np.asarray(totals, dtype=np.float64), threshold)
+    result.setdefault("ewma", None)
+    return result
+
+
+def window_stats(totals) -> tuple:
+    """(mean, sample std) of a non-empty window."""
+    arr = np.asarray(totals, dtype=np.float64)
+    return float(arr.mean()), float(arr.std(ddof=1)) if len(arr) > 1 else 0.0
+
+
+def score_runs(totals, change) -> tuple:
+    """
+    Per-row (mean, std, z) of `totals` within each run of rows between
+    breaks, where change[i] is True when row i + 1 starts a new run
+    (len(totals) - 1 flags). Same maths as detect_daily_anomalies, one
+    segment reduction for all runs. Returns (mean, std, z, starts).
+    """
+    n = len(totals)
+    starts = np.concatenate(([0], np.flatnonzero(change) + 1))
+    counts = np.diff(np.append(starts, n))
+
+    means = np.add.reduceat(totals, starts) / counts
+    mean_rows = np.repeat(means, counts)
+    dev = totals - mean_rows
+    sq = np.add.reduceat(dev * dev, starts)
+    var = np.divide(sq, counts - 1, out=np.zeros_like(sq), where=counts > 1)
+    std_rows = np.repeat(np.sqrt(var), counts)
+    z = np.divide(dev, std_rows, out=np.zeros_like(dev), where=std_rows > 0)
+    return mean_rows, std_rows, z, starts
+
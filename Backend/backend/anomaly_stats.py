@@ -0,0 +1,265 @@
+"""
+Write-time anomaly scoring with running (Welford) statistics.
+
+anomaly_stats keeps, per user, count / mean / M2 of
+
+  - kind 'amount':      transaction amounts, one row per category
+  - kind 'daily_total': the user's daily expense totals (category_id 0)
+
+Every code path that inserts transactions calls record_transactions()
+right after rollups.apply_transactions(), in the same DB transaction. Each
+new transaction is scored against its category's statistics *before* it
+is added (z = (amount - mean) / std), the z-score is stored on the row and
+returned by POST /transactions/, and both statistics are then updated in
+O(1) per row. A day's total changes as transactions arrive, so the daily
+statistics replace the day's old total with the new one (Welford removal
+plus addition) rather than counting the day again.
+
+Scores need ANOMALY_MIN_HISTORY (5) earlier transactions in the category;
+before that the z-score is None. As in anomaly.py, a zero std gives z = 0.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import models
+
+ANOMALY_MIN_HISTORY = int(os.environ.get("ANOMALY_MIN_HISTORY", 5))
+
+AMOUNT = "amount"
+DAILY_TOTAL = "daily_total"
+
+# SQLite caps bound parameters per statement; IN lists are chunked below it.
+_IN_CHUNK = 300
+
+# Statistics of existing data, for databases that predate anomaly_stats
+# (migrate.py). Two passes (group mean first), like the batch detectors.
+AMOUNT_STATS_AGGREGATE = """
+    SELECT t.user_id, 'amount', t.category_id, COUNT(*), g.mean,
+           SUM((t.amount - g.mean) * (t.amount - g.mean))
+    FROM transactions t
+    JOIN (
+        SELECT user_id, category_id, AVG(amount) AS mean
+        FROM transactions GROUP BY user_id, category_id
+    ) g ON g.user_id = t.user_id AND g.category_id = t.category_id
+    GROUP BY t.user_id, t.category_id
+"""
+
+DAILY_STATS_AGGREGATE = """
+    WITH days AS (
+        SELECT d.user_id, SUM(d.total_amount) AS total
+        FROM daily_rollups d
+        JOIN categories c ON c.id = d.category_id AND c.type = 'expense'
+        GROUP BY d.user_id, d.month_key, d.transaction_date
+    ),
+    g AS (SELECT user_id, AVG(total) AS mean FROM days GROUP BY user_id)
+    SELECT days.user_id, 'daily_total', 0, COUNT(*), g.mean,
+           SUM((days.total - g.mean) * (days.total - g.mean))
+    FROM days JOIN g ON g.user_id = days.user_id
+    GROUP BY days.user_id
+"""
+
+
+# =======================
+# Welford updates
+# =======================
+
+def _add(state: List[float], x: float) -> None:
+    state[0] += 1
+    delta = x - state[1]
+    state[1] += delta / state[0]
+    state[2] += delta * (x - state[1])
+
+
+def _remove(state: List[float], x: float) -> None:
+    if state[0] <= 1:
+        state[:] = [0, 0.0, 0.0]
+        return
+    state[0] -= 1
+    delta = x - state[1]
+    state[1] -= delta / state[0]
+    state[2] = max(0.0, state[2] - delta * (x - state[1]))
+
+
+def std_of(count: int, m2: float) -> float:
+    """Sample standard deviation from a Welford (count, M2) pair."""
+    return math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+
+
+def z_score(state: List[float], x: float) -> Optional[float]:
+    """z of x against `state`, or None with fewer than ANOMALY_MIN_HISTORY points."""
+    count, mean, m2 = state
+    if count < max(ANOMALY_MIN_HISTORY, 2):
+        return None
+    std = std_of(count, m2)
+    return (x - mean) / std if std > 0 else 0.0
+
+
+# =======================
+# Writes
+# =======================
+
+def _chunks(items: List, size: int = _IN_CHUNK) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _load_states(db: Session, keys: List[Tuple[int, str, int]]) -> Dict[Tuple[int, str, int], List[float]]:
+    table = models.AnomalyStat
+    states = {key: [0, 0.0, 0.0] for key in keys}
+    for chunk in _chunks(keys):
+        rows = (
+            db.query(table.user_id, table.kind, table.category_id, table.count, table.mean, table.m2)
+            .filter(tuple_(table.user_id, table.kind, table.category_id).in_(chunk))
+            .all()
+        )
+        for user_id, kind, category_id, count, mean, m2 in rows:
+            states[(user_id, kind, category_id)] = [count, mean, m2]
+    return states
+
+
+def _day_totals(db: Session, days: List[Tuple[int, int, str]]) -> Dict[Tuple[int, str], Tuple[float, int]]:
+    """{(user_id, date): (expense total, tx count)} from daily_rollups."""
+    out: Dict[Tuple[int, str], Tuple[float, int]] = {}
+    for chunk in _chunks(days):
+        rows = (
+            db.query(
+                models.DailyRollup.user_id,
+                models.DailyRollup.transaction_date,
+                func.sum(models.DailyRollup.total_amount),
+                func.sum(models.DailyRollup.tx_count),
+            )
+            .join(models.Category, models.DailyRollup.category_id == models.Category.id)
+            .filter(models.Category.type == "expense")
+            .filter(
+                tuple_(
+                    models.DailyRollup.user_id,
+                    models.DailyRollup.month_key,
+                    models.DailyRollup.transaction_date,
+                ).in_(chunk)
+            )
+            .group_by(models.DailyRollup.user_id, models.DailyRollup.transaction_date)
+            .all()
+        )
+        for user_id, date_str, total, count in rows:
+            out[(user_id, date_str)] = (float(total), int(count))
+    return out
+
+
+def record_transactions(db: Session, rows: List[Mapping]) -> List[Optional[float]]:
+    """
+    Score new transactions and fold them into anomaly_stats.
+
+    rows: mappings with user_id, category_id, amount and transaction_date,
+    in insert order. Must run after rollups.apply_transactions() for the
+    same rows: the daily totals read here already include them, and that
+    write holds SQLite's write lock, so no other writer can change the
+    statistics between this read and the upsert below.
+
+    Returns the z-score of each row (None without enough history).
+    Does not commit.
+    """
+    if not rows:
+        return []
+
+    category_ids = sorted({row["category_id"] for row in rows})
+    expense_ids = set()
+    for chunk in _chunks(category_ids):
+        expense_ids.update(
+            cid for (cid,) in db.query(models.Category.id)
+            .filter(models.Category.id.in_(chunk))
+            .filter(models.Category.type == "expense")
+            .all()
+        )
+
+    keys = {(row["user_id"], AMOUNT, row["category_id"]) for row in rows}
+    keys |= {(row["user_id"], DAILY_TOTAL, 0) for row in rows if row["category_id"] in expense_ids}
+    states = _load_states(db, sorted(keys))
+
+    # each day's expense total before this batch, and whether it had rows
+    batch_days: Dict[Tuple[int, str], List[float]] = {}
+    for row in rows:
+        if row["category_id"] in expense_ids:
+            day = batch_days.setdefault((row["user_id"], row["transaction_date"]), [0.0, 0])
+            day[0] += float(row["amount"])
+            day[1] += 1
+    after = _day_totals(
+        db,
+        sorted((uid, models.month_key(date_str), date_str) for uid, date_str in batch_days),
+    )
+    running: Dict[Tuple[int, str], Optional[float]] = {}
+    for key, (batch_total, batch_count) in batch_days.items():
+        total, count = after.get(key, (batch_total, batch_count))
+        running[key] = total - batch_total if count > batch_count else None
+
+    scores: List[Optional[float]] = []
+    for row in rows:
+        amount = float(row["amount"])
+        state = states[(row["user_id"], AMOUNT, row["category_id"])]
+        scores.append(z_score(state, amount))
+        _add(state, amount)
+
+        if row["category_id"] in expense_ids:
+            day_key = (row["user_id"], row["transaction_date"])
+            daily = states[(row["user_id"], DAILY_TOTAL, 0)]
+            old = running[day_key]
+            if old is not None:
+                _remove(daily, old)
+            running[day_key] = (old or 0.0) + amount
+            _add(daily, running[day_key])
+
+    table = models.AnomalyStat.__table__
+    stmt = insert(table)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.kind, table.c.category_id],
+            set_={"count": stmt.excluded.count, "mean": stmt.excluded.mean, "m2": stmt.excluded.m2},
+        ),
+        [
+            {"user_id": uid, "kind": kind, "category_id": cid, "count": s[0], "mean": s[1], "m2": s[2]}
+            for (uid, kind, cid), s in states.items()
+        ],
+    )
+    return scores
+
+
+# =======================
+# Reads
+# =======================
+
+def user_baseline(db: Session, user_id: int) -> Dict:
+    """
+    The running statistics of one user, without scanning transactions:
+    {"daily": {count, mean, std} or None,
+     "categories": [{category_id, category_name, count, mean, std}]}.
+    """
+    rows = (
+        db.query(
+            models.AnomalyStat.kind,
+            models.AnomalyStat.category_id,
+            models.Category.name,
+            models.AnomalyStat.count,
+            models.AnomalyStat.mean,
+            models.AnomalyStat.m2,
+        )
+        .outerjoin(models.Category, models.AnomalyStat.category_id == models.Category.id)
+        .filter(models.AnomalyStat.user_id == user_id)
+        .order_by(models.Category.name.asc())
+        .all()
+    )
+    daily = None
+    categories = []
+    for kind, category_id, name, count, mean, m2 in rows:
+        stats = {"count": count, "mean": mean, "std": std_of(count, m2)}
+        if kind == DAILY_TOTAL:
+            daily = stats
+        else:
+            categories.append({"category_id": category_id, "category_name": name, **stats})
+    return {"user_id": user_id, "daily": daily, "categories": categories}
@@ -0,0 +1,282 @@
+"""
+Async versions of the transactions, analytics and anomaly endpoints.
+
+Served instead of the sync handlers in main.py when the app starts with
+API_MODE=async (see db.py). Handlers await an AsyncSession on the aiosqlite
+driver, so a request waiting on the database holds no Starlette worker
+thread. The existing query code (rollups, anomaly, ingest) is reused via
+AsyncSession.run_sync, which runs it on the same async connection.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_async_db
+import models, schemas, rollups, ingest, anomaly_stats
+from cache import bump_data_version, cached_call
+from anomaly import (
+    detect_daily_anomalies,
+    detect_daily_anomalies_by_category,
+    detect_daily_anomalies_all_categories,
+    detect_transaction_anomalies,
+    build_daily_plot_series,
+    build_anomaly_report,
+)
+
+router = APIRouter()
+
+
+def _now_str() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def _require_user(db: AsyncSession, user_id: int) -> models.User:
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def install(app: FastAPI) -> None:
+    """Replace the app's sync routes with the async ones for the same path and method."""
+    async_keys = {(r.path, m) for r in router.routes for m in r.methods}
+    app.router.routes = [
+        r
+        for r in app.router.routes
+        if not (isinstance(r, APIRoute) and any((r.path, m) in async_keys for m in r.methods))
+    ]
+    app.include_router(router)
+    app.openapi_schema = None
+
+
+# ---------- Transactions ----------
+
+@router.post("/transactions/", response_model=schemas.TransactionOut)
+async def create_transaction(tx_in: schemas.TransactionCreate, db: AsyncSession = Depends(get_async_db)):
+    await _require_user(db, tx_in.user_id)
+
+    # Look up category by name for this user; create it if missing
+    result = await db.execute(
+        select(models.Category).filter(
+            models.Category.name == tx_in.category_name,
+            models.Category.user_id == tx_in.user_id,
+        )
+    )
+    category = result.scalars().first()
+    if not category:
+        category = models.Category(
+            user_id=tx_in.user_id,
+            name=tx_in.category_name,
+            type="income" if tx_in.amount > 0 else "expense",
+            created_at=_now_str(),
+        )
+        db.add(category)
+        await db.flush()
+
+    tx = models.Transaction(
+        user_id=tx_in.user_id,
+        category_id=category.id,
+        amount=tx_in.amount,
+        transaction_date=tx_in.transaction_date,
+        description=tx_in.description,
+        created_at=_now_str(),
+    )
+    db.add(tx)
+    rollup_row = {
+        "user_id": tx.user_id,
+        "category_id": tx.category_id,
+        "amount": tx.amount,
+        "transaction_date": tx.transaction_date,
+    }
+    await db.run_sync(lambda s: rollups.apply_transactions(s, [rollup_row]))
+    tx.z_score = (await db.run_sync(lambda s: anomaly_stats.record_transactions(s, [rollup_row])))[0]
+    await db.run_sync(lambda s: bump_data_version(s, [tx.user_id]))
+    await db.commit()
+    await db.refresh(tx)
+    return tx
+
+
+@router.post("/transactions/bulk", response_model=schemas.TransactionBulkResult)
+async def create_transactions_bulk(
+    req: schemas.TransactionBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    rows = [tx.model_dump() for tx in req.transactions]
+    result = await db.run_sync(lambda s: ingest.insert_transactions(s, rows))
+    await db.commit()
+    return result
+
+
+@router.get("/transactions/", response_model=list[schemas.TransactionOut])
+async def list_transactions(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(models.Transaction)
+        .filter(models.Transaction.user_id == user_id)
+        .order_by(models.Transaction.transaction_date.desc())
+    )
+    return result.scalars().all()
+
+
+# ---------- Analytics ----------
+
+@router.get("/analytics/summary", response_model=schemas.AnalyticsSummaryOut)
+async def api_analytics_summary(user_id: int, month: str, db: AsyncSession = Depends(get_async_db)):
+    totals = await db.run_sync(
+        cached_call, "/analytics/summary", user_id, {"month": month},
+        lambda s: rollups.month_totals_by_type(s, user_id, month),
+    )
+    total_income = float(totals["income"])
+    total_expense = float(totals["expense"])
+    return schemas.AnalyticsSummaryOut(
+        user_id=user_id,
+        month=month,
+        total_income=total_income,
+        total_expense=total_expense,
+        # Net savings = income minus absolute expense (expense totals are stored negative)
+        net_savings=total_income - abs(total_expense),
+    )
+
+
+@router.get("/analytics/by_category", response_model=list[schemas.AnalyticsByCategoryOut])
+async def api_analytics_by_category(user_id: int, month: str, db: AsyncSession = Depends(get_async_db)):
+    rows = await db.run_sync(
+        cached_call, "/analytics/by_category", user_id, {"month": month},
+        lambda s: rollups.category_totals(s, user_id, month, "expense"),
+    )
+    return [
+        schemas.AnalyticsByCategoryOut(category=category, total_expense=float(total))
+        for category, total in rows
+    ]
+
+
+@router.get("/analytics/budget_compare", response_model=list[schemas.BudgetCompareOut])
+async def api_analytics_budget_compare(user_id: int, month: str, db: AsyncSession = Depends(get_async_db)):
+    rows = await db.run_sync(
+        cached_call, "/analytics/budget_compare", user_id, {"month": month},
+        lambda s: rollups.budget_vs_actual(s, user_id, month),
+    )
+    return [
+        schemas.BudgetCompareOut(
+            category=category,
+            month=m,
+            budget=float(budget),
+            actual=float(actual),
+            difference=float(actual) - float(budget),
+        )
+        for category, m, budget, actual in rows
+    ]
+
+
+# ---------- Anomalies ----------
+
+@router.post("/anomalies/daily", response_model=schemas.DetectDailyAnomaliesResponse)
+async def api_detect_daily_anomalies(
+    req: schemas.DetectDailyAnomaliesRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await _require_user(db, req.user_id)
+    return await db.run_sync(
+        cached_call, "/anomalies/daily", req.user_id,
+        {
+            "month": req.month,
+            "z_threshold": req.z_threshold,
+            "method": req.method,
+            "baseline_months": req.baseline_months,
+        },
+        lambda s: detect_daily_anomalies(
+            db=s, user_id=req.user_id, month=req.month, z_threshold=req.z_threshold,
+            method=req.method, baseline_months=req.baseline_months,
+        ),
+    )
+
+
+@router.post("/anomalies/daily/by-category", response_model=schemas.DetectDailyAnomaliesResponse)
+async def api_detect_daily_anomalies_by_category(
+    req: schemas.DetectDailyAnomaliesByCategoryRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await _require_user(db, req.user_id)
+    return await db.run_sync(
+        cached_call, "/anomalies/daily/by-category", req.user_id,
+        {"month": req.month, "category_name": req.category_name, "z_threshold": req.z_threshold},
+        lambda s: detect_daily_anomalies_by_category(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            category_name=req.category_name,
+            z_threshold=req.z_threshold,
+        ),
+    )
+
+
+@router.post("/anomalies/daily/by-category/all", response_model=schemas.DetectAllCategoriesResponse)
+async def api_detect_daily_anomalies_all_categories(
+    req: schemas.DetectAllCategoriesRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await _require_user(db, req.user_id)
+    return await db.run_sync(
+        cached_call, "/anomalies/daily/by-category/all", req.user_id,
+        {"month": req.month, "z_threshold": req.z_threshold, "top_k": req.top_k},
+        lambda s: detect_daily_anomalies_all_categories(
+            db=s, user_id=req.user_id, month=req.month, z_threshold=req.z_threshold,
+            top_k=req.top_k,
+        ),
+    )
+
+
+@router.post("/anomalies/transactions", response_model=schemas.DetectTransactionAnomaliesResponse)
+async def api_detect_transaction_anomalies(
+    req: schemas.DetectTransactionAnomaliesRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await _require_user(db, req.user_id)
+    return await db.run_sync(
+        cached_call, "/anomalies/transactions", req.user_id,
+        {"month": req.month, "z_threshold": req.z_threshold},
+        lambda s: detect_transaction_anomalies(
+            db=s, user_id=req.user_id, month=req.month, z_threshold=req.z_threshold
+        ),
+    )
+
+
+@router.post("/anomalies/daily/plot", response_model=schemas.DailyPlotSeriesResponse)
+async def api_daily_plot_series(
+    req: schemas.DetectDailyAnomaliesRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await _require_user(db, req.user_id)
+    return await db.run_sync(
+        cached_call, "/anomalies/daily/plot", req.user_id,
+        {"month": req.month, "bands_sigma": req.z_threshold},
+        lambda s: build_daily_plot_series(
+            db=s, user_id=req.user_id, month=req.month, bands_sigma=req.z_threshold
+        ),
+    )
+
+
+@router.post("/anomalies/report", response_model=schemas.AnomalyReportResponse)
+async def api_anomaly_report(
+    req: schemas.AnomalyReportRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await _require_user(db, req.user_id)
+    return await db.run_sync(
+        cached_call, "/anomalies/report", req.user_id,
+        {"month": req.month, "z_threshold": req.z_threshold},
+        lambda s: build_anomaly_report(
+            db=s, user_id=req.user_id, month=req.month, z_threshold=req.z_threshold
+        ),
+    )
+
+
+@router.get("/anomalies/baseline", response_model=schemas.AnomalyBaselineOut)
+async def api_anomaly_baseline(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    await _require_user(db, user_id)
+    return await db.run_sync(lambda s: anomaly_stats.user_baseline(s, user_id))
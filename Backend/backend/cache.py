@@ -0,0 +1,156 @@
+"""
+In-process result cache for dashboard reads.
+
+Results are keyed by (endpoint, user_id, params, users.data_version).
+Every write to a user's transactions, categories or budgets calls
+bump_data_version() inside the same DB transaction, so the first read
+after the commit sees a new version and misses; entries for old versions
+are never read again and simply age out of the LRU.
+
+Bounds come from the environment:
+
+  RESULT_CACHE_SIZE          max entries (default 2048, 0 disables caching)
+  RESULT_CACHE_TTL_SECONDS   max age of an entry (default 300)
+
+The /rag/ask answer cache (see rag.py) uses the same versioning:
+
+  ANSWER_CACHE_SIZE                   max answers (default 1024, 0 disables)
+  ANSWER_CACHE_TTL_SECONDS            max age of an LLM answer (default 3600)
+  ANSWER_CACHE_FALLBACK_TTL_SECONDS   max age of a rule-based answer given
+                                      because Ollama failed (default 60)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, TypeVar
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import models
+
+T = TypeVar("T")
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = 2048, ttl_seconds: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0    # dropped to stay within maxsize
+        self.expirations = 0  # dropped because older than ttl_seconds
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = LRUCache(
+    maxsize=int(os.environ.get("RESULT_CACHE_SIZE", 2048)),
+    ttl_seconds=float(os.environ.get("RESULT_CACHE_TTL_SECONDS", 300)),
+)
+
+answer_cache = LRUCache(
+    maxsize=int(os.environ.get("ANSWER_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 3600)),
+)
+ANSWER_CACHE_FALLBACK_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_FALLBACK_TTL_SECONDS", 60))
+
+
+# =======================
+# User data versions
+# =======================
+
+def data_version(db: Session, user_id: int) -> Optional[int]:
+    """Current users.data_version, or None if the user does not exist."""
+    return (
+        db.query(models.User.data_version)
+        .filter(models.User.id == user_id)
+        .scalar()
+    )
+
+
+def bump_data_version(db: Session, user_ids: Iterable[int]) -> None:
+    """
+    Invalidate cached results for these users. Call inside the writing
+    transaction (before commit) so the new version and the new data
+    become visible together. Does not commit.
+    """
+    ids = sorted(set(user_ids))
+    if not ids:
+        return
+    db.execute(
+        update(models.User.__table__)
+        .where(models.User.__table__.c.id.in_(ids))
+        .values(data_version=models.User.__table__.c.data_version + 1)
+    )
+
+
+def cached_call(
+    db: Session,
+    endpoint: str,
+    user_id: int,
+    params: Dict[str, Hashable],
+    compute: Callable[[Session], T],
+) -> T:
+    """
+    Return compute(db) for (endpoint, user_id, params), reusing the cached
+    value while the user's data_version is unchanged. Cached values are
+    shared between requests and must not be mutated by callers.
+    """
+    version = data_version(db, user_id)
+    key = (endpoint, user_id, tuple(sorted(params.items())), version)
+    hit, value = result_cache.get(key)
+    if hit:
+        return value
+    value = compute(db)
+    result_cache.put(key, value)
+    return value
@@ -112,6 +112,12 @@ import models
 # Optional ML dependencies
 try:
     import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
     from sklearn.cluster import KMeans
     from sklearn.mixture import GaussianMixture
 
@@ -132,6 +138,16 @@ def _is_weekend(date_str: str) -> bool:
     return dt.weekday() >= 5  # 5 = Saturday, 6 = Sunday
 
 
+def _daily_std(daily_totals: List[float]) -> float:
+    """Sample std of daily totals (0.0 for fewer than two days)."""
+    n = len(daily_totals)
+    if n < 2:
+        return 0.0
+    mean = sum(daily_totals) / n
+    var = sum((x - mean) ** 2 for x in daily_totals) / (n - 1)
+    return var ** 0.5
+
+
 def build_spending_feature_vector(db: Session, user_id: int, month: str) -> Dict:
     """
     Build a numeric feature vector based on:
@@ -141,30 +157,48 @@ def build_spending_feature_vector(db: Session, user_id: int, month: str) -> Dict
           * number of transactions in the month
           * std of daily spending
           * weekend vs weekday spending ratio (by amount)
+
+    Uses two queries: the category name list (vector layout) and one
+    (category, day) aggregate of this user's month from daily_rollups,
+    from which every feature is assembled in memory.
     """
 
     # 1) All categories in DB
-    categories = db.query(models.Category).all()
-    category_names = [c.name for c in categories]
+    category_names = [name for (name,) in db.query(models.Category.name).all()]
 
-    # 2) Category totals & grand total (expense only)
+    # 2) One grouped query: expense sum + count per (category name, day)
+    rows = (
+        db.query(
+            models.Category.name,
+            models.DailyRollup.transaction_date,
+            func.sum(models.DailyRollup.total_amount),
+            func.sum(models.DailyRollup.tx_count),
+        )
+        .join(models.Category, models.DailyRollup.category_id == models.Category.id)
+        .filter(models.DailyRollup.user_id == user_id)
+        .filter(models.Category.type == "expense")
+        .filter(models.DailyRollup.month_key == models.month_key(month))
+        .group_by(models.Category.name, models.DailyRollup.transaction_date)
+        .all()
+    )
+
+    by_name: Dict[str, float] = {}
+    by_date: Dict[str, float] = {}
+    tx_count = 0
+    for name, date_str, amount, count in rows:
+        amount_f = float(amount)
+        by_name[name] = by_name.get(name, 0.0) + amount_f
+        by_date[date_str] = by_date.get(date_str, 0.0) + amount_f
+        tx_count += int(count)
+
+    # 3) Category totals & grand total (expense only)
     totals: Dict[str, float] = {}
     grand_total = 0.0
-
     for name in category_names:
-        amount = (
-            db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-            .join(models.Category, models.Transaction.category_id == models.Category.id)
-            .filter(models.Transaction.user_id == user_id)
-            .filter(models.Category.name == name)
-            .filter(models.Category.type == "expense")
-            .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-            .scalar()
-        )
-        totals[name] = float(amount)
-        grand_total += float(amount)
+        totals[name] = by_name.get(name, 0.0)
+        grand_total += totals[name]
 
-    # 3) Ratios
+    # 4) Ratios
     ratios: Dict[str, float] = {}
     for name in category_names:
         if grand_total > 0:
@@ -172,62 +206,15 @@ def build_spending_feature_vector(db: Session, user_id: int, month: str) -> Dict
         else:
             ratios[name] = 0.0
 
-    # 4) Temporal features
+    # 5) Temporal features
 
-    # 4a) number of expense transactions in the month
-    tx_count = (
-        db.query(models.Transaction)
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .count()
-    )
-
-    # 4b) std of daily spending
-    daily_rows = (
-        db.query(
-            models.Transaction.transaction_date.label("date"),
-            func.sum(models.Transaction.amount).label("total_amount"),
-        )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .group_by(models.Transaction.transaction_date)
-        .all()
-    )
-
-    if daily_rows:
-        daily_totals = [float(r.total_amount) for r in daily_rows]
-        n = len(daily_totals)
-        if n > 1:
-            mean = sum(daily_totals) / n
-            var = sum((x - mean) ** 2 for x in daily_totals) / (n - 1)
-            daily_std = var ** 0.5
-        else:
-            daily_std = 0.0
-    else:
-        daily_std = 0.0
+    # 5a) std of daily spending
+    daily_std = _daily_std(list(by_date.values()))
 
-    # 4c) weekend vs weekday spending ratio
+    # 5b) weekend vs weekday spending ratio
     weekend_total = 0.0
     weekday_total = 0.0
-
-    tx_rows = (
-        db.query(
-            models.Transaction.transaction_date,
-            models.Transaction.amount,
-        )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .all()
-    )
-
-    for date_str, amount in tx_rows:
-        amount_f = float(amount)
+    for date_str, amount_f in by_date.items():
         if _is_weekend(date_str):
             weekend_total += amount_f
         else:
@@ -239,7 +226,7 @@ def build_spending_feature_vector(db: Session, user_id: int, month: str) -> Dict
     else:
         weekend_ratio = 0.0
 
-    # 5) Final vector
+    # 6) Final vector
     vector: List[float] = []
 
     # category totals
@@ -377,7 +364,7 @@ def collect_all_user_features_for_month(
         db.query(models.Transaction.user_id)
         .join(models.Category, models.Transaction.category_id == models.Category.id)
         .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
+        .filter(models.Transaction.month_key == models.month_key(month))
         .distinct()
         .all()
     )
@@ -391,6 +378,111 @@ def collect_all_user_features_for_month(
     return results
 
 
+def build_feature_matrix(
+    db: Session, month: str, chunk_size: int = 10_000
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Build the features of every user with expense transactions in `month`
+    from ONE grouped query over daily_rollups, streamed in chunks of
+    `chunk_size` rows.
+
+    Returns (user_ids, X, feature_names):
+      - user_ids: int64 array, user_ids[i] is the user of row i
+      - X: dense float matrix (users x features)
+      - feature_names: column names of X
+
+    Columns are: one total per distinct expense category name, one ratio per
+    name, then tx_count, daily_std and weekend_ratio. Unlike the per-user
+    vector, names are de-duplicated across users so the width stays bounded.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("numpy is not installed; cannot build the feature matrix.")
+
+    names = [
+        name
+        for (name,) in db.query(models.Category.name)
+        .filter(models.Category.type == "expense")
+        .distinct()
+        .order_by(models.Category.name)
+        .all()
+    ]
+    col = {name: i for i, name in enumerate(names)}
+    n_cat = len(names)
+    feature_names = (
+        names
+        + [f"{name}_ratio" for name in names]
+        + ["tx_count", "daily_std", "weekend_ratio"]
+    )
+
+    rows = (
+        db.query(
+            models.DailyRollup.user_id,
+            models.DailyRollup.transaction_date,
+            models.Category.name,
+            func.sum(models.DailyRollup.total_amount),
+            func.sum(models.DailyRollup.tx_count),
+        )
+        .join(models.Category, models.DailyRollup.category_id == models.Category.id)
+        .filter(models.Category.type == "expense")
+        .filter(models.DailyRollup.month_key == models.month_key(month))
+        .group_by(
+            models.DailyRollup.user_id,
+            models.DailyRollup.transaction_date,
+            models.Category.name,
+        )
+        .order_by(models.DailyRollup.user_id)
+        .yield_per(chunk_size)
+    )
+
+    def finish_row(cat_totals, by_date: Dict[str, float], tx_count: int):
+        grand_total = cat_totals.sum()
+        ratios = cat_totals / grand_total if grand_total > 0 else np.zeros(n_cat)
+        weekend_total = sum(v for d, v in by_date.items() if _is_weekend(d))
+        weekend_ratio = weekend_total / grand_total if grand_total > 0 else 0.0
+        temporal = [float(tx_count), _daily_std(list(by_date.values())), weekend_ratio]
+        return np.concatenate([cat_totals, ratios, temporal])
+
+    user_ids: List[int] = []
+    matrix_rows: List[np.ndarray] = []
+    current_uid = None
+    cat_totals = None
+    by_date: Dict[str, float] = {}
+    tx_count = 0
+
+    for uid, date_str, name, amount, count in rows:
+        if uid != current_uid:
+            if current_uid is not None:
+                user_ids.append(current_uid)
+                matrix_rows.append(finish_row(cat_totals, by_date, tx_count))
+            current_uid = uid
+            cat_totals = np.zeros(n_cat)
+            by_date = {}
+            tx_count = 0
+        amount_f = float(amount)
+        cat_totals[col[name]] += amount_f
+        by_date[date_str] = by_date.get(date_str, 0.0) + amount_f
+        tx_count += int(count)
+
+    if current_uid is not None:
+        user_ids.append(current_uid)
+        matrix_rows.append(finish_row(cat_totals, by_date, tx_count))
+
+    if matrix_rows:
+        X = np.vstack(matrix_rows)
+    else:
+        X = np.zeros((0, len(feature_names)))
+    return np.array(user_ids, dtype=np.int64), X, feature_names
+
+
+def _rule_based_mapping(db: Session, month: str, user_ids) -> Dict[int, Dict]:
+    """Fallback when there are too few users to cluster meaningfully."""
+    mapping: Dict[int, Dict] = {}
+    for uid in user_ids:
+        feats = build_spending_feature_vector(db, int(uid), month)
+        mapping[int(uid)] = cluster_user_profile_rule_based(feats)
+    return mapping
+
+
 def global_kmeans_clusters(
     db: Session, month: str, n_clusters: int = 4
 ) -> Dict[int, Dict]:
@@ -401,15 +493,10 @@ def global_kmeans_clusters(
     if not HAS_SKLEARN:
         raise RuntimeError("scikit-learn is not installed; cannot run KMeans clustering.")
 
-    user_feats = collect_all_user_features_for_month(db, month)
-    if len(user_feats) < 2:
+    user_ids, X, _ = build_feature_matrix(db, month)
+    if len(user_ids) < 2:
         # not enough users to cluster meaningfully
-        mapping = {}
-        for uid, feats in user_feats:
-            mapping[uid] = cluster_user_profile_rule_based(feats)
-        return mapping
-
-    X = np.array([feats["vector"] for _, feats in user_feats])
+        return _rule_based_mapping(db, month, user_ids)
 
     kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=42)
     labels = kmeans.fit_predict(X)
@@ -417,7 +504,7 @@ def global_kmeans_clusters(
     # simple label names based on cluster centers norm
     # (you can design smarter rules if you want)
     mapping: Dict[int, Dict] = {}
-    for (uid, feats), lbl in zip(user_feats, labels):
+    for uid, lbl in zip(user_ids.tolist(), labels):
         mapping[uid] = {
             "cluster_id": int(lbl),
             "label": f"KMeans-Cluster-{lbl}",
@@ -437,20 +524,15 @@ def global_gmm_clusters(
     if not HAS_SKLEARN:
         raise RuntimeError("scikit-learn is not installed; cannot run GMM clustering.")
 
-    user_feats = collect_all_user_features_for_month(db, month)
-    if len(user_feats) < 2:
-        mapping = {}
-        for uid, feats in user_feats:
-            mapping[uid] = cluster_user_profile_rule_based(feats)
-        return mapping
-
-    X = np.array([feats["vector"] for _, feats in user_feats])
+    user_ids, X, _ = build_feature_matrix(db, month)
+    if len(user_ids) < 2:
+        return _rule_based_mapping(db, month, user_ids)
 
     gmm = GaussianMixture(n_components=n_components, random_state=42)
     labels = gmm.fit_predict(X)
 
     mapping: Dict[int, Dict] = {}
-    for (uid, feats), lbl in zip(user_feats, labels):
+    for uid, lbl in zip(user_ids.tolist(), labels):
         mapping[uid] = {
             "cluster_id": int(lbl),
             "label": f"GMM-Cluster-{lbl}",
@@ -1,12 +1,154 @@
-from sqlalchemy import create_engine
+"""
+Database engine and session factory.
+
+Everything is configured from the environment, so the app no longer depends
+on the working directory it is started from:
+
+  DATABASE_URL            SQLAlchemy URL (default: sqlite:///<Backend>/expense.db)
+  DB_POOL_SIZE            persistent connections kept in the pool (default 10)
+  DB_MAX_OVERFLOW         extra connections under load (default 30; with the
+                          pool size this matches Starlette's 40 worker threads)
+  DB_POOL_TIMEOUT         seconds to wait for a free connection (default 30)
+
+SQLite only, applied to every new connection:
+
+  SQLITE_JOURNAL_MODE     WAL: readers no longer block on a writer
+  SQLITE_SYNCHRONOUS      NORMAL: durable with WAL, far fewer fsyncs than FULL
+  SQLITE_BUSY_TIMEOUT_MS  wait this long for a write lock instead of failing
+                          with "database is locked" (default 5000)
+  SQLITE_CACHE_SIZE_KB    page cache per connection (default 65536)
+  SQLITE_MMAP_SIZE        bytes of the file to memory-map (default 256 MiB)
+  SQLITE_TEMP_STORE       MEMORY: temp tables/sorts stay off disk
+
+Async mode (optional, needs `pip install aiosqlite`):
+
+  API_MODE                "sync" (default) or "async": which handlers main.py
+                          serves for the analytics/transactions/anomaly routes
+  ASYNC_DATABASE_URL      defaults to DATABASE_URL with the sqlite+aiosqlite driver
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# DB file is in project root: ../expense.db
-SQLALCHEMY_DATABASE_URL = "sqlite:///../expense.db"
+try:
+    import aiosqlite  # noqa: F401
+    from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+    HAS_AIOSQLITE = True
+except ImportError:
+    HAS_AIOSQLITE = False
+
+# DB file is in the Backend/ folder, next to this package
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[1] / "expense.db"
+
+
+@dataclass
+class EngineProfile:
+    url: str
+    pool_size: int = 10
+    max_overflow: int = 30
+    pool_timeout: float = 30.0
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 65536
+    mmap_size: int = 256 * 1024 * 1024
+    temp_store: str = "MEMORY"
+
+    @classmethod
+    def from_env(cls) -> "EngineProfile":
+        env = os.environ
+        return cls(
+            url=env.get("DATABASE_URL", f"sqlite:///{DEFAULT_DB_PATH}"),
+            pool_size=int(env.get("DB_POOL_SIZE", cls.pool_size)),
+            max_overflow=int(env.get("DB_MAX_OVERFLOW", cls.max_overflow)),
+            pool_timeout=float(env.get("DB_POOL_TIMEOUT", cls.pool_timeout)),
+            journal_mode=env.get("SQLITE_JOURNAL_MODE", cls.journal_mode),
+            synchronous=env.get("SQLITE_SYNCHRONOUS", cls.synchronous),
+            busy_timeout_ms=int(env.get("SQLITE_BUSY_TIMEOUT_MS", cls.busy_timeout_ms)),
+            cache_size_kb=int(env.get("SQLITE_CACHE_SIZE_KB", cls.cache_size_kb)),
+            mmap_size=int(env.get("SQLITE_MMAP_SIZE", cls.mmap_size)),
+            temp_store=env.get("SQLITE_TEMP_STORE", cls.temp_store),
+        )
+
+    def sqlite_pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA journal_mode = {self.journal_mode}",
+            f"PRAGMA synchronous = {self.synchronous}",
+            f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}",
+            f"PRAGMA cache_size = {-int(self.cache_size_kb)}",  # negative = KiB
+            f"PRAGMA mmap_size = {int(self.mmap_size)}",
+            f"PRAGMA temp_store = {self.temp_store}",
+        ]
+
+
+def _install_pragmas(sync_engine: Engine, profile: EngineProfile) -> None:
+    pragmas = profile.sqlite_pragmas()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_conn, _record) -> None:
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _pool_kwargs(profile: EngineProfile, url: str) -> dict:
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    return {
+        "pool_size": profile.pool_size,
+        "max_overflow": profile.max_overflow,
+        "pool_timeout": profile.pool_timeout,
+    }
+
+
+def make_engine(profile: EngineProfile) -> Engine:
+    """Create an engine for `profile`, tuning every SQLite connection it opens."""
+    is_sqlite = profile.url.startswith("sqlite")
+    kwargs = _pool_kwargs(profile, profile.url)
+    if is_sqlite:
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": profile.busy_timeout_ms / 1000,
+        }
+    new_engine = create_engine(profile.url, **kwargs)
+    if is_sqlite:
+        _install_pragmas(new_engine, profile)
+    return new_engine
+
+
+def async_url(url: str) -> str:
+    """sqlite:///path -> sqlite+aiosqlite:///path; other URLs are returned as-is."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def make_async_engine(profile: EngineProfile) -> "AsyncEngine":
+    """Async counterpart of make_engine() on the aiosqlite driver."""
+    if not HAS_AIOSQLITE:
+        raise RuntimeError("Async DB access needs aiosqlite: pip install aiosqlite")
+    url = os.environ.get("ASYNC_DATABASE_URL", async_url(profile.url))
+    kwargs = _pool_kwargs(profile, url)
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"timeout": profile.busy_timeout_ms / 1000}
+    new_engine = create_async_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        _install_pragmas(new_engine.sync_engine, profile)
+    return new_engine
+
+
+engine_profile = EngineProfile.from_env()
+engine = make_engine(engine_profile)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -20,3 +162,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+API_MODE = os.environ.get("API_MODE", "sync").lower()
+
+async_engine = None
+AsyncSessionLocal = None
+if HAS_AIOSQLITE:
+    async_engine = make_async_engine(engine_profile)
+    # expire_on_commit=False: attribute access after commit must not trigger lazy IO
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """FastAPI dependency: gives an AsyncSession to each request (API_MODE=async)."""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async DB access needs aiosqlite: pip install aiosqlite")
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,138 @@
+"""
+Full-text search over transaction descriptions (SQLite FTS5).
+
+transactions_fts is an external-content FTS5 table over
+transactions.description, kept in sync by the triggers below (created by
+migrate.py). Searches join it back to transactions by rowid, so per-user
+and date filters and the SUM/COUNT run on the matching rows only. On a
+database without FTS5 the same functions fall back to a LIKE scan.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+FTS_TABLE = "transactions_fts"
+
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description,
+        content = 'transactions',
+        content_rowid = 'id',
+        tokenize = 'porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO {FTS_TABLE} (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+# bind URL -> whether transactions_fts exists there
+_fts_present: Dict[str, bool] = {}
+
+
+def has_fts(db: Session) -> bool:
+    url = str(db.get_bind().url)
+    if url not in _fts_present:
+        row = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        _fts_present[url] = row is not None
+    return _fts_present[url]
+
+
+def _words(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Free text -> FTS5 MATCH expression: every word must appear, as a
+    prefix ('piz' finds 'Pizza'). Quoting keeps FTS5 syntax characters
+    in user input from being interpreted.
+    """
+    words = _words(query)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_transactions(
+    db: Session,
+    user_id: int,
+    query: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = 50,
+) -> Dict:
+    """
+    Transactions of `user_id` whose description matches `query`, within
+    [date_from, date_to] (YYYY-MM-DD, inclusive, both optional).
+
+    Returns {"query", "count", "total", "transactions"}: count and total
+    cover every match, transactions holds the newest `limit` of them.
+    """
+    params = {"uid": user_id, "date_from": date_from, "date_to": date_to, "limit": limit}
+    filters = (
+        "t.user_id = :uid"
+        " AND (:date_from IS NULL OR t.transaction_date >= :date_from)"
+        " AND (:date_to IS NULL OR t.transaction_date <= :date_to)"
+    )
+
+    if has_fts(db):
+        expr = match_expression(query)
+        if expr is None:
+            return {"query": query, "count": 0, "total": 0.0, "transactions": []}
+        params["match"] = expr
+        source = f"{FTS_TABLE} f JOIN transactions t ON t.id = f.rowid"
+        filters = f"{FTS_TABLE} MATCH :match AND " + filters
+    else:
+        words = _words(query)
+        if not words:
+            return {"query": query, "count": 0, "total": 0.0, "transactions": []}
+        source = "transactions t"
+        for i, word in enumerate(words):
+            params[f"w{i}"] = f"%{word}%"
+            filters += f" AND lower(t.description) LIKE :w{i}"
+
+    count, total = db.execute(
+        text(f"SELECT COUNT(*), COALESCE(SUM(t.amount), 0) FROM {source} WHERE {filters}"),
+        params,
+    ).one()
+    rows = db.execute(
+        text(
+            "SELECT t.id, t.user_id, t.category_id, t.amount, t.transaction_date, t.description,"
+            " t.z_score "
+            f"FROM {source} WHERE {filters} "
+            "ORDER BY t.transaction_date DESC, t.id DESC LIMIT :limit"
+        ),
+        params,
+    ).mappings().all()
+
+    return {
+        "query": query,
+        "count": int(count),
+        "total": float(total),
+        "transactions": [dict(r) for r in rows],
+    }
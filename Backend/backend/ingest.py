@@ -0,0 +1,179 @@
+"""
+Bulk transaction ingest.
+
+insert_transactions() validates a batch of TransactionCreate-shaped rows,
+resolves (or creates) every category the batch needs in one pass, inserts
+the transactions with a single executemany and updates the rollups and
+anomaly_stats (each row is stored with its z_score), all inside the
+caller's DB transaction. Invalid rows are reported, not fatal.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session
+
+import anomaly_stats
+import models
+import rollups
+from cache import bump_data_version
+
+# SQLite caps bound parameters per statement; IN lists are chunked below it.
+_IN_CHUNK = 500
+
+
+@dataclass
+class IngestCache:
+    """
+    Lookups remembered across batches (e.g. chunks of one CSV import), so
+    each user and category is queried at most once per import.
+    """
+    users: Set[int] = field(default_factory=set)           # known to exist
+    missing_users: Set[int] = field(default_factory=set)   # known not to exist
+    categories: Dict[Tuple[int, str], int] = field(default_factory=dict)
+
+
+def _now_str() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _chunks(items: List, size: int = _IN_CHUNK) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _is_iso_date(value) -> bool:
+    """True for a real calendar date written as YYYY-MM-DD (zero-padded)."""
+    if not isinstance(value, str) or len(value) != 10:
+        return False
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+def existing_user_ids(
+    db: Session, user_ids: Iterable[int], cache: Optional[IngestCache] = None
+) -> Set[int]:
+    cache = cache if cache is not None else IngestCache()
+    ids = sorted(set(user_ids) - cache.users - cache.missing_users)
+    for chunk in _chunks(ids):
+        found = {
+            uid for (uid,) in db.query(models.User.id).filter(models.User.id.in_(chunk)).all()
+        }
+        cache.users.update(found)
+        cache.missing_users.update(set(chunk) - found)
+    return cache.users
+
+
+def resolve_categories(
+    db: Session,
+    wanted: Dict[Tuple[int, str], str],
+    cache: Optional[IngestCache] = None,
+) -> Tuple[Dict[Tuple[int, str], int], int]:
+    """
+    wanted: {(user_id, category_name): type to use if the category is missing}
+
+    Returns ({(user_id, category_name): category_id}, number_created).
+    Missing categories are inserted with one executemany; nothing is committed.
+    """
+    cache = cache if cache is not None else IngestCache()
+    ids = cache.categories
+    keys = [k for k in wanted if k not in ids]
+
+    def lookup(pairs: List[Tuple[int, str]]) -> None:
+        for chunk in _chunks(pairs):
+            rows = (
+                db.query(models.Category.user_id, models.Category.name, models.Category.id)
+                .filter(tuple_(models.Category.user_id, models.Category.name).in_(chunk))
+                .order_by(models.Category.id)
+                .all()
+            )
+            for user_id, name, cat_id in rows:
+                # same as .first() in the single-row path: oldest match wins
+                ids.setdefault((user_id, name), cat_id)
+
+    lookup(keys)
+    missing = [k for k in keys if k not in ids]
+    if missing:
+        now = _now_str()
+        db.execute(
+            insert(models.Category.__table__),
+            [
+                {"user_id": uid, "name": name, "type": wanted[(uid, name)], "created_at": now}
+                for uid, name in missing
+            ],
+        )
+        lookup(missing)
+    return ids, len(missing)
+
+
+def insert_transactions(
+    db: Session,
+    rows: List[Mapping],
+    category_type: Optional[str] = None,
+    cache: Optional[IngestCache] = None,
+) -> Dict:
+    """
+    rows: mappings with user_id, category_name, amount, transaction_date and
+    optional description (the TransactionCreate fields).
+
+    category_type: type for auto-created categories; None infers it from the
+    amount sign like POST /transactions/ does.
+
+    cache: pass the same IngestCache for consecutive batches to skip
+    repeated user/category lookups.
+
+    Returns {"inserted": n, "categories_created": n, "errors": [{"index", "error"}]}.
+    Does not commit.
+    """
+    cache = cache if cache is not None else IngestCache()
+    errors: List[Dict] = []
+    known_users = existing_user_ids(db, (row["user_id"] for row in rows), cache)
+
+    valid: List[Tuple[int, Mapping]] = []
+    wanted: Dict[Tuple[int, str], str] = {}
+    for index, row in enumerate(rows):
+        if row["user_id"] not in known_users:
+            errors.append({"index": index, "error": "User not found"})
+            continue
+        if not _is_iso_date(row["transaction_date"]):
+            errors.append({"index": index, "error": "transaction_date must be 'YYYY-MM-DD'"})
+            continue
+        key = (row["user_id"], row["category_name"])
+        if key not in wanted:
+            if category_type is not None:
+                wanted[key] = category_type
+            else:
+                wanted[key] = "income" if float(row["amount"]) > 0 else "expense"
+        valid.append((index, row))
+
+    category_ids, created = resolve_categories(db, wanted, cache)
+
+    now = _now_str()
+    tx_rows = [
+        {
+            "user_id": row["user_id"],
+            "category_id": category_ids[(row["user_id"], row["category_name"])],
+            "amount": float(row["amount"]),
+            "transaction_date": row["transaction_date"],
+            "month_key": models.month_key(row["transaction_date"]),
+            "description": row.get("description"),
+            "created_at": now,
+        }
+        for _, row in valid
+    ]
+    if tx_rows:
+        # rollups first: scoring reads the day totals they now include
+        rollups.apply_transactions(db, tx_rows)
+        for row, z in zip(tx_rows, anomaly_stats.record_transactions(db, tx_rows)):
+            row["z_score"] = z
+        db.execute(insert(models.Transaction.__table__), tx_rows)
+        bump_data_version(db, {row["user_id"] for row in tx_rows})
+
+    return {"inserted": len(tx_rows), "categories_created": created, "errors": errors}
@@ -0,0 +1,155 @@
+"""
+One-pass question router for the RAG pipeline.
+
+Routing used to run ~25 month-name regexes (compiled on every call) plus
+several substring scans over greeting, privacy and keyword lists for each
+question. Here everything is compiled once at import into a single
+alternation: one finditer over the lowercased question yields the
+months (YYYY-MM, MM-YYYY, "december 2025"), the first full date and every
+keyword hit, and a table maps each keyword to the intents it signals.
+
+Keywords keep the old substring semantics ("anomal" matches "anomalous",
+"net" matches "net savings"). Months come back in the order they appear
+in the question.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from prompt_budget import question_terms
+
+MONTH_NAMES = {
+    "january": "01", "jan": "01",
+    "february": "02", "feb": "02",
+    "march": "03", "mar": "03",
+    "april": "04", "apr": "04",
+    "may": "05",
+    "june": "06", "jun": "06",
+    "july": "07", "jul": "07",
+    "august": "08", "aug": "08",
+    "september": "09", "sept": "09", "sep": "09",
+    "october": "10", "oct": "10",
+    "november": "11", "nov": "11",
+    "december": "12", "dec": "12",
+}
+
+GREETING_WORDS = ("hi", "hii", "hiii", "hello", "hey", "hola", "namaste")
+
+# intent -> phrases that signal it (matched as substrings)
+INTENT_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "cross_user": (
+        "other user", "another user", "someone else", "other people", "other account",
+        "other person", "my friend's account", "my friends account", "friend’s account",
+    ),
+    "compare": ("compare", "difference", "change"),
+    "anomaly": ("why", "anomal", "spike", "unusual"),
+    "segment": ("cluster", "segment", "spending profile"),
+    "how_much": ("how much",),
+    "spend": ("spend",),
+    "income": ("income",),
+    "savings": ("saving", "net"),
+    "top": ("top",),
+    "category": ("category",),
+    "summary": ("summary", "overview"),
+}
+
+
+def _keyword_intents() -> Dict[str, FrozenSet[str]]:
+    # a phrase also signals every intent whose keyword it contains
+    # ("spending profile" -> segment + spend), since the scan consumes it whole
+    out = {}
+    for phrase in {p for phrases in INTENT_KEYWORDS.values() for p in phrases}:
+        out[phrase] = frozenset(
+            intent for intent, kws in INTENT_KEYWORDS.items() if any(k in phrase for k in kws)
+        )
+    return out
+
+
+_KEYWORD_INTENTS = _keyword_intents()
+
+
+def _alternation(words) -> str:
+    # longest first, so "september" wins over "sep"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_SCANNER = re.compile(
+    r"(?P<date>(?P<dy>\d{4})-(?P<dm>\d{2})-\d{2})"
+    r"|\b(?P<ym_y>\d{4})-(?P<ym_m>\d{2})\b"
+    r"|\b(?P<my_m>\d{2})-(?P<my_y>\d{4})\b"
+    rf"|\b(?P<mname>{_alternation(MONTH_NAMES)})\s+(?P<mname_y>\d{{4}})\b"
+    rf"|(?P<kw>{_alternation(_KEYWORD_INTENTS)})"
+)
+_GREETING = re.compile(rf"(?:{_alternation(GREETING_WORDS)})(?: |$)")
+
+
+@dataclass(frozen=True)
+class Route:
+    months: Tuple[str, ...]          # YYYY-MM, in order of appearance
+    date: Optional[str]              # first YYYY-MM-DD in the question
+    intents: FrozenSet[str]
+    greeting: bool
+
+    def has(self, *intents: str) -> bool:
+        """True if any of `intents` was detected."""
+        return any(i in self.intents for i in intents)
+
+
+@lru_cache(maxsize=4096)
+def route_question(question: str) -> Route:
+    q = question.strip().lower()
+    months = []
+    date = None
+    intents = set()
+
+    def add_month(value: str) -> None:
+        if value not in months:
+            months.append(value)
+
+    for m in _SCANNER.finditer(q):
+        if m.group("date"):
+            if date is None:
+                date = m.group("date")
+            add_month(f"{m.group('dy')}-{m.group('dm')}")
+        elif m.group("ym_y"):
+            add_month(f"{m.group('ym_y')}-{m.group('ym_m')}")
+        elif m.group("my_y"):
+            add_month(f"{m.group('my_y')}-{m.group('my_m')}")
+        elif m.group("mname"):
+            add_month(f"{m.group('mname_y')}-{MONTH_NAMES[m.group('mname')]}")
+        else:
+            intents |= _KEYWORD_INTENTS[m.group("kw")]
+
+    return Route(
+        months=tuple(months),
+        date=date,
+        intents=frozenset(intents),
+        greeting=_GREETING.match(q) is not None,
+    )
+
+
+# "how much did I spend on <item> in ..." -> <item>
+ITEM_QUESTION = re.compile(
+    r"\b(?:spend|spent|spending|pay|paid)\s+(?:on|for|at)\s+(.+?)"
+    r"(?:\s+(?:in|during|this|last|since|between|from|so)\b|[?.!,]|$)"
+)
+_VAGUE_ITEMS = {"it", "that", "this", "everything", "things", "stuff"}
+
+
+@lru_cache(maxsize=4096)
+def item_phrase(question: str) -> Optional[str]:
+    """
+    The item of a "spend on X" question as its content words ('pizza'),
+    or None if the question names no item or only a vague one ("on it").
+    """
+    found = ITEM_QUESTION.search(question.lower())
+    if not found:
+        return None
+    item = " ".join(question_terms(found.group(1))) or found.group(1).strip()
+    if item in _VAGUE_ITEMS or not re.search(r"\w", item):
+        return None  # vague, or only punctuation ("on $$$")
+    return item
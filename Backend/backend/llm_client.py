@@ -0,0 +1,377 @@
+"""
+Shared async client for the Ollama chat API.
+
+One pooled httpx.AsyncClient serves every /rag/ask request, so answers
+reuse keep-alive connections instead of opening a new TCP connection per
+question. Around it:
+
+- a semaphore bounds how many chats are in flight at Ollama; callers past
+  that wait in a queue (counted in stats()),
+- every call has a deadline covering the queue wait and the request; a
+  deadline hit while still queued is counted in queue_timeouts and does
+  not count against Ollama,
+- a circuit breaker opens after consecutive failures of the HTTP call
+  itself: while open, calls fail immediately with CircuitOpenError so
+  rag.py answers with the rule-based engine right away. After a cooldown
+  the next call first re-probes Ollama (GET /api/tags) and closes the
+  breaker if it answers.
+
+Configured from the environment:
+
+  OLLAMA_BASE_URL                  default http://localhost:11434
+  OLLAMA_MODEL                     default llama3.2
+  OLLAMA_MAX_IN_FLIGHT             concurrent chats sent to Ollama (default 4)
+  OLLAMA_DEADLINE_SECONDS          per call, queue wait included (default 60)
+  OLLAMA_CONNECT_TIMEOUT_SECONDS   default 2
+  OLLAMA_BREAKER_FAILURES          consecutive failures that open it (default 3)
+  OLLAMA_BREAKER_COOLDOWN_SECONDS  wait before re-probing (default 30)
+  OLLAMA_BREAKER_PROBE_TIMEOUT_SECONDS
+                                   a probe with no outcome after this long
+                                   is treated as lost (default 10)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2")
+
+SYSTEM_PROMPT = (
+    "You are a precise, privacy-preserving budgeting assistant. "
+    "Use only the provided context from the database."
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Ollama is marked unhealthy; the call was not attempted."""
+
+
+def chat_payload(prompt: str, model: str, stream: bool) -> Dict:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "stream": stream,
+    }
+
+
+# =======================
+# Circuit breaker
+# =======================
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open once `cooldown_seconds` have passed, letting one
+    probe through; the probe's outcome closes or re-opens it. A probe
+    that reports nothing within `probe_timeout_seconds` (its caller was
+    cancelled or crashed) is considered lost and the next caller probes
+    again, so half_open cannot outlive its probe.
+    Thread-safe, so the sync call_ollama_chat() can share it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        probe_timeout_seconds: float = 10.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str:
+        """
+        "closed": go ahead. "probe": the cooldown is over and this caller
+        should check Ollama's health first. Raises CircuitOpenError otherwise.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return "closed"
+            now = time.monotonic()
+            if (
+                self.state == "open" and now - self.opened_at >= self.cooldown_seconds
+            ) or (
+                self.state == "half_open" and now - self.probe_started_at >= self.probe_timeout_seconds
+            ):
+                self.state = "half_open"
+                self.probe_started_at = now
+                return "probe"
+            raise CircuitOpenError("circuit open: Ollama marked unhealthy")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+
+
+# =======================
+# Client
+# =======================
+
+class OllamaClient:
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        model: str = OLLAMA_MODEL,
+        max_in_flight: int = 4,
+        deadline_seconds: float = 60.0,
+        connect_timeout_seconds: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.deadline_seconds = deadline_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.breaker = breaker or CircuitBreaker()
+
+        # the AsyncClient and the semaphore belong to one event loop;
+        # they are (re)created on first use from a new loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._closer: Optional[asyncio.Task] = None  # closes _client with its loop
+
+        self.in_flight = 0
+        self.queued = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0  # answered by the rule-based engine without trying
+        self.cancelled = 0        # caller went away mid-call
+        self.queue_timeouts = 0   # deadline hit while waiting for a slot
+
+    @classmethod
+    def from_env(cls) -> "OllamaClient":
+        env = os.environ
+        return cls(
+            base_url=OLLAMA_BASE_URL,
+            model=OLLAMA_MODEL,
+            max_in_flight=int(env.get("OLLAMA_MAX_IN_FLIGHT", 4)),
+            deadline_seconds=float(env.get("OLLAMA_DEADLINE_SECONDS", 60)),
+            connect_timeout_seconds=float(env.get("OLLAMA_CONNECT_TIMEOUT_SECONDS", 2)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(env.get("OLLAMA_BREAKER_FAILURES", 3)),
+                cooldown_seconds=float(env.get("OLLAMA_BREAKER_COOLDOWN_SECONDS", 30)),
+                probe_timeout_seconds=float(env.get("OLLAMA_BREAKER_PROBE_TIMEOUT_SECONDS", 10)),
+            ),
+        )
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            old_client, old_loop = self._client, self._loop
+            if old_client is not None and old_loop is not None and old_loop.is_running():
+                # still serving in another thread: close the old pool there
+                asyncio.run_coroutine_threadsafe(old_client.aclose(), old_loop)
+            self._loop = loop
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.deadline_seconds, connect=self.connect_timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                ),
+            )
+            self._closer = loop.create_task(self._close_with_loop(self._client))
+        return loop
+
+    async def _close_with_loop(self, client: httpx.AsyncClient) -> None:
+        """
+        Runs for the life of the event loop that owns `client`. asyncio.run()
+        cancels leftover tasks before closing its loop, so the client's pool
+        is closed on that loop while it can still tear down its connections.
+        """
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await client.aclose()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        if self._closer is not None:
+            self._closer.cancel()
+        self._loop = self._client = self._sem = self._closer = None
+
+    async def _admit(self) -> None:
+        """Breaker check (and re-probe after the cooldown) before a call."""
+        try:
+            if self.breaker.acquire() == "probe":
+                await self._probe()
+        except CircuitOpenError:
+            self.short_circuited += 1
+            raise
+        self.requests += 1
+
+    async def _probe(self) -> None:
+        try:
+            resp = await self._client.get("/api/tags", timeout=self.connect_timeout_seconds)
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            raise CircuitOpenError(f"circuit open: re-probe failed ({e})") from e
+        except BaseException:
+            # cancelled (client went away) or anything else: the probe has
+            # no outcome, so re-open rather than leave the breaker half_open
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+
+    async def _acquire(self, deadline: float) -> None:
+        """
+        Wait for a slot. Timing out here is local queueing, not an Ollama
+        failure, so it never reaches the breaker.
+        """
+        self.queued += 1
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self._sem.acquire()
+        except TimeoutError:
+            self.queue_timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._sem.release()
+
+    def _record(self, error: Optional[BaseException]) -> None:
+        if error is None:
+            self.successes += 1
+            self.breaker.record_success()
+            return
+        self.failures += 1
+        if isinstance(error, (TimeoutError, httpx.TimeoutException)):
+            self.timeouts += 1
+        self.breaker.record_failure()
+
+    async def chat(self, prompt: str, model: Optional[str] = None) -> str:
+        """Full answer for `prompt`. Raises on failure, deadline or open breaker."""
+        loop = self._ensure_loop()
+        await self._admit()
+        deadline = loop.time() + self.deadline_seconds
+        await self._acquire(deadline)
+        try:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    resp = await self._client.post(
+                        "/api/chat", json=chat_payload(prompt, model or self.model, stream=False)
+                    )
+                resp.raise_for_status()
+                data = resp.json()
+            finally:
+                self._release()
+        except asyncio.CancelledError:
+            # the caller went away; says nothing about Ollama's health
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            self._record(e)
+            raise
+        self._record(None)
+
+        content = ((data.get("message") or {}).get("content") or "").strip()
+        if not content:
+            raise RuntimeError("Empty answer from Ollama")
+        return content
+
+    async def stream_chat(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yield answer text from the streaming /api/chat (NDJSON) as it is
+        generated. Closing the generator early (e.g. the HTTP client
+        disconnected) closes the connection, which stops generation on the
+        Ollama side.
+        """
+        loop = self._ensure_loop()
+        await self._admit()
+        deadline = loop.time() + self.deadline_seconds
+        await self._acquire(deadline)
+        try:
+            try:
+                payload = chat_payload(prompt, model or self.model, stream=True)
+                async with self._client.stream("POST", "/api/chat", json=payload) as resp:
+                    resp.raise_for_status()
+                    async for line in resp.aiter_lines():
+                        if loop.time() > deadline:
+                            raise TimeoutError("Ollama stream exceeded its deadline")
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        if data.get("error"):
+                            raise RuntimeError(data["error"])
+                        content = (data.get("message") or {}).get("content") or ""
+                        if content:
+                            yield content
+                        if data.get("done"):
+                            break
+            finally:
+                self._release()
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            self._record(e)
+            raise
+        self._record(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            "retry_in_seconds": self.breaker.retry_in(),
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "cancelled": self.cancelled,
+            "queue_timeouts": self.queue_timeouts,
+        }
+
+
+ollama = OllamaClient.from_env()
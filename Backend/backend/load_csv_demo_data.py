@@ -1,18 +1,29 @@
 from __future__ import annotations
 
+import argparse
 import csv
+import itertools
+import time
+from collections import Counter
 from pathlib import Path
 from typing import Dict
 from datetime import datetime
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 
-from db import SessionLocal
+from db import Base, SessionLocal, engine
+from migrate import run_migrations
+import ingest
 import models
+from cache import bump_data_version
 
 
 
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 
+# (user_id, category_id, month) keys per IN query; 3 bound parameters each
+_BUDGET_KEYS_PER_QUERY = 300
+
 
 def load_categories(db: Session, csv_path: Path, user_id: int) -> None:
     """
@@ -45,129 +56,209 @@ def load_categories(db: Session, csv_path: Path, user_id: int) -> None:
             )
             db.add(cat)
             print(f"  + Created category for user {user_id}: {name} ({ctype})")
+        bump_data_version(db, [user_id])
         db.commit()
 
 
-def _get_or_create_category(
-    db: Session, user_id: int, name: str, ctype: str = "expense"
-) -> models.Category:
-    """
-    Get or create a category **for a specific user**.
-    """
-    cat = (
-        db.query(models.Category)
-        .filter(
-            models.Category.user_id == user_id,
-            models.Category.name == name,
-        )
-        .first()
-    )
-    if cat:
-        return cat
-
-    cat = models.Category(
-        user_id=user_id,
-        name=name,
-        type=ctype,
-        created_at=datetime.utcnow(),  # 👈 set created_at
-    )
+def _read_checkpoint(db: Session, source: str) -> int:
+    cp = db.get(models.ImportCheckpoint, source)
+    return cp.rows_done if cp else 0
 
-    db.add(cat)
-    db.commit()
-    db.refresh(cat)
-    print(f"  + Auto-created category for user {user_id}: {name} ({ctype})")
-    return cat
 
+def _save_checkpoint(db: Session, source: str, rows_done: int) -> None:
+    cp = db.get(models.ImportCheckpoint, source)
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    if cp is None:
+        db.add(models.ImportCheckpoint(source=source, rows_done=rows_done, updated_at=now))
+    else:
+        cp.rows_done = rows_done
+        cp.updated_at = now
 
-def load_transactions(db: Session, csv_path: Path) -> None:
-    print(f"[transactions] Loading from {csv_path}")
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            user_id = int(row["user_id"])
-            category_name = row["category_name"].strip()
-            amount = float(row["amount"])
-            transaction_date = row["transaction_date"].strip()
-            description = row.get("description", "").strip()
-
-            # ensure user exists
-            user = db.query(models.User).filter(models.User.id == user_id).first()
-            if not user:
-                print(f"  ! Skipping row: user_id {user_id} not found")
-                continue
 
-            # ensure category exists for THIS user
-            cat = _get_or_create_category(db, user_id, category_name, "expense")
+def _report_skips(first_row: int, last_row: int, reasons: Counter) -> None:
+    """One line per chunk for its skipped rows, by reason."""
+    if reasons:
+        detail = ", ".join(f"{n:,} {reason}" for reason, n in reasons.most_common())
+        print(f"  ! Skipped {sum(reasons.values()):,} of rows {first_row:,}-{last_row:,}: {detail}")
 
-            tx = models.Transaction(
-                user_id=user_id,
-                category_id=cat.id,
-                amount=amount,
-                transaction_date=transaction_date,
-                description=description,
-                created_at=datetime.utcnow(),  # 👈 set created_at
-            )
-            db.add(tx)
 
-            print(
-                f"  + Tx: user={user_id}, cat={category_name}, "
-                f"amount={amount}, date={transaction_date}, desc={description}"
-            )
-        db.commit()
+def _parse_tx_row(row: Dict[str, str]) -> Dict:
+    return {
+        "user_id": int(row["user_id"]),
+        "category_name": row["category_name"].strip(),
+        "amount": float(row["amount"]),
+        "transaction_date": row["transaction_date"].strip(),
+        "description": (row.get("description") or "").strip(),
+    }
 
 
-def load_budgets(db: Session, csv_path: Path) -> None:
-    print(f"[budgets] Loading from {csv_path}")
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            user_id = int(row["user_id"])
-            category_name = row["category_name"].strip()
-            month = row["month"].strip()       # 'YYYY-MM'
-            amount = float(row["amount"])
-
-            user = db.query(models.User).filter(models.User.id == user_id).first()
-            if not user:
-                print(f"  ! Skipping budget: user_id {user_id} not found")
-                continue
+def load_transactions(
+    db: Session,
+    csv_path: Path,
+    chunk_size: int = 5_000,
+    resume: bool = True,
+) -> None:
+    """
+    Stream transactions.csv in chunks of `chunk_size` rows. Each chunk is
+    bulk-inserted (ingest.insert_transactions) and committed together with
+    the import checkpoint, so memory stays bounded by one chunk and an
+    interrupted import continues where it stopped on the next run.
 
-            cat = _get_or_create_category(db, user_id, category_name, "expense")
+    resume=False ignores the checkpoint and reads the file from the top.
+    """
+    source = str(csv_path.resolve())
+    offset = _read_checkpoint(db, source) if resume else 0
+    print(f"[transactions] Loading from {csv_path} (chunk_size={chunk_size})")
+    if offset:
+        print(f"  Resuming after row {offset:,}")
 
-            existing = (
-                db.query(models.Budget)
-                .filter(
-                    models.Budget.user_id == user_id,
-                    models.Budget.category_id == cat.id,
-                    models.Budget.month == month,
-                )
-                .first()
+    cache = ingest.IngestCache()
+    rows_done = offset
+    inserted = skipped = 0
+    started = time.perf_counter()
+
+    with csv_path.open("r", newline="", encoding="utf-8") as f:
+        reader = itertools.islice(csv.DictReader(f), offset, None)
+        while True:
+            chunk = list(itertools.islice(reader, chunk_size))
+            if not chunk:
+                break
+
+            batch = []
+            reasons = Counter()
+            for row in chunk:
+                try:
+                    batch.append(_parse_tx_row(row))
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    reasons["unparseable"] += 1
+
+            result = ingest.insert_transactions(db, batch, category_type="expense", cache=cache)
+            reasons.update(err["error"] for err in result["errors"])
+            _report_skips(rows_done + 1, rows_done + len(chunk), reasons)
+
+            rows_done += len(chunk)
+            inserted += result["inserted"]
+            skipped += sum(reasons.values())
+            _save_checkpoint(db, source, rows_done)
+            db.commit()
+
+            elapsed = time.perf_counter() - started
+            rate = (rows_done - offset) / elapsed if elapsed > 0 else 0.0
+            print(f"  {rows_done:,} rows read, {inserted:,} inserted ({rate:,.0f} rows/s)")
+
+    print(f"[transactions] Done: {inserted:,} inserted, {skipped:,} skipped")
+
+
+def _parse_budget_row(row: Dict[str, str]) -> Dict:
+    return {
+        "user_id": int(row["user_id"]),
+        "category_name": row["category_name"].strip(),
+        "month": row["month"].strip(),       # 'YYYY-MM'
+        "amount": float(row["amount"]),
+    }
+
+
+def load_budgets(db: Session, csv_path: Path, chunk_size: int = 5_000) -> None:
+    """
+    Load budgets.csv in chunks of `chunk_size` rows. Users and categories
+    of a chunk are resolved together (ingest.existing_user_ids /
+    resolve_categories; missing categories are created as expense), its
+    existing budgets are fetched in one query and updated in place, and
+    the chunk is committed once.
+    """
+    print(f"[budgets] Loading from {csv_path} (chunk_size={chunk_size})")
+    cache = ingest.IngestCache()
+    rows_done = created = updated = skipped = 0
+
+    with csv_path.open("r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while True:
+            chunk = list(itertools.islice(reader, chunk_size))
+            if not chunk:
+                break
+
+            batch = []
+            reasons = Counter()
+            for row in chunk:
+                try:
+                    batch.append(_parse_budget_row(row))
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    reasons["unparseable"] += 1
+
+            known_users = ingest.existing_user_ids(db, (b["user_id"] for b in batch), cache)
+            unknown = sum(1 for b in batch if b["user_id"] not in known_users)
+            if unknown:
+                reasons["User not found"] += unknown
+            batch = [b for b in batch if b["user_id"] in known_users]
+
+            cat_ids, _ = ingest.resolve_categories(
+                db, {(b["user_id"], b["category_name"]): "expense" for b in batch}, cache
             )
-            if existing:
-                print(
-                    f"  - Updating budget for user={user_id}, "
-                    f"cat={category_name}, month={month}"
-                )
-                existing.amount = amount
-            else:
-                b = models.Budget(
-                    user_id=user_id,
-                    category_id=cat.id,
-                    month=month,
-                    amount=amount,
-                    created_at=datetime.utcnow(),  # 👈 set created_at if your model has this field
+            for b in batch:
+                b["category_id"] = cat_ids[(b["user_id"], b["category_name"])]
+
+            keys = sorted({(b["user_id"], b["category_id"], b["month"]) for b in batch})
+            existing = {}
+            for i in range(0, len(keys), _BUDGET_KEYS_PER_QUERY):
+                rows = (
+                    db.query(models.Budget)
+                    .filter(
+                        tuple_(models.Budget.user_id, models.Budget.category_id, models.Budget.month)
+                        .in_(keys[i:i + _BUDGET_KEYS_PER_QUERY])
+                    )
+                    .order_by(models.Budget.id)
+                    .all()
                 )
-                db.add(b)
-                print(
-                    f"  + Created budget: user={user_id}, cat={category_name}, "
-                    f"month={month}, amount={amount}"
+                for budget in rows:
+                    existing.setdefault((budget.user_id, budget.category_id, budget.month), budget)
+
+            now = datetime.utcnow()
+            for b in batch:
+                key = (b["user_id"], b["category_id"], b["month"])
+                budget = existing.get(key)
+                if budget is not None:
+                    budget.amount = b["amount"]
+                    updated += 1
+                    continue
+                existing[key] = models.Budget(
+                    user_id=b["user_id"],
+                    category_id=b["category_id"],
+                    month=b["month"],
+                    amount=b["amount"],
+                    created_at=now,
                 )
-        db.commit()
+                db.add(existing[key])
+                created += 1
+
+            bump_data_version(db, {b["user_id"] for b in batch})
+            db.commit()
+
+            _report_skips(rows_done + 1, rows_done + len(chunk), reasons)
+            rows_done += len(chunk)
+            skipped += sum(reasons.values())
+            print(f"  {rows_done:,} rows read, {created:,} created, {updated:,} updated")
+
+    print(f"[budgets] Done: {created:,} created, {updated:,} updated, {skipped:,} skipped")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Load demo/historical data from CSV files.")
+    parser.add_argument(
+        "--transactions", type=Path, default=DATA_DIR / "transactions.csv",
+        help="transactions CSV to stream (default: data/transactions.csv)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    parser.add_argument(
+        "--no-resume", action="store_true",
+        help="ignore the saved checkpoint and load the transactions file from the top",
+    )
+    args = parser.parse_args()
+
     print("=== CSV Demo Data Loader ===")
     print(f"DATA_DIR = {DATA_DIR}")
 
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     db: Session = SessionLocal()
 
     # We need at least one user to attach base categories to.
@@ -185,7 +276,7 @@ def main():
     print(f"Using default_user_id={default_user_id} for categories.csv")
 
     cat_csv = DATA_DIR / "categories.csv"
-    tx_csv = DATA_DIR / "transactions.csv"
+    tx_csv = args.transactions
     bud_csv = DATA_DIR / "budgets.csv"
 
     if cat_csv.exists():
@@ -194,12 +285,12 @@ def main():
         print("[categories] categories.csv not found, skipping.")
 
     if tx_csv.exists():
-        load_transactions(db, tx_csv)
+        load_transactions(db, tx_csv, chunk_size=args.chunk_size, resume=not args.no_resume)
     else:
-        print("[transactions] transactions.csv not found, skipping.")
+        print(f"[transactions] {tx_csv} not found, skipping.")
 
     if bud_csv.exists():
-        load_budgets(db, bud_csv)
+        load_budgets(db, bud_csv, chunk_size=args.chunk_size)
     else:
         print("[budgets] budgets.csv not found, skipping.")
 
@@ -1,12 +1,22 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Optional
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from db import engine, Base, get_db
-import models, schemas
+from db import engine, Base, SessionLocal, get_db, API_MODE
+from migrate import run_migrations
+import models, schemas, rollups, ingest, anomaly_stats
+from fulltext import search_transactions
+from cache import answer_cache, bump_data_version, cached_call, result_cache
 
-from rag import build_monthly_summary, answer_question
+from rag import build_monthly_summary, complete_answer, prepare_answer, stream_answer
+from llm_client import ollama
 from cluster import build_spending_feature_vector, cluster_user_profile
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -17,8 +27,10 @@ from sqlalchemy import func
 from anomaly import (
     detect_daily_anomalies,
     detect_daily_anomalies_by_category,
+    detect_daily_anomalies_all_categories,
     detect_transaction_anomalies,
     build_daily_plot_series,
+    build_anomaly_report,
 )
 
 from cluster import (
@@ -31,6 +43,7 @@ from cluster import (
 
 # Create tables if they don't exist
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(title="AI Expense Tracker Backend - Step 3")
 app.add_middleware(
@@ -105,6 +118,7 @@ def create_category(cat_in: schemas.CategoryCreate, db: Session = Depends(get_db
         created_at=now_str(),
     )
     db.add(category)
+    bump_data_version(db, [cat_in.user_id])
     db.commit()
     db.refresh(category)
     return category
@@ -141,8 +155,7 @@ def create_transaction(tx_in: schemas.TransactionCreate, db: Session = Depends(g
             created_at=now_str(),
         )
         db.add(category)
-        db.commit()
-        db.refresh(category)
+        db.flush()  # assigns category.id; committed together with the transaction
 
     tx = models.Transaction(
         user_id=tx_in.user_id,
@@ -153,11 +166,40 @@ def create_transaction(tx_in: schemas.TransactionCreate, db: Session = Depends(g
         created_at=now_str(),
     )
     db.add(tx)
+    rollup_rows = [
+        {
+            "user_id": tx.user_id,
+            "category_id": tx.category_id,
+            "amount": tx.amount,
+            "transaction_date": tx.transaction_date,
+        }
+    ]
+    # keep the rollups in the same DB transaction as the new row
+    rollups.apply_transactions(db, rollup_rows)
+    tx.z_score = anomaly_stats.record_transactions(db, rollup_rows)[0]
+    bump_data_version(db, [tx.user_id])
     db.commit()
     db.refresh(tx)
     return tx
 
 
+@app.post("/transactions/bulk", response_model=schemas.TransactionBulkResult)
+def create_transactions_bulk(
+    req: schemas.TransactionBulkCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Insert many transactions in one DB transaction. Categories are resolved
+    or created for the whole batch at once; invalid rows are skipped and
+    reported in `errors` by their index in the request.
+    """
+    result = ingest.insert_transactions(
+        db, [tx.model_dump() for tx in req.transactions]
+    )
+    db.commit()
+    return result
+
+
 @app.get("/transactions/", response_model=list[schemas.TransactionOut])
 def list_transactions(
     user_id: int,
@@ -171,6 +213,22 @@ def list_transactions(
     )
 
 
+@app.get("/transactions/search", response_model=schemas.TransactionSearchOut)
+def api_search_transactions(
+    user_id: int,
+    q: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over descriptions (FTS5). count/total aggregate every
+    match in the date range; `transactions` lists the newest `limit`.
+    """
+    return search_transactions(db, user_id, q, date_from, date_to, limit)
+
+
 # ---------- Budgets ----------
 
 @app.post("/budgets/", response_model=schemas.BudgetOut)
@@ -195,6 +253,7 @@ def create_budget(b_in: schemas.BudgetCreate, db: Session = Depends(get_db)):
         created_at=now_str(),
     )
     db.add(budget)
+    bump_data_version(db, [b_in.user_id])
     db.commit()
     db.refresh(budget)
     return budget
@@ -241,16 +300,76 @@ def api_list_summaries(user_id: int, db: Session = Depends(get_db)):
 
 # ---------- RAG-style Q&A endpoint ----------
 
-@app.post("/rag/ask", response_model=schemas.QAResponse)
-def api_rag_ask(req: schemas.QARequest, db: Session = Depends(get_db)):
-    # verify user exists
-    user = db.query(models.User).filter(models.User.id == req.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+# The DB half of a question (retrieval, SQL plans, summaries) runs on its own
+# small pool instead of Starlette's threadpool, so a burst of chat questions
+# cannot take the threads and DB connections that CRUD and analytics need.
+# Beyond RAG_MAX_QUEUED waiting questions, new ones get a 503.
+RAG_DB_WORKERS = int(os.environ.get("RAG_DB_WORKERS", 2))
+RAG_MAX_QUEUED = int(os.environ.get("RAG_MAX_QUEUED", 64))
+_rag_executor = ThreadPoolExecutor(max_workers=RAG_DB_WORKERS, thread_name_prefix="rag-db")
+_rag_queue = {"pending": 0, "rejected": 0}
+
+
+def _prepare_rag_answer(req: schemas.QARequest):
+    # Own short-lived session: the DB connection goes back to the pool before
+    # the (much longer) LLM call starts.
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.id == req.user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return prepare_answer(db, req.user_id, req.question)
+
+
+async def _run_rag_prepare(req: schemas.QARequest):
+    # only touched from the event loop, so no lock is needed
+    if _rag_queue["pending"] >= RAG_DB_WORKERS + RAG_MAX_QUEUED:
+        _rag_queue["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Too many questions in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _rag_queue["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_rag_executor, _prepare_rag_answer, req)
+    finally:
+        _rag_queue["pending"] -= 1
+
 
-    answer, debug = answer_question(db, req.user_id, req.question)
+@app.post("/rag/ask", response_model=schemas.QAResponse)
+async def api_rag_ask(req: schemas.QARequest):
+    # DB work on the RAG pool; the Ollama call is awaited on the shared
+    # async client (llm_client.py) without holding a thread or a connection
+    prep = await _run_rag_prepare(req)
+    answer, debug = await complete_answer(prep)
     return schemas.QAResponse(answer=answer, debug=debug)
 
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/rag/ask/stream")
+async def api_rag_ask_stream(req: schemas.QARequest):
+    """
+    Same answer as /rag/ask, streamed as Server-Sent Events:
+    `token` events carry answer text as Ollama produces it, then one
+    trailing `debug` event and a final `done`. If the client disconnects,
+    the generator is cancelled and the Ollama request is closed with it.
+    """
+    prep = await _run_rag_prepare(req)
+
+    async def events():
+        async for event, data in stream_answer(prep):
+            yield _sse(event, data)
+        yield _sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------- Step 7: Daily Anomaly Detection (Z-score) ----------
 
 @app.post("/anomalies/daily", response_model=schemas.DetectDailyAnomaliesResponse)
@@ -263,11 +382,22 @@ def api_detect_daily_anomalies(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    result_dict = detect_daily_anomalies(
-        db=db,
-        user_id=req.user_id,
-        month=req.month,
-        z_threshold=req.z_threshold,
+    result_dict = cached_call(
+        db, "/anomalies/daily", req.user_id,
+        {
+            "month": req.month,
+            "z_threshold": req.z_threshold,
+            "method": req.method,
+            "baseline_months": req.baseline_months,
+        },
+        lambda s: detect_daily_anomalies(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            z_threshold=req.z_threshold,
+            method=req.method,
+            baseline_months=req.baseline_months,
+        ),
     )
     # Pydantic will validate/convert the dict to DetectDailyAnomaliesResponse
     return result_dict
@@ -283,12 +413,39 @@ def api_detect_daily_anomalies_by_category(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    result_dict = detect_daily_anomalies_by_category(
-        db=db,
-        user_id=req.user_id,
-        month=req.month,
-        category_name=req.category_name,
-        z_threshold=req.z_threshold,
+    result_dict = cached_call(
+        db, "/anomalies/daily/by-category", req.user_id,
+        {"month": req.month, "category_name": req.category_name, "z_threshold": req.z_threshold},
+        lambda s: detect_daily_anomalies_by_category(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            category_name=req.category_name,
+            z_threshold=req.z_threshold,
+        ),
+    )
+    return result_dict
+
+
+@app.post("/anomalies/daily/by-category/all", response_model=schemas.DetectAllCategoriesResponse)
+def api_detect_daily_anomalies_all_categories(
+    req: schemas.DetectAllCategoriesRequest,
+    db: Session = Depends(get_db),
+):
+    user = db.query(models.User).filter(models.User.id == req.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    result_dict = cached_call(
+        db, "/anomalies/daily/by-category/all", req.user_id,
+        {"month": req.month, "z_threshold": req.z_threshold, "top_k": req.top_k},
+        lambda s: detect_daily_anomalies_all_categories(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            z_threshold=req.z_threshold,
+            top_k=req.top_k,
+        ),
     )
     return result_dict
 
@@ -302,11 +459,15 @@ def api_detect_transaction_anomalies(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    result_dict = detect_transaction_anomalies(
-        db=db,
-        user_id=req.user_id,
-        month=req.month,
-        z_threshold=req.z_threshold,
+    result_dict = cached_call(
+        db, "/anomalies/transactions", req.user_id,
+        {"month": req.month, "z_threshold": req.z_threshold},
+        lambda s: detect_transaction_anomalies(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            z_threshold=req.z_threshold,
+        ),
     )
     return result_dict
 
@@ -320,14 +481,48 @@ def api_daily_plot_series(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    result_dict = build_daily_plot_series(
-        db=db,
-        user_id=req.user_id,
-        month=req.month,
-        bands_sigma=req.z_threshold,
+    result_dict = cached_call(
+        db, "/anomalies/daily/plot", req.user_id,
+        {"month": req.month, "bands_sigma": req.z_threshold},
+        lambda s: build_daily_plot_series(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            bands_sigma=req.z_threshold,
+        ),
     )
     return result_dict
 
+
+@app.post("/anomalies/report", response_model=schemas.AnomalyReportResponse)
+def api_anomaly_report(
+    req: schemas.AnomalyReportRequest,
+    db: Session = Depends(get_db),
+):
+    """Daily, transaction, per-category and plot results for one month, from one query."""
+    user = db.query(models.User).filter(models.User.id == req.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return cached_call(
+        db, "/anomalies/report", req.user_id,
+        {"month": req.month, "z_threshold": req.z_threshold},
+        lambda s: build_anomaly_report(
+            db=s,
+            user_id=req.user_id,
+            month=req.month,
+            z_threshold=req.z_threshold,
+        ),
+    )
+
+@app.get("/anomalies/baseline", response_model=schemas.AnomalyBaselineOut)
+def api_anomaly_baseline(user_id: int, db: Session = Depends(get_db)):
+    """Running statistics new transactions are scored against (anomaly_stats.py)."""
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return anomaly_stats.user_baseline(db, user_id)
+
 @app.post("/cluster/segments", response_model=schemas.ClusterResponse)
 def api_cluster_segments(
     req: schemas.ClusterRequest,
@@ -337,7 +532,10 @@ def api_cluster_segments(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    features = build_spending_feature_vector(db, req.user_id, req.month)
+    features = cached_call(
+        db, "/cluster/segments:features", req.user_id, {"month": req.month},
+        lambda s: build_spending_feature_vector(s, req.user_id, req.month),
+    )
     result = cluster_user_profile(features)
 
     return {
@@ -360,7 +558,10 @@ def api_cluster_segments(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    features = build_spending_feature_vector(db, req.user_id, req.month)
+    features = cached_call(
+        db, "/cluster/segments:features", req.user_id, {"month": req.month},
+        lambda s: build_spending_feature_vector(s, req.user_id, req.month),
+    )
     result = cluster_user_profile_rule_based(features)
 
     return {
@@ -409,25 +610,10 @@ def get_monthly_summary_compat(
     month: str,
     db: Session = Depends(get_db),
 ):
-    # Reuse the same logic as /analytics/summary
-    # If you defined a helper function, call that. Otherwise, copy the body.
-    total_income = (
-        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "income")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .scalar()
-    )
-
-    total_expense = (
-        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .scalar()
-    )
+    # Same numbers as /analytics/summary, read from the monthly rollup
+    totals = rollups.month_totals_by_type(db, user_id, month)
+    total_income = totals["income"]
+    total_expense = totals["expense"]
 
     # Net savings = income minus absolute expense (expense totals are stored negative)
     net_savings = float(total_income) - abs(float(total_expense))
@@ -445,31 +631,7 @@ def get_monthly_summary_compat(
 # Analytics API used by the frontend dashboard
 # -------------------------------------------------------------------
 
-class AnalyticsSummaryOut(BaseModel):
-    user_id: int
-    month: str
-    total_income: float
-    total_expense: float
-    net_savings: float
-
-
-class AnalyticsByCategoryOut(BaseModel):
-    category: str
-    total_expense: float
-
-
-class BudgetCompareOut(BaseModel):
-    category: str
-    month: str
-    budget: float
-    actual: float
-    difference: float  # actual - budget
-
-
-def _month_filter(column, month: str):
-    # transaction_date is stored as 'YYYY-MM-DD'
-    # we compare just the 'YYYY-MM' prefix
-    return func.substr(column, 1, 7) == month
+from schemas import AnalyticsSummaryOut, AnalyticsByCategoryOut, BudgetCompareOut
 
 
 @app.get("/analytics/summary", response_model=AnalyticsSummaryOut)
@@ -478,25 +640,12 @@ def api_analytics_summary(
     month: str,
     db: Session = Depends(get_db),
 ):
-    # total income
-    total_income = (
-        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "income")
-        .filter(_month_filter(models.Transaction.transaction_date, month))
-        .scalar()
-    )
-
-    # total expense
-    total_expense = (
-        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(_month_filter(models.Transaction.transaction_date, month))
-        .scalar()
+    totals = cached_call(
+        db, "/analytics/summary", user_id, {"month": month},
+        lambda s: rollups.month_totals_by_type(s, user_id, month),
     )
+    total_income = totals["income"]
+    total_expense = totals["expense"]
 
     return AnalyticsSummaryOut(
         user_id=user_id,
@@ -514,18 +663,9 @@ def api_analytics_by_category(
     month: str,
     db: Session = Depends(get_db),
 ):
-    rows = (
-        db.query(
-            models.Category.name.label("category"),
-            func.coalesce(func.sum(models.Transaction.amount), 0.0).label("total_expense"),
-        )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(_month_filter(models.Transaction.transaction_date, month))
-        .group_by(models.Category.id, models.Category.name)
-        .order_by(func.sum(models.Transaction.amount).desc())
-        .all()
+    rows = cached_call(
+        db, "/analytics/by_category", user_id, {"month": month},
+        lambda s: rollups.category_totals(s, user_id, month, "expense"),
     )
 
     return [
@@ -543,28 +683,9 @@ def api_analytics_budget_compare(
     """
     For each budgeted category in this month, compare budget vs actual expense.
     """
-    rows = (
-        db.query(
-            models.Category.name.label("category"),
-            models.Budget.month,
-            models.Budget.amount.label("budget_amount"),
-            func.coalesce(func.sum(models.Transaction.amount), 0.0).label("actual_spent"),
-        )
-        .join(models.Category, models.Budget.category_id == models.Category.id)
-        .outerjoin(
-            models.Transaction,
-            (models.Transaction.user_id == models.Budget.user_id)
-            & (models.Transaction.category_id == models.Budget.category_id)
-            & _month_filter(models.Transaction.transaction_date, month),
-        )
-        .filter(models.Budget.user_id == user_id)
-        .filter(models.Budget.month == month)
-        .group_by(
-            models.Category.name,
-            models.Budget.month,
-            models.Budget.amount,
-        )
-        .all()
+    rows = cached_call(
+        db, "/analytics/budget_compare", user_id, {"month": month},
+        lambda s: rollups.budget_vs_actual(s, user_id, month),
     )
 
     result: list[BudgetCompareOut] = []
@@ -583,6 +704,45 @@ def api_analytics_budget_compare(
     return result
 
 
+# ---------- Result cache ----------
+
+@app.get("/cache/stats", response_model=schemas.CacheStatsOut)
+def api_cache_stats():
+    """Hit/miss/eviction counters of the in-process result cache (cache.py)."""
+    return result_cache.stats()
+
+
+@app.get("/rag/cache/stats", response_model=schemas.CacheStatsOut)
+def api_rag_cache_stats():
+    """Counters of the /rag/ask answer cache."""
+    return answer_cache.stats()
+
+
+@app.get("/llm/stats", response_model=schemas.LLMStatsOut)
+def api_llm_stats():
+    """
+    Circuit breaker state, queue depth and call counters of the Ollama client
+    (llm_client.py), plus the RAG DB pool's backlog.
+    """
+    return {
+        **ollama.stats(),
+        "rag_db_workers": RAG_DB_WORKERS,
+        "rag_db_pending": _rag_queue["pending"],
+        "rag_db_rejected": _rag_queue["rejected"],
+    }
+
+
+app.add_event_handler("shutdown", ollama.aclose)
+app.add_event_handler("shutdown", lambda: _rag_executor.shutdown(wait=False))
+
+
+# API_MODE=async: serve the async handlers (async_api.py) for the routes it defines
+if API_MODE == "async":
+    import async_api
+
+    async_api.install(app)
+
+
 # from fastapi import FastAPI, Depends, HTTPException
 # from sqlalchemy.orm import Session
 # from . import models, schemas
@@ -0,0 +1,166 @@
+"""
+In-place schema upgrades for an existing SQLite database.
+
+Base.metadata.create_all() only creates missing tables; it never adds
+columns or indexes to tables that already exist. Every step below is
+idempotent, so run_migrations() is safe to call on each startup:
+
+    python migrate.py
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from anomaly_stats import AMOUNT_STATS_AGGREGATE, DAILY_STATS_AGGREGATE
+from fulltext import FTS_DDL, FTS_TABLE
+from rollups import DAILY_AGGREGATE, MONTHLY_AGGREGATE
+
+
+def _has_table(conn: Connection, table: str) -> bool:
+    row = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": table},
+    ).first()
+    return row is not None
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+    return any(row[1] == column for row in rows)
+
+
+def _add_transaction_month_key(conn: Connection) -> None:
+    """
+    transactions.month_key = yyyymm of transaction_date, plus the
+    (user_id, month_key, category_id) index that month filters seek on.
+    """
+    if not _has_table(conn, "transactions"):
+        return
+    if not _has_column(conn, "transactions", "month_key"):
+        conn.execute(
+            text("ALTER TABLE transactions ADD COLUMN month_key INTEGER NOT NULL DEFAULT 0")
+        )
+        # backfill existing rows (same rule as models.month_key)
+        conn.execute(
+            text(
+                "UPDATE transactions SET month_key = "
+                "CAST(substr(transaction_date, 1, 4) AS INTEGER) * 100 "
+                "+ CAST(substr(transaction_date, 6, 2) AS INTEGER)"
+            )
+        )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS idx_transactions_user_month_cat "
+            "ON transactions(user_id, month_key, category_id)"
+        )
+    )
+
+
+def _add_user_data_version(conn: Connection) -> None:
+    """users.data_version: per-user write counter that keys the result cache."""
+    if _has_table(conn, "users") and not _has_column(conn, "users", "data_version"):
+        conn.execute(
+            text("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+        )
+
+
+def _add_summary_data_version(conn: Connection) -> None:
+    """
+    monthly_summaries.data_version: the users.data_version a summary was
+    built from. Existing rows get -1, so they are rebuilt on first use.
+    """
+    if _has_table(conn, "monthly_summaries") and not _has_column(
+        conn, "monthly_summaries", "data_version"
+    ):
+        conn.execute(
+            text("ALTER TABLE monthly_summaries ADD COLUMN data_version INTEGER NOT NULL DEFAULT -1")
+        )
+
+
+def _backfill_rollups(conn: Connection) -> None:
+    """Fill each rollup table once for databases that predate it."""
+    if not _has_table(conn, "transactions"):
+        return
+    if not conn.execute(text("SELECT 1 FROM transactions LIMIT 1")).first():
+        return
+
+    targets = [
+        (
+            "monthly_rollups",
+            "(user_id, month_key, category_id, total_amount, tx_count, min_amount, max_amount)",
+            MONTHLY_AGGREGATE,
+        ),
+        (
+            "daily_rollups",
+            "(user_id, month_key, transaction_date, category_id, total_amount, tx_count)",
+            DAILY_AGGREGATE,
+        ),
+    ]
+    for table, columns, aggregate in targets:
+        if not _has_table(conn, table):
+            continue
+        if conn.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first():
+            continue
+        conn.execute(text(f"INSERT INTO {table} {columns} {aggregate}"))
+
+
+def _add_transaction_z_score(conn: Connection) -> None:
+    """transactions.z_score: set on insert; existing rows stay NULL (unscored)."""
+    if _has_table(conn, "transactions") and not _has_column(conn, "transactions", "z_score"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN z_score REAL"))
+
+
+def _backfill_anomaly_stats(conn: Connection) -> None:
+    """
+    Fill anomaly_stats once from existing transactions and daily_rollups
+    (so it must run after _backfill_rollups).
+    """
+    if not _has_table(conn, "anomaly_stats") or not _has_table(conn, "daily_rollups"):
+        return
+    if conn.execute(text("SELECT 1 FROM anomaly_stats LIMIT 1")).first():
+        return
+    for aggregate in (AMOUNT_STATS_AGGREGATE, DAILY_STATS_AGGREGATE):
+        conn.execute(
+            text(f"INSERT INTO anomaly_stats (user_id, kind, category_id, count, mean, m2) {aggregate}")
+        )
+
+
+def _add_transaction_fts(conn: Connection) -> None:
+    """
+    transactions_fts (FTS5 over transactions.description) and its sync
+    triggers; indexes the existing rows when first created. Skipped if this
+    SQLite build has no FTS5 (search then falls back to LIKE).
+    """
+    if not _has_table(conn, "transactions"):
+        return
+    has_fts5 = conn.execute(
+        text("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'")
+    ).first()
+    if not has_fts5:
+        print("SQLite has no FTS5; /transactions/search will use LIKE scans.")
+        return
+    created = not _has_table(conn, FTS_TABLE)
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    if created:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def run_migrations(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _add_transaction_month_key(conn)
+        _add_user_data_version(conn)
+        _add_summary_data_version(conn)
+        _backfill_rollups(conn)
+        _add_transaction_z_score(conn)
+        _backfill_anomaly_stats(conn)
+        _add_transaction_fts(conn)
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    run_migrations(engine)
+    print("Migrations applied.")
@@ -1,8 +1,25 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from db import Base
 
 
+def month_key(value: str) -> int:
+    """
+    'YYYY-MM' or 'YYYY-MM-DD' -> integer yyyymm (e.g. '2025-12-03' -> 202512).
+    Returns 0 for strings that do not start with a year and month,
+    so a malformed month simply matches no rows.
+    """
+    try:
+        year, month = value.split("-")[:2]
+        return int(year) * 100 + int(month)
+    except (AttributeError, ValueError):
+        return 0
+
+
+def _default_month_key(context) -> int:
+    return month_key(context.get_current_parameters()["transaction_date"])
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -11,6 +28,9 @@ class User(Base):
     email = Column(String, unique=True, nullable=False, index=True)
     password_hash = Column(String, nullable=False)
     created_at = Column(Text, nullable=False)
+    # bumped in the same DB transaction as every write to this user's
+    # transactions, categories or budgets; keys the result cache (cache.py)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     categories = relationship("Category", back_populates="user", cascade="all, delete-orphan")
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
@@ -40,12 +60,20 @@ class Transaction(Base):
     category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
     amount = Column(Float, nullable=False)
     transaction_date = Column(String, nullable=False)  # YYYY-MM-DD
+    # yyyymm derived from transaction_date, so month filters can use an index
+    month_key = Column(Integer, nullable=False, default=_default_month_key)
     description = Column(Text)
     created_at = Column(Text, nullable=False)
+    # amount's z-score within its category when written (anomaly_stats.py)
+    z_score = Column(Float, nullable=True)
 
     user = relationship("User", back_populates="transactions")
     category = relationship("Category", back_populates="transactions")
 
+    __table_args__ = (
+        Index("idx_transactions_user_month_cat", "user_id", "month_key", "category_id"),
+    )
+
 
 class Budget(Base):
     __tablename__ = "budgets"
@@ -71,5 +99,97 @@ class MonthlySummary(Base):
     total_income = Column(Float, nullable=False, default=0.0)
     summary_text = Column(Text)
     created_at = Column(Text, nullable=False)
+    # users.data_version this row was computed from; -1 = unknown (always stale)
+    data_version = Column(Integer, nullable=False, default=-1, server_default="-1")
 
     user = relationship("User", back_populates="summaries")
+
+
+class MonthlyRollup(Base):
+    """
+    Per (user, month, category) aggregate of transactions, kept up to date
+    on every transaction write (see rollups.py). Month-level analytics read
+    this instead of re-aggregating raw transactions.
+    """
+    __tablename__ = "monthly_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month_key = Column(Integer, primary_key=True)  # yyyymm
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    tx_count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float, nullable=False)
+    max_amount = Column(Float, nullable=False)
+
+
+class DailyRollup(Base):
+    """
+    Per (user, day, category) sum and count of transactions, kept up to date
+    on every transaction write (see rollups.py). Daily anomaly detectors and
+    plot series read this instead of grouping raw transactions.
+    """
+    __tablename__ = "daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month_key = Column(Integer, primary_key=True)  # yyyymm, leads the date so months are one range
+    transaction_date = Column(String, primary_key=True)  # YYYY-MM-DD
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+
+class Anomaly(Base):
+    """
+    A flagged point written by the batch anomaly sweep (anomaly_batch.py):
+    one user's daily expense total with the mean/std of the month it was
+    scored against. Re-running the sweep over a month range replaces the
+    detector's rows for those months.
+    """
+    __tablename__ = "anomalies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    detector = Column(String, nullable=False)  # e.g. 'daily_zscore'
+    month_key = Column(Integer, nullable=False)  # yyyymm
+    anomaly_date = Column(String, nullable=False)  # YYYY-MM-DD
+    total_amount = Column(Float, nullable=False)
+    mean = Column(Float, nullable=False)
+    std = Column(Float, nullable=False)
+    z_score = Column(Float, nullable=False)
+    z_threshold = Column(Float, nullable=False)
+    detected_at = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("idx_anomalies_user_month", "user_id", "month_key"),
+        Index("idx_anomalies_detector_month", "detector", "month_key"),
+    )
+
+
+class AnomalyStat(Base):
+    """
+    Running count / mean / M2 (Welford) of one user's transaction amounts
+    per category (kind 'amount') or of their daily expense totals (kind
+    'daily_total', category_id 0). Updated on every transaction write (see
+    anomaly_stats.py), so new rows are scored without a scan.
+    """
+    __tablename__ = "anomaly_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)  # 'amount' or 'daily_total'
+    category_id = Column(Integer, primary_key=True)  # 0 for 'daily_total'
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)
+
+
+class ImportCheckpoint(Base):
+    """
+    How many data rows of a CSV export the loader has committed. Written in
+    the same DB transaction as each chunk, so a resumed import never skips
+    or duplicates rows.
+    """
+    __tablename__ = "import_checkpoints"
+
+    source = Column(String, primary_key=True)  # absolute path of the CSV file
+    rows_done = Column(Integer, nullable=False, default=0)
+    updated_at = Column(Text, nullable=False)
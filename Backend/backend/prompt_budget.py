@@ -0,0 +1,199 @@
+"""
+Fit a month of transactions into the LLM prompt under a token budget.
+
+Instead of listing raw rows (and cutting off after the first 200), the
+month is pre-aggregated into one line per (description, category) with a
+count, a total and the date range. Lines whose description or category
+matches a word of the question come first, so item questions ("how much
+did I spend on Pizza?") are answered from an exact, pre-summed line. The
+rest follow by amount until the budget is used up, and whatever does not
+fit is summarised in a final "not shown" line, so totals are never
+silently lost. Raw rows matching the question are added if room is left.
+
+Token counts are estimated at ~4 characters per token, which is close
+enough for Llama-style tokenizers and needs no tokenizer dependency.
+
+  RAG_PROMPT_TOKEN_BUDGET   whole prompt, template included (default 2048,
+                            Ollama's default context window)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+RAG_PROMPT_TOKEN_BUDGET = int(os.environ.get("RAG_PROMPT_TOKEN_BUDGET", 2048))
+
+# never squeeze the transaction block below this, even for a long template
+MIN_BLOCK_TOKENS = 200
+
+_STOPWORDS = {
+    "the", "and", "for", "did", "does", "was", "were", "what", "whats", "how",
+    "much", "many", "spend", "spent", "spending", "money", "on", "in", "my", "me",
+    "this", "that", "month", "last", "year", "total", "show", "tell", "about",
+    "with", "from", "have", "has", "any", "all", "which", "where", "when", "why",
+    "are", "you", "can", "could", "would", "should", "please", "transactions",
+    "transaction", "category", "categories", "top", "is", "it", "of", "to", "a",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december", "jan", "feb", "mar", "apr",
+    "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def question_terms(question: str) -> List[str]:
+    """Content words of the question, e.g. ['pizza'] for 'How much on Pizza?'."""
+    terms = []
+    for word in re.findall(r"[a-z][a-z']+", question.lower()):
+        word = word.strip("'")
+        if len(word) < 3 or word in _STOPWORDS or word in terms:
+            continue
+        terms.append(word)
+    return terms
+
+
+def _matches(text: str, terms: Sequence[str]) -> bool:
+    text = text.lower()
+    for term in terms:
+        # "pizzas" should still find "Pizza"
+        if term in text or (len(term) > 3 and term.endswith("s") and term[:-1] in text):
+            return True
+    return False
+
+
+@dataclass
+class ItemGroup:
+    description: str
+    category: str
+    count: int
+    total: float
+    first_date: str
+    last_date: str
+    relevant: bool
+    month: str = ""
+
+
+def aggregate_transactions(
+    rows: Sequence[tuple], terms: Sequence[str], by_month: bool = False
+) -> List[ItemGroup]:
+    """
+    Group (date, amount, description, category_name) rows by description
+    (case-insensitive) and category, and by month if `by_month`. Matching
+    groups first, then by the size of their total.
+    """
+    groups = {}
+    for date, amount, desc, cat_name in rows:
+        desc = (desc or "").strip()
+        cat_name = cat_name or ""
+        month = date[:7] if by_month else ""
+        key = (desc.lower(), cat_name, month)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = ItemGroup(
+                description=desc,
+                category=cat_name,
+                count=1,
+                total=float(amount),
+                first_date=date,
+                last_date=date,
+                relevant=bool(terms) and _matches(f"{desc} {cat_name}", terms),
+                month=month,
+            )
+            continue
+        group.count += 1
+        group.total += float(amount)
+        group.first_date = min(group.first_date, date)
+        group.last_date = max(group.last_date, date)
+    return sorted(groups.values(), key=lambda g: (not g.relevant, -abs(g.total)))
+
+
+def compact_transactions(question: str, rows: Sequence[tuple], token_budget: int) -> Tuple[str, str]:
+    """
+    Transaction block for the prompt within `token_budget` tokens.
+
+    Returns (block, note) where note says how much had to be left out.
+    """
+    if not rows:
+        return "No transactions for this month.", "items=0"
+
+    terms = question_terms(question)
+    groups = aggregate_transactions(rows, terms)
+
+    lines = ["description | category | count | total | dates"]
+    used = estimate_tokens(lines[0]) + 1
+    reserve = 30  # for the "not shown" line
+    shown = 0
+    for group in groups:
+        dates = group.first_date if group.first_date == group.last_date else f"{group.first_date}..{group.last_date}"
+        line = f"{group.description} | {group.category} | {group.count} | {group.total:.2f} | {dates}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget - reserve:
+            break
+        lines.append(line)
+        used += cost
+        shown += 1
+
+    hidden = groups[shown:]
+    if hidden:
+        lines.append(
+            f"(+ {len(hidden)} more items, {sum(g.count for g in hidden)} transactions, "
+            f"total {sum(g.total for g in hidden):.2f}, not shown)"
+        )
+        used += estimate_tokens(lines[-1]) + 1
+
+    # individual rows for the items the question is about, if room is left
+    if terms and not hidden:
+        matching = [r for r in rows if _matches(f"{r[2] or ''} {r[3] or ''}", terms)]
+        header = "Transactions matching the question (date | amount | description | category):"
+        used += estimate_tokens(header) + 2
+        row_lines = []
+        for date, amount, desc, cat_name in matching:
+            line = f"{date} | {float(amount):.2f} | {desc or ''} | {cat_name}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                break
+            row_lines.append(line)
+            used += cost
+        if row_lines and len(row_lines) == len(matching):
+            lines.append("")
+            lines.append(header)
+            lines.extend(row_lines)
+
+    note = f"items={shown}/{len(groups)}; rows={len(rows)}"
+    return "\n".join(lines), note
+
+
+def compact_related(rows: Sequence[tuple], n_matches: int, token_budget: int) -> str:
+    """
+    Block for the rows retrieval_index found for the question in any month,
+    as one line per item, category and month.
+    """
+    groups = aggregate_transactions(rows, (), by_month=True)
+    groups.sort(key=lambda g: (g.description.lower(), g.category, g.month))
+
+    lines = ["description | category | month | count | total"]
+    used = estimate_tokens(lines[0]) + 1
+    shown = 0
+    for group in groups:
+        line = f"{group.description} | {group.category} | {group.month} | {group.count} | {group.total:.2f}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget - 30:
+            break
+        lines.append(line)
+        used += cost
+        shown += 1
+
+    hidden = groups[shown:]
+    if hidden:
+        lines.append(
+            f"(+ {len(hidden)} more lines, {sum(g.count for g in hidden)} transactions, "
+            f"total {sum(g.total for g in hidden):.2f}, not shown)"
+        )
+    if n_matches > len(rows):
+        lines.append(f"(built from the {len(rows)} most relevant of {n_matches} matching transactions)")
+    return "\n".join(lines)
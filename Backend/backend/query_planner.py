@@ -0,0 +1,393 @@
+"""
+Structured query planner: aggregate questions answered with one SQL query.
+
+The rule-based answers used to need the whole RAGContext (summary, top
+categories and every transaction of one month) before they could say
+"you spent X". Here a question is turned into a Plan instead:
+
+  kind     spend_item | spend_total | income | savings | top_categories | month_delta
+  span     first..last month (YYYY-MM); None means the user's latest month
+  item     description words or category name, for spend_item
+  n        how many categories, for top_categories
+
+and each plan runs as a single parameterized aggregate over
+monthly_rollups (totals, categories, deltas) or transactions_fts joined to
+transactions (description terms), both seeking on (user_id, month_key).
+The SQL is compiled once per plan shape (kind, plus the description
+search backend) and reused for every user and date range. The latest
+month is resolved inside the same query, so nothing else is read first.
+
+Questions the planner does not recognise, or where a literal aggregate
+would be the wrong answer ("why", "how can I", "last month", single
+days), return None and go through retrieval and the LLM as before.
+
+  RAG_SQL_PLANNER   set to 0 to disable (default on)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import models
+from fulltext import FTS_TABLE, has_fts, match_expression
+from intent_router import ITEM_QUESTION, item_phrase, route_question
+
+RAG_SQL_PLANNER = os.environ.get("RAG_SQL_PLANNER", "1") != "0"
+
+
+@dataclass(frozen=True)
+class Plan:
+    kind: str
+    first: Optional[str] = None      # YYYY-MM; None = latest month with data
+    last: Optional[str] = None       # YYYY-MM; None = latest month with data
+    item: Optional[str] = None
+    n: int = 1
+
+
+# =======================
+# Question -> Plan
+# =======================
+
+_DELTA = re.compile(
+    r"month[- ]over[- ]month"
+    r"|\b(?:vs\.?|versus|compared? (?:to|with)|than|from) (?:the )?(?:last|previous|prior) month\b"
+)
+# questions that want reasoning or advice, or name a relative period the
+# planner does not resolve
+_NOT_AGGREGATE = re.compile(
+    r"\b(?:why|where|should|advice|tips?|suggest|recommend|reduce|cut|improve|increase"
+    r"|predict|forecast|next|average|per day|last (?:month|week|year)|today|yesterday)\b"
+    r"|\bhow (?:can|could|do|should)\b"
+)
+_TOP_CATEGORIES = re.compile(
+    r"\btop\s+(?:(\d+|one|two|three|four|five|ten)\s+)?(?:spending\s+|expense\s+)?categor(y|ies)\b"
+)
+_SAVINGS = re.compile(r"\b(?:savings?|saved|net)\b")
+_INCOME = re.compile(r"\b(?:income|earn(?:ed|ings)?|salary)\b")
+_SPEND_TOTAL = re.compile(r"\b(?:how much|total)\b.*\b(?:spen[dt]|spending|expenses?)\b")
+_YEAR = re.compile(r"\b(?:in|for|during)\s+(\d{4})\b")
+_RANGE_WORDS = re.compile(r"\b(?:between|from|to|through|until)\b")
+_ALL_TIME = re.compile(r"\b(?:all[- ]time|ever|overall)\b")
+
+# Plan.first/last placeholder for "this year", replaced by the current year at execute time
+THIS_YEAR = "this-year"
+
+_NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "ten": 10}
+
+
+def _span(q: str, months: Tuple[str, ...]) -> Optional[Tuple[Optional[str], Optional[str]]]:
+    """(first, last) month of the question; None if it names months ambiguously."""
+    if len(months) >= 2:
+        if not _RANGE_WORDS.search(q):
+            return None
+        return min(months), max(months)
+    if len(months) == 1:
+        if re.search(r"\bsince\b", q):
+            return months[0], None
+        return months[0], months[0]
+    year = _YEAR.search(q)
+    if year:
+        return f"{year.group(1)}-01", f"{year.group(1)}-12"
+    if "this year" in q:
+        # resolved in execute_plan: plans are cached across the new year
+        return THIS_YEAR, THIS_YEAR
+    if _ALL_TIME.search(q):
+        return "0000-00", None
+    return None, None
+
+
+@lru_cache(maxsize=4096)
+def plan_question(question: str) -> Optional[Plan]:
+    """Plan for `question`, or None if it is not a plain aggregate question."""
+    q = question.strip().lower()
+    route = route_question(question)
+    if route.date or route.greeting or route.has("cross_user", "anomaly", "segment", "summary"):
+        return None
+
+    if _DELTA.search(q):
+        if len(route.months) > 1:
+            return None
+        last = route.months[0] if route.months else None
+        return Plan("month_delta", None, last)
+
+    if _NOT_AGGREGATE.search(q) or route.has("compare"):
+        return None
+    span = _span(q, route.months)
+    if span is None:
+        return None
+    first, last = span
+
+    item = item_phrase(question)
+    if item:
+        return Plan("spend_item", first, last, item=item)
+    named = ITEM_QUESTION.search(q)
+    if named and not re.search(r"\w", named.group(1)):
+        return None  # "spend on $$$": no searchable item, leave it to retrieval
+
+    top = _TOP_CATEGORIES.search(q)
+    if top:
+        count, plural = top.groups()
+        if count:
+            n = _NUMBER_WORDS.get(count) or int(count)
+        else:
+            n = 3 if plural == "ies" else 1
+        return Plan("top_categories", first, last, n=max(1, min(n, 20)))
+
+    if _SAVINGS.search(q):
+        return Plan("savings", first, last)
+    if _INCOME.search(q):
+        return Plan("income", first, last)
+    if _SPEND_TOTAL.search(q):
+        return Plan("spend_total", first, last)
+    return None
+
+
+# =======================
+# Plan shape -> SQL
+# =======================
+
+# one row: the requested month range, with NULL bounds replaced by the
+# user's latest month (an index seek on the monthly_rollups primary key)
+_SPAN = """
+WITH latest AS (SELECT MAX(month_key) AS k FROM monthly_rollups WHERE user_id = :uid),
+span AS (SELECT COALESCE(:k0, k) AS k0, COALESCE(:k1, k) AS k1 FROM latest)
+"""
+
+_TOTALS = _SPAN + """
+SELECT s.k0, s.k1, c.type, COALESCE(SUM(r.total_amount), 0), COALESCE(SUM(r.tx_count), 0)
+FROM span s
+LEFT JOIN monthly_rollups r ON r.user_id = :uid AND r.month_key BETWEEN s.k0 AND s.k1
+LEFT JOIN categories c ON c.id = r.category_id
+GROUP BY c.type
+"""
+
+_TOP = _SPAN + """
+SELECT s.k0, s.k1, c.name, SUM(r.total_amount) AS total
+FROM span s
+LEFT JOIN monthly_rollups r ON r.user_id = :uid AND r.month_key BETWEEN s.k0 AND s.k1
+LEFT JOIN categories c ON c.id = r.category_id AND c.type = 'expense'
+GROUP BY c.id
+ORDER BY c.id IS NULL, total DESC
+LIMIT :n
+"""
+
+# the month before k1 (yyyymm arithmetic: 202601 -> 202512)
+_DELTA_SQL = """
+WITH latest AS (SELECT MAX(month_key) AS k FROM monthly_rollups WHERE user_id = :uid),
+cur AS (SELECT COALESCE(:k1, k) AS k1 FROM latest),
+span AS (SELECT CASE WHEN k1 % 100 = 1 THEN k1 - 89 ELSE k1 - 1 END AS k0, k1 FROM cur)
+SELECT s.k0, s.k1, c.name,
+       COALESCE(SUM(CASE WHEN r.month_key = s.k0 THEN r.total_amount END), 0),
+       COALESCE(SUM(CASE WHEN r.month_key = s.k1 THEN r.total_amount END), 0)
+FROM span s
+LEFT JOIN monthly_rollups r ON r.user_id = :uid AND r.month_key IN (s.k0, s.k1)
+LEFT JOIN categories c ON c.id = r.category_id AND c.type = 'expense'
+GROUP BY c.id
+"""
+
+# a category of that name wins; otherwise the descriptions that match
+_ITEM_CATEGORY = _SPAN + """
+SELECT 'category', s.k0, s.k1, MAX(c.name), COALESCE(SUM(r.tx_count), 0), COALESCE(SUM(r.total_amount), 0)
+FROM span s
+LEFT JOIN categories c ON c.user_id = :uid AND lower(c.name) = :item
+LEFT JOIN monthly_rollups r
+       ON r.user_id = :uid AND r.category_id = c.id AND r.month_key BETWEEN s.k0 AND s.k1
+UNION ALL
+"""
+
+_ITEM_FTS = _ITEM_CATEGORY + f"""
+SELECT 'description', NULL, NULL, NULL, COUNT(t.id), COALESCE(SUM(t.amount), 0)
+FROM {FTS_TABLE} f
+JOIN transactions t ON t.id = f.rowid
+JOIN span s ON t.month_key BETWEEN s.k0 AND s.k1
+WHERE {FTS_TABLE} MATCH :match AND t.user_id = :uid
+"""
+
+
+@lru_cache(maxsize=64)
+def _statement(kind: str, backend: str = "", n_words: int = 0):
+    """Compiled SQL for a plan shape; SQLAlchemy reuses it across calls."""
+    if kind in ("spend_total", "income", "savings"):
+        return text(_TOTALS)
+    if kind == "top_categories":
+        return text(_TOP)
+    if kind == "month_delta":
+        return text(_DELTA_SQL)
+    if backend == "fts":
+        return text(_ITEM_FTS)
+    # no FTS5: every word of the item as a LIKE filter
+    likes = "".join(f" AND lower(t.description) LIKE :w{i}" for i in range(n_words))
+    return text(
+        _ITEM_CATEGORY
+        + "SELECT 'description', NULL, NULL, NULL, COUNT(t.id), COALESCE(SUM(t.amount), 0) "
+        "FROM transactions t JOIN span s ON t.month_key BETWEEN s.k0 AND s.k1 "
+        f"WHERE t.user_id = :uid{likes}"
+    )
+
+
+def _month(key: Optional[int]) -> str:
+    return f"{key // 100:04d}-{key % 100:02d}"
+
+
+def _period(k0: int, k1: int) -> str:
+    if k0 == k1:
+        return f"In {_month(k1)}"
+    if k0 == 0:
+        return f"Up to {_month(k1)}"
+    return f"From {_month(k0)} to {_month(k1)}"
+
+
+def execute_plan(db: Session, user_id: int, plan: Plan) -> Optional[Dict]:
+    """
+    Run `plan` for `user_id` as one query.
+
+    Returns {"kind", "first", "last", ...figures}, or None if the user has
+    no data or (spend_item) nothing matches the item.
+    """
+    first, last = plan.first, plan.last
+    if first == THIS_YEAR:
+        year = date.today().year
+        first, last = f"{year}-01", f"{year}-12"
+    params = {
+        "uid": user_id,
+        "k0": models.month_key(first) if first else None,
+        "k1": models.month_key(last) if last else None,
+    }
+    if first == "0000-00":
+        params["k0"] = 0
+
+    if plan.kind == "spend_item":
+        params["item"] = plan.item
+        words = re.findall(r"\w+", plan.item)
+        if not words:
+            return None  # nothing to search for ("spend on $$$")
+        if has_fts(db):
+            params["match"] = match_expression(plan.item)
+            stmt = _statement(plan.kind, "fts")
+        else:
+            params.update({f"w{i}": f"%{w}%" for i, w in enumerate(words)})
+            stmt = _statement(plan.kind, "like", len(words))
+        rows = {row[0]: row[1:] for row in db.execute(stmt, params).all()}
+        k0, k1, category, cat_count, cat_total = rows["category"]
+        count, total = rows["description"][3:]
+        if k1 is None:
+            return None
+        out = {"kind": plan.kind, "first": k0, "last": k1, "item": plan.item}
+        if category is not None:
+            return {**out, "source": "category", "item": category, "count": int(cat_count), "total": float(cat_total)}
+        if not count:
+            return None
+        return {**out, "source": "description", "count": int(count), "total": float(total)}
+
+    if plan.kind == "top_categories":
+        params["n"] = plan.n
+        rows = db.execute(_statement(plan.kind), params).all()
+        if not rows or rows[0][1] is None:
+            return None
+        categories = [(name, float(total)) for _, _, name, total in rows if name is not None]
+        return {"kind": plan.kind, "first": rows[0][0], "last": rows[0][1], "categories": categories}
+
+    if plan.kind == "month_delta":
+        rows = db.execute(_statement(plan.kind), params).all()
+        if not rows or rows[0][1] is None:
+            return None
+        changes = [
+            (name, float(before), float(after)) for _, _, name, before, after in rows if name is not None
+        ]
+        return {"kind": plan.kind, "first": rows[0][0], "last": rows[0][1], "changes": changes}
+
+    rows = db.execute(_statement(plan.kind), params).all()
+    if not rows or rows[0][1] is None:
+        return None
+    totals = {"expense": 0.0, "income": 0.0}
+    counts = {"expense": 0, "income": 0}
+    for _, _, ctype, total, count in rows:
+        if ctype is not None:
+            totals[ctype] = float(total)
+            counts[ctype] = int(count)
+    return {
+        "kind": plan.kind,
+        "first": rows[0][0],
+        "last": rows[0][1],
+        "total_spent": abs(totals["expense"]),
+        "total_income": totals["income"],
+        "expense_count": counts["expense"],
+        "income_count": counts["income"],
+    }
+
+
+# =======================
+# Result -> answer text
+# =======================
+
+def _delta_text(result: Dict) -> str:
+    prev, cur = _month(result["first"]), _month(result["last"])
+    changes: List[Tuple[str, float, float]] = result["changes"]
+    before = sum(abs(b) for _, b, _ in changes)
+    after = sum(abs(a) for _, _, a in changes)
+    diff = after - before
+    pct = f" ({diff / before * 100:+.1f}%)" if before else ""
+    lines = [f"Your spending went from {before:.2f} in {prev} to {after:.2f} in {cur}, a change of {diff:+.2f}{pct}."]
+    moved = sorted(changes, key=lambda c: abs(abs(c[2]) - abs(c[1])), reverse=True)
+    moved = [(name, abs(a) - abs(b)) for name, b, a in moved[:3] if abs(a) != abs(b)]
+    if moved:
+        lines.append("Biggest changes: " + "; ".join(f"{name} {d:+.2f}" for name, d in moved) + ".")
+    return " ".join(lines)
+
+
+def render_answer(result: Dict) -> str:
+    kind = result["kind"]
+    if kind == "month_delta":
+        return _delta_text(result)
+
+    period = _period(result["first"], result["last"])
+    if kind == "spend_item":
+        if result["source"] == "category":
+            return (
+                f"{period}, you spent {abs(result['total']):.2f} on {result['item']} "
+                f"across {result['count']} transactions."
+            )
+        return (
+            f"{period}, your total spending on '{result['item']}' was {abs(result['total']):.2f} "
+            f"across {result['count']} transactions, based on the transaction descriptions."
+        )
+    if kind == "top_categories":
+        categories = result["categories"]
+        if not categories:
+            return f"{period}, there are no expense categories recorded."
+        if len(categories) == 1:
+            name, total = categories[0]
+            return f"{period}, your top spending category was {name} with {total:.2f}."
+        listed = "; ".join(f"{i}. {name}: {total:.2f}" for i, (name, total) in enumerate(categories, 1))
+        return f"{period}, your top {len(categories)} spending categories were {listed}."
+    if kind == "spend_total":
+        return f"{period}, you spent a total of {result['total_spent']:.2f}."
+    if kind == "income":
+        return f"{period}, your recorded income was {result['total_income']:.2f}."
+    net = result["total_income"] - result["total_spent"]
+    return (
+        f"{period}, your net savings (income minus expenses) were {net:.2f}. "
+        f"Income: {result['total_income']:.2f}, Expenses: {result['total_spent']:.2f}."
+    )
+
+
+def answer_with_plan(db: Session, user_id: int, question: str) -> Optional[Tuple[str, str]]:
+    """(answer, debug_info) straight from SQL, or None if the question needs retrieval/LLM."""
+    if not RAG_SQL_PLANNER:
+        return None
+    plan = plan_question(question)
+    if plan is None:
+        return None
+    result = execute_plan(db, user_id, plan)
+    if result is None:
+        return None
+    span = f"{_month(result['first'])}..{_month(result['last'])}"
+    return render_answer(result), f"sql_plan; plan={plan.kind}; months={span}"
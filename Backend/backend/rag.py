@@ -985,16 +985,35 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional, Tuple, Dict
+from typing import AsyncIterator, List, Optional, Tuple, Dict
 
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 import models
+import rollups
+from cache import ANSWER_CACHE_FALLBACK_TTL_SECONDS, answer_cache, data_version
+from db import SessionLocal
 from anomaly import explain_anomalous_date
 from cluster import build_spending_feature_vector, cluster_user_profile_rule_based
+from llm_client import CircuitOpenError, chat_payload, ollama
+from prompt_budget import (
+    MIN_BLOCK_TOKENS,
+    RAG_PROMPT_TOKEN_BUDGET,
+    compact_related,
+    compact_transactions,
+    estimate_tokens,
+    question_terms,
+)
+from retrieval_index import RAG_RETRIEVAL_TOP_K, transaction_index
+from fulltext import search_transactions
+from intent_router import item_phrase, route_question
+from query_planner import answer_with_plan
 
 
 @dataclass
@@ -1007,6 +1026,28 @@ class RAGContext:
     summary_text: str
     top_categories: List[tuple]      # (category_name, total_amount)
     transactions: List[tuple]        # (date, amount, description, category_name)
+    # > 0: `transactions` are only the month's rows most relevant to the
+    # question, out of this many matching ones (0: the whole month)
+    month_matches: int = 0
+    # rows from any month relevant to the question (retrieval_index), same shape
+    related_transactions: List[tuple] = field(default_factory=list)
+    related_matches: int = 0
+    # {"item", "count", "total"} for "how much did I spend on X" in this month
+    item_spend: Optional[Dict] = None
+    # month totals behind numeric_summary (expenses as a positive amount)
+    total_spent: float = 0.0
+    total_income: float = 0.0
+
+
+@dataclass
+class PreparedAnswer:
+    """Result of the DB half of a question (prepare_answer)."""
+    question: str
+    answer: Optional[str]            # final answer, or None if the LLM is still needed
+    info: str
+    ctx: Optional[RAGContext] = None
+    prompt: Optional[str] = None
+    cache_key: Optional[tuple] = None
 
 
 # =======================
@@ -1018,17 +1059,8 @@ def _month_from_date_str(date_str: str) -> str:
     return date_str[:7]
 
 
-def _extract_months_from_question(question: str) -> List[str]:
-    import re
-    return re.findall(r"\d{4}-\d{2}", question)
-
-
 def _extract_full_date(question: str) -> Optional[str]:
-    import re
-    m = re.search(r"\d{4}-\d{2}-\d{2}", question)
-    if m:
-        return m.group(0)
-    return None
+    return route_question(question).date
 
 
 def _get_latest_month_for_user(db: Session, user_id: int) -> Optional[str]:
@@ -1047,19 +1079,7 @@ def _is_cross_user_question(question: str) -> bool:
     Detect obvious attempts to ask about OTHER users / accounts.
     This is only a text-level guard; DB access is already filtered by user_id.
     """
-    q = question.lower()
-    bad_phrases = [
-        "other user",
-        "another user",
-        "someone else",
-        "other people",
-        "other account",
-        "other person",
-        "my friend's account",
-        "my friends account",
-        "friend’s account",
-    ]
-    return any(p in q for p in bad_phrases)
+    return route_question(question).has("cross_user")
 
 
 def _user_display_name(user: models.User | None, user_id: int) -> str:
@@ -1130,47 +1150,24 @@ def describe_segment_change(
 # Monthly summary
 # =======================
 
-def build_monthly_summary(db: Session, user_id: int, month: str) -> models.MonthlySummary:
+def compute_monthly_summary(db: Session, user_id: int, month: str) -> Dict:
     """
-    Compute numeric stats + a natural language summary for (user, month),
-    store/update in monthly_summaries, and return the row.
-    month must be 'YYYY-MM'.
-    """
-    total_spent = (
-        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .scalar()
-    )
+    Compute numeric stats + a natural language summary for (user, month)
+    without writing anything. month must be 'YYYY-MM'.
 
-    total_income = (
-        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "income")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .scalar()
-    )
+    All figures come from monthly_rollups (see rollups.py), so this costs
+    O(categories) rather than a scan of the month's transactions.
+
+    Returns {"total_spent", "total_income", "summary_text"}.
+    """
+    totals = rollups.month_totals_by_type(db, user_id, month)
+    total_spent = totals["expense"]
+    total_income = totals["income"]
 
     # Net savings (income minus absolute expenses)
     net_savings = float(total_income) - abs(float(total_spent))
 
-    top_categories = (
-        db.query(
-            models.Category.name,
-            func.sum(models.Transaction.amount).label("total"),
-        )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .group_by(models.Category.id, models.Category.name)
-        .order_by(func.sum(models.Transaction.amount).desc())
-        .limit(3)
-        .all()
-    )
+    top_categories = rollups.category_totals(db, user_id, month, "expense")[:3]
 
     if top_categories:
         top_cat_text_parts = [f"{name}: {total:.2f}" for name, total in top_categories]
@@ -1178,30 +1175,9 @@ def build_monthly_summary(db: Session, user_id: int, month: str) -> models.Month
     else:
         top_cat_text = "No spending categories recorded."
 
-    overspent_rows = (
-        db.query(
-            models.Category.name,
-            models.Budget.month,
-            models.Budget.amount.label("budget_amount"),
-            func.coalesce(func.sum(models.Transaction.amount), 0.0).label("actual_spent"),
-        )
-        .join(models.Category, models.Budget.category_id == models.Category.id)
-        .outerjoin(
-            models.Transaction,
-            (models.Transaction.user_id == models.Budget.user_id)
-            & (models.Transaction.category_id == models.Budget.category_id)
-            & (func.substr(models.Transaction.transaction_date, 1, 7) == models.Budget.month),
-        )
-        .filter(models.Budget.user_id == user_id)
-        .filter(models.Budget.month == month)
-        .group_by(
-            models.Category.name,
-            models.Budget.month,
-            models.Budget.amount,
-        )
-        .having(func.coalesce(func.sum(models.Transaction.amount), 0.0) > models.Budget.amount)
-        .all()
-    )
+    overspent_rows = [
+        row for row in rollups.budget_vs_actual(db, user_id, month) if row[3] > row[2]
+    ]
 
     if overspent_rows:
         over_text_parts = []
@@ -1223,6 +1199,27 @@ def build_monthly_summary(db: Session, user_id: int, month: str) -> models.Month
     ]
     summary_text = "\n".join(summary_lines)
 
+    return {
+        "total_spent": float(total_spent),
+        "total_income": float(total_income),
+        "summary_text": summary_text,
+    }
+
+
+def build_monthly_summary(db: Session, user_id: int, month: str) -> models.MonthlySummary:
+    """
+    Compute the summary for (user, month), store/update it in
+    monthly_summaries stamped with the user's current data_version, commit
+    and return the row.
+    """
+    # read the watermark before computing, so a row is never stamped with
+    # a version newer than the data it was built from
+    version = data_version(db, user_id)
+    data = compute_monthly_summary(db, user_id, month)
+    total_spent = data["total_spent"]
+    total_income = data["total_income"]
+    summary_text = data["summary_text"]
+
     existing = (
         db.query(models.MonthlySummary)
         .filter(
@@ -1239,6 +1236,7 @@ def build_monthly_summary(db: Session, user_id: int, month: str) -> models.Month
         existing.total_income = float(total_income)
         existing.summary_text = summary_text
         existing.created_at = now_str
+        existing.data_version = version if version is not None else -1
         summary = existing
     else:
         summary = models.MonthlySummary(
@@ -1248,6 +1246,7 @@ def build_monthly_summary(db: Session, user_id: int, month: str) -> models.Month
             total_income=float(total_income),
             summary_text=summary_text,
             created_at=now_str,
+            data_version=version if version is not None else -1,
         )
         db.add(summary)
 
@@ -1256,73 +1255,79 @@ def build_monthly_summary(db: Session, user_id: int, month: str) -> models.Month
     return summary
 
 
+# Persisted summaries are rebuilt off the request path, one at a time, so
+# /rag/ask never holds the SQLite write lock.
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary-refresh")
+_refresh_pending: set = set()
+_refresh_lock = threading.Lock()
+
+
+def _refresh_summary(user_id: int, month: str) -> None:
+    db = SessionLocal()
+    try:
+        build_monthly_summary(db, user_id, month)
+    except Exception as e:
+        # best effort: the next question recomputes in memory and retries
+        db.rollback()
+        print(f"[rag] summary refresh failed for user={user_id} month={month}: {e}")
+    finally:
+        db.close()
+        with _refresh_lock:
+            _refresh_pending.discard((user_id, month))
+
+
+def schedule_summary_refresh(user_id: int, month: str) -> None:
+    """Queue a background rebuild of the persisted summary (deduplicated)."""
+    key = (user_id, month)
+    with _refresh_lock:
+        if key in _refresh_pending:
+            return
+        _refresh_pending.add(key)
+    _refresh_executor.submit(_refresh_summary, user_id, month)
+
+
+def get_monthly_summary(db: Session, user_id: int, month: str) -> Tuple[Dict, str]:
+    """
+    Read-only summary lookup for retrieval.
+
+    Reuses the persisted row when its data_version matches the user's
+    current one. Otherwise computes the summary in memory (no write) and
+    queues a background refresh of the persisted row.
+
+    Returns (summary dict as in compute_monthly_summary, "fresh" | "stale" | "missing").
+    """
+    version = data_version(db, user_id)
+    row = (
+        db.query(models.MonthlySummary)
+        .filter(
+            models.MonthlySummary.user_id == user_id,
+            models.MonthlySummary.month == month,
+        )
+        .first()
+    )
+    if row is not None and version is not None and row.data_version == version:
+        return {
+            "total_spent": float(row.total_spent),
+            "total_income": float(row.total_income),
+            "summary_text": row.summary_text or "",
+        }, "fresh"
+
+    data = compute_monthly_summary(db, user_id, month)
+    schedule_summary_refresh(user_id, month)
+    return data, "stale" if row is not None else "missing"
+
+
 # =======================
 # Retrieval for RAG
 # =======================
 
 def _extract_months_from_question(question: str) -> List[str]:
     """
-    Extract month(s) from a natural-language question in a few formats:
-    - '2025-12'
-    - '12-2025'
-    - 'december 2025', 'Dec 2025', etc.
-
-    Always return normalized strings 'YYYY-MM'.
+    Month(s) named in a question, normalized to 'YYYY-MM', in order of
+    appearance: '2025-12', '12-2025', 'december 2025', 'Dec 2025', ...
     """
-    import re
-
-    q = question.lower()
-    months: List[str] = []
-
-    # 1) YYYY-MM (e.g., 2025-12)
-    for year, mm in re.findall(r"\b(\d{4})-(\d{2})\b", q):
-        value = f"{year}-{mm}"
-        if value not in months:
-            months.append(value)
-
-    # 2) MM-YYYY (e.g., 12-2025)  -> normalize to YYYY-MM
-    for mm, year in re.findall(r"\b(\d{2})-(\d{4})\b", q):
-        value = f"{year}-{mm}"
-        if value not in months:
-            months.append(value)
-
-    # 3) Month name + year (e.g., "december 2025", "Dec 2025")
-    month_map = {
-        "january": "01",
-        "jan": "01",
-        "february": "02",
-        "feb": "02",
-        "march": "03",
-        "mar": "03",
-        "april": "04",
-        "apr": "04",
-        "may": "05",
-        "june": "06",
-        "jun": "06",
-        "july": "07",
-        "jul": "07",
-        "august": "08",
-        "aug": "08",
-        "september": "09",
-        "sep": "09",
-        "sept": "09",
-        "october": "10",
-        "oct": "10",
-        "november": "11",
-        "nov": "11",
-        "december": "12",
-        "dec": "12",
-    }
-
-    for name, mm in month_map.items():
-        # e.g. "december 2025", "dec 2025"
-        pattern = rf"\b{name}\s+(\d{{4}})\b"
-        for year in re.findall(pattern, q):
-            value = f"{year}-{mm}"
-            if value not in months:
-                months.append(value)
+    return list(route_question(question).months)
 
-    return months
 
 def _extract_month_from_question(
     db: Session, user_id: int, question: str
@@ -1347,6 +1352,30 @@ def _extract_month_from_question(
     return None, "no month found and user has no data"
 
 
+def _item_spend(db: Session, user_id: int, question: str, month: str) -> Optional[Dict]:
+    """
+    Indexed (FTS5) count/total for the item a question asks about, in `month`.
+    The item is the phrase after "spend on ...", else the question's content
+    words if they match any description, but only for a spend question
+    ("total Pizza spend", "how much ... Uber") that is not one of the
+    rule-based totals (income, savings, top category, summary).
+    """
+    window = (f"{month}-01", f"{month}-31")
+    item = item_phrase(question)
+    if item:
+        result = search_transactions(db, user_id, item, *window, limit=1)
+        return {"item": item, "count": result["count"], "total": result["total"]}
+    route = route_question(question)
+    if not route.has("how_much", "spend") or route.has("income", "savings", "top", "category", "summary"):
+        return None
+    terms = question_terms(question)
+    if terms:
+        result = search_transactions(db, user_id, " ".join(terms), *window, limit=1)
+        if result["count"]:
+            return {"item": " ".join(terms), "count": result["count"], "total": result["total"]}
+    return None
+
+
 def retrieve_context(db: Session, user_id: int, question: str) -> Tuple[Optional[RAGContext], str]:
     month, month_note = _extract_month_from_question(db, user_id, question)
     if not month:
@@ -1356,41 +1385,49 @@ def retrieve_context(db: Session, user_id: int, question: str) -> Tuple[Optional
     if not user:
         return None, "user_not_found"
 
-    summary = build_monthly_summary(db, user_id, month)
+    summary, summary_state = get_monthly_summary(db, user_id, month)
 
-    top_rows = (
-        db.query(
-            models.Category.name,
-            func.sum(models.Transaction.amount).label("total"),
+    top_rows = rollups.category_totals(db, user_id, month, "expense")
+
+    # The month's rows: only the top-k about the question's items when its
+    # content words match anything this month. Otherwise every row, since
+    # general questions ("how did I do?") are about the month as a whole.
+    terms = question_terms(question)
+    tx_rows, month_matches = [], 0
+    if terms:
+        tx_rows, month_matches = transaction_index.search(
+            db, user_id, terms, RAG_RETRIEVAL_TOP_K, months=[month]
+        )
+        tx_rows.sort(key=lambda row: row[0])
+    if not tx_rows:
+        tx_rows = (
+            db.query(
+                models.Transaction.transaction_date,
+                models.Transaction.amount,
+                models.Transaction.description,
+                models.Category.name.label("category_name"),
+            )
+            .join(models.Category, models.Transaction.category_id == models.Category.id)
+            .filter(models.Transaction.user_id == user_id)
+            .filter(models.Transaction.month_key == models.month_key(month))
+            .order_by(models.Transaction.transaction_date.asc(), models.Transaction.id.asc())
+            .all()
         )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .group_by(models.Category.id, models.Category.name)
-        .order_by(func.sum(models.Transaction.amount).desc())
-        .all()
-    )
 
-    tx_rows = (
-        db.query(
-            models.Transaction.transaction_date,
-            models.Transaction.amount,
-            models.Transaction.description,
-            models.Category.name.label("category_name"),
+    # Rows about the question's items from other months (or from all the
+    # months it names), e.g. "how much did I spend on Uber this year?"
+    related, related_matches = [], 0
+    question_months = _extract_months_from_question(question)
+    if terms and len(question_months) != 1:
+        related, related_matches = transaction_index.search(
+            db, user_id, terms, RAG_RETRIEVAL_TOP_K, months=question_months or None
         )
-        .join(models.Category, models.Transaction.category_id == models.Category.id)
-        .filter(models.Transaction.user_id == user_id)
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
-        .order_by(models.Transaction.transaction_date.asc(), models.Transaction.id.asc())
-        .all()
-    )
 
-    net_savings = summary.total_income - abs(summary.total_spent)
+    net_savings = summary["total_income"] - abs(summary["total_spent"])
     numeric_summary = (
         f"User {user_id}, month {month}: "
-        f"total_spent={abs(summary.total_spent):.2f}, "
-        f"total_income={summary.total_income:.2f}, "
+        f"total_spent={abs(summary['total_spent']):.2f}, "
+        f"total_income={summary['total_income']:.2f}, "
         f"net_savings={net_savings:.2f}"
     )
 
@@ -1400,26 +1437,61 @@ def retrieve_context(db: Session, user_id: int, question: str) -> Tuple[Optional
         user_email=user.email if getattr(user, "email", None) else "",
         month=month,
         numeric_summary=numeric_summary,
-        summary_text=summary.summary_text or "",
+        summary_text=summary["summary_text"] or "",
         top_categories=top_rows,
         transactions=tx_rows,
+        month_matches=month_matches,
+        related_transactions=related,
+        related_matches=related_matches,
+        item_spend=_item_spend(db, user_id, question, month),
+        total_spent=abs(summary["total_spent"]),
+        total_income=summary["total_income"],
     )
-    return ctx, f"retrieval_ok; {month_note}"
+    return ctx, f"retrieval_ok; {month_note}; summary={summary_state}"
 
 
 # =======================
 # Prompt + Ollama call
 # =======================
 
-def build_prompt(question: str, ctx: RAGContext) -> str:
+def build_prompt(question: str, ctx: RAGContext, token_budget: Optional[int] = None) -> str:
+    """
+    Prompt for `question` that fits `token_budget` (default
+    RAG_PROMPT_TOKEN_BUDGET): the month's transactions (or the ones that
+    match the question, see retrieve_context) are compacted into per-item
+    totals by prompt_budget.compact_transactions.
+    """
+    budget = token_budget or RAG_PROMPT_TOKEN_BUDGET
+    related_block = ""
+    if ctx.related_transactions:
+        # placeholder so the section header is counted as fixed cost
+        related_block = " "
+    available = max(budget - estimate_tokens(render_prompt(question, ctx, "", related_block)), MIN_BLOCK_TOKENS)
+    if ctx.related_transactions:
+        related_block = compact_related(ctx.related_transactions, ctx.related_matches, available // 3)
+        available = max(available - estimate_tokens(related_block), MIN_BLOCK_TOKENS)
+    tx_block, _ = compact_transactions(question, ctx.transactions, available)
+    return render_prompt(question, ctx, tx_block, related_block)
+
+
+def render_prompt(question: str, ctx: RAGContext, tx_block: str, related_block: str = "") -> str:
+    related_section = ""
+    if related_block:
+        related_section = (
+            "\nTransactions related to the question from any month, grouped by item and month\n"
+            "(use these for questions about other months or several months):\n"
+            f"{related_block}\n"
+        )
+
     top_lines = [f"- {name}: {total:.2f}" for name, total in ctx.top_categories[:5]]
     top_block = "\n".join(top_lines) if top_lines else "No category breakdown available."
 
-    tx_lines = ["date | amount | description | category_name"]
-    for date, amount, desc, cat_name in ctx.transactions[:200]:
-        desc_safe = desc or ""
-        tx_lines.append(f"{date} | {amount:.2f} | {desc_safe} | {cat_name}")
-    tx_block = "\n".join(tx_lines) if len(tx_lines) > 1 else "No transactions for this month."
+    tx_scope = "Transactions for this user and month"
+    if ctx.month_matches:
+        tx_scope = (
+            "This month's transactions that best match the question "
+            f"({len(ctx.transactions)} of {ctx.month_matches} matching)"
+        )
 
     prompt = f"""
 You are **Rcube**, an AI expense assistant for a single user.
@@ -1441,9 +1513,10 @@ Natural-language summary:
 Top spending categories (category: total_amount):
 {top_block}
 
-All transactions for this user and month (each row is one transaction):
+{tx_scope}, grouped by item (each row sums all
+transactions with that description and category; total is the summed amount):
 {tx_block}
-
+{related_section}
 IMPORTANT BEHAVIOR RULES:
 - FIRST, read the user's question carefully.
 - If the question is about greetings or something very general (not directly
@@ -1458,8 +1531,9 @@ IMPORTANT BEHAVIOR RULES:
 
 Transaction hints:
 - The "description" column often contains item names like "Pizza", "Pasta", etc.
-- If the user asks about "Pizza", scan the transactions table and sum the amounts
-  of rows whose description contains the word "Pizza" (case-insensitive).
+- If the user asks about "Pizza", use the rows whose description contains the word
+  "Pizza" (case-insensitive): their count and total are already summed for you.
+  Add them up if there is more than one such row.
 
 Answering style:
 - Start your answer by addressing the user by name (e.g., "Hi {ctx.user_name}, ...").
@@ -1475,26 +1549,24 @@ User question:
 
 
 def call_ollama_chat(prompt: str, model: str = "llama3.2") -> str:
+    """
+    Blocking Ollama call for scripts. The API goes through the pooled async
+    client (llm_client.ollama); both share its circuit breaker.
+    """
     import requests
 
-    url = "http://localhost:11434/api/chat"
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "system",
-                "content": (
-                    "You are a precise, privacy-preserving budgeting assistant. "
-                    "Use only the provided context from the database."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-        "stream": False,
-    }
-
-    resp = requests.post(url, json=payload, timeout=120)
-    resp.raise_for_status()
+    ollama.breaker.acquire()
+    try:
+        resp = requests.post(
+            f"{ollama.base_url}/api/chat",
+            json=chat_payload(prompt, model, stream=False),
+            timeout=(ollama.connect_timeout_seconds, ollama.deadline_seconds),
+        )
+        resp.raise_for_status()
+    except requests.RequestException:
+        ollama.breaker.record_failure()
+        raise
+    ollama.breaker.record_success()
     data = resp.json()
 
     message = data.get("message", {})
@@ -1507,58 +1579,41 @@ def call_ollama_chat(prompt: str, model: str = "llama3.2") -> str:
 # =======================
 
 def generate_answer_rule_based(question: str, ctx: RAGContext) -> str:
-    q = question.lower()
-
-    # Simple keyword-based item totals
-    keywords = []
-    for word in ["pizza", "pasta", "coffee", "rent", "uber", "shopping"]:
-        if word in q:
-            keywords.append(word)
-
-    if keywords:
-        kw = keywords[0]
-        total_kw = 0.0
-        for date, amount, desc, cat_name in ctx.transactions:
-            if desc and kw in desc.lower():
-                total_kw += float(amount)
-        if total_kw > 0:
+    # Item totals ("how much did I spend on X"), from the full-text index
+    if ctx.item_spend:
+        item = ctx.item_spend["item"]
+        if ctx.item_spend["count"]:
             return (
-                f"In {ctx.month}, your total spending on '{kw}' was {total_kw:.2f}, "
-                f"based on the transaction descriptions."
-            )
-        else:
-            return (
-                f"In {ctx.month}, I did not find any transactions whose description "
-                f"contains '{kw}'."
+                f"In {ctx.month}, your total spending on '{item}' was {ctx.item_spend['total']:.2f} "
+                f"across {ctx.item_spend['count']} transactions, based on the transaction descriptions."
             )
+        return (
+            f"In {ctx.month}, I did not find any transactions whose description "
+            f"contains '{item}'."
+        )
+
+    route = route_question(question)
 
-    if "how much" in q and "spend" in q:
-        spent_part = ctx.numeric_summary.split("total_spent=")[1].split(",")[0]
-        return f"In {ctx.month}, you spent a total of {spent_part}."
+    if route.has("how_much") and route.has("spend"):
+        return f"In {ctx.month}, you spent a total of {ctx.total_spent:.2f}."
 
-    if "income" in q:
-        income_part = ctx.numeric_summary.split("total_income=")[1].split(",")[0]
-        return f"In {ctx.month}, your recorded income was {income_part}."
+    if route.has("income"):
+        return f"In {ctx.month}, your recorded income was {ctx.total_income:.2f}."
 
-    if "saving" in q or "savings" in q or "net" in q:
-        # numeric_summary contains net_savings=...
-        try:
-            net_part = ctx.numeric_summary.split("net_savings=")[1].split()[0]
-        except Exception:
-            net_part = "N/A"
+    if route.has("savings"):
+        net_savings = ctx.total_income - ctx.total_spent
         return (
-            f"In {ctx.month}, your net savings (income minus expenses) were {net_part}. "
-            f"Income: {ctx.numeric_summary.split('total_income=')[1].split(',')[0]}, "
-            f"Expenses: {ctx.numeric_summary.split('total_spent=')[1].split(',')[0]}."
+            f"In {ctx.month}, your net savings (income minus expenses) were {net_savings:.2f}. "
+            f"Income: {ctx.total_income:.2f}, Expenses: {ctx.total_spent:.2f}."
         )
 
-    if "top" in q and "category" in q:
+    if route.has("top") and route.has("category"):
         if not ctx.top_categories:
             return f"In {ctx.month}, there are no expense categories recorded."
         best_name, best_total = ctx.top_categories[0]
         return f"In {ctx.month}, your top spending category was {best_name} with {best_total:.2f}."
 
-    if "summary" in q or "overview" in q:
+    if route.has("summary"):
         return ctx.summary_text or f"No summary available for {ctx.month}."
 
     return (
@@ -1573,28 +1628,21 @@ def generate_answer_rule_based(question: str, ctx: RAGContext) -> str:
 # Public entrypoint for FastAPI
 # =======================
 
-def answer_question(db: Session, user_id: int, question: str) -> Tuple[str, str]:
+def answer_without_llm(db: Session, user_id: int, question: str) -> Optional[Tuple[str, str]]:
     """
-    Main RAG entrypoint called from FastAPI.
+    Questions answered straight from the database (greetings, privacy guard,
+    segments, anomaly explanations).
 
-    Returns: (answer, debug_info)
+    Returns (answer, debug_info), or None when the question needs the LLM.
     """
 
-    # Normalize the text once
-    q_stripped = question.strip()
-    q_lower = q_stripped.lower()
+    # Months, dates and intents in one pass over the question
+    route = route_question(question)
 
     # -----------------------------
     # 🟢 1) Handle simple greetings
     # -----------------------------
-    greeting_words = ["hi", "hii", "hiii", "hello", "hey", "hola", "namaste"]
-
-    is_simple_greeting = (
-        q_lower in greeting_words
-        or any(q_lower.startswith(w + " ") for w in greeting_words)
-    )
-
-    if is_simple_greeting:
+    if route.greeting:
         # We only need the user name for a nice greeting
         user = db.query(models.User).filter(models.User.id == user_id).first()
         name = _user_display_name(user, user_id)
@@ -1611,23 +1659,19 @@ def answer_question(db: Session, user_id: int, question: str) -> Tuple[str, str]
     # -----------------------------
     # 🔒 2) Privacy guard
     # -----------------------------
-    if _is_cross_user_question(question):
+    if route.has("cross_user"):
         msg = (
             "For privacy and security reasons, I can only show information for your own "
             "account, not other users."
         )
         return msg, "blocked_for_privacy"
 
-    # Reuse lowercased version for the rest
-    q_lower = q_stripped.lower()
-    months = _extract_months_from_question(question)
+    months = list(route.months)
 
     # -----------------------------
     # 🧠 3) Segment comparison: "compare 2025-12 and 2026-01"
     # -----------------------------
-    if len(months) >= 2 and (
-        "compare" in q_lower or "difference" in q_lower or "change" in q_lower
-    ):
+    if len(months) >= 2 and route.has("compare"):
         m1, m2 = months[0], months[1]
         explanation = describe_segment_change(db, user_id, m1, m2)
         return explanation, f"segment_compare; {m1}_vs_{m2}"
@@ -1635,15 +1679,15 @@ def answer_question(db: Session, user_id: int, question: str) -> Tuple[str, str]
     # -----------------------------
     # 🧠 4) Anomaly explanation: "why is 2025-12-03 anomalous?"
     # -----------------------------
-    date_str = _extract_full_date(question)
-    if date_str and ("why" in q_lower or "anomal" in q_lower or "spike" in q_lower or "unusual" in q_lower):
+    date_str = route.date
+    if date_str and route.has("anomaly"):
         explanation, dbg = explain_anomalous_date(db, user_id, date_str)
         return explanation, f"anomaly_explain; date={date_str}; {dbg}"
 
     # -----------------------------
     # 🧠 5) Single-month segment: "what is my segment in 2025-12?"
     # -----------------------------
-    if "cluster" in q_lower or "segment" in q_lower or "spending profile" in q_lower:
+    if route.has("segment"):
         if months:
             month = months[0]
         else:
@@ -1668,26 +1712,155 @@ def answer_question(db: Session, user_id: int, question: str) -> Tuple[str, str]
             f"segment_single; month={month}",
         )
 
+    return None
+
+
+# =======================
+# Answer cache
+# =======================
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the answer."""
+    q = re.sub(r"\s+", " ", question.strip().lower())
+    return q.rstrip("?!. ")
+
+
+def _answer_cache_key(db: Session, user_id: int, question: str) -> tuple:
+    # data_version changes on every write to the user's data, so cached
+    # answers (including "latest month" ones) never outlive the data behind them
+    months = tuple(_extract_months_from_question(question))
+    return (user_id, normalize_question(question), months, data_version(db, user_id))
+
+
+def _remember_answer(prep: PreparedAnswer, answer: str, debug: str, fallback: bool) -> None:
+    if prep.cache_key is None:
+        return
+    # a rule-based answer given because Ollama failed is only kept briefly,
+    # so the LLM answer takes over soon after Ollama recovers
+    ttl = ANSWER_CACHE_FALLBACK_TTL_SECONDS if fallback else None
+    answer_cache.put(prep.cache_key, (answer, debug), ttl_seconds=ttl)
+
+
+def prepare_answer(db: Session, user_id: int, question: str) -> PreparedAnswer:
+    """
+    All DB work for a question, before any LLM call: either a final answer
+    (direct, SQL plan, cached, or retrieval failed), or the retrieved context
+    and the prompt to send to the LLM.
+    """
+    direct = answer_without_llm(db, user_id, question)
+    if direct is not None:
+        return PreparedAnswer(question, direct[0], direct[1])
+
+    # Aggregates ("how much on X in 2025", "top 3 categories", "income")
+    # in one SQL query (query_planner), no retrieval or LLM needed
+    planned = answer_with_plan(db, user_id, question)
+    if planned is not None:
+        return PreparedAnswer(question, planned[0], planned[1])
+
+    key = _answer_cache_key(db, user_id, question)
+    hit, cached = answer_cache.get(key)
+    if hit:
+        answer, debug = cached
+        return PreparedAnswer(question, answer, f"{debug}; answer_cache=hit")
+
     # -----------------------------
     # 🧠 6) Default: full RAG + Ollama
     # -----------------------------
     ctx, info = retrieve_context(db, user_id, question)
     if not ctx:
-        return (
+        return PreparedAnswer(
+            question,
             "I could not find any transactions for you yet, so I cannot answer that question.",
             f"retrieval_failed; {info}",
         )
+    return PreparedAnswer(question, None, info, ctx, build_prompt(question, ctx), key)
+
+
+def _fallback_debug(info: str, error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return f"{info}; engine=rule_based; ollama=circuit_open"
+    return f"{info}; engine=rule_based; ollama_error={error}"
+
+
+async def complete_answer(prep: PreparedAnswer) -> Tuple[str, str]:
+    """
+    Finish what prepare_answer() started: ask Ollama through the shared
+    client, or fall back to the rule-based engine. No DB access.
+
+    Returns: (answer, debug_info)
+    """
+    if prep.answer is not None:
+        return prep.answer, prep.info
+    try:
+        answer = await ollama.chat(prep.prompt)
+        debug = f"{prep.info}; engine=ollama"
+        fallback = False
+    except Exception as e:
+        answer = generate_answer_rule_based(prep.question, prep.ctx)
+        debug = _fallback_debug(prep.info, e)
+        fallback = True
+    _remember_answer(prep, answer, debug, fallback)
+    return answer, debug
+
+
+def answer_question(db: Session, user_id: int, question: str) -> Tuple[str, str]:
+    """
+    Blocking RAG entrypoint for scripts (FastAPI uses prepare_answer +
+    complete_answer).
 
-    prompt = build_prompt(question, ctx)
+    Returns: (answer, debug_info)
+    """
+    prep = prepare_answer(db, user_id, question)
+    if prep.answer is not None:
+        return prep.answer, prep.info
 
     try:
-        answer = call_ollama_chat(prompt)
-        debug = f"{info}; engine=ollama"
+        answer = call_ollama_chat(prep.prompt)
         if not answer:
             raise RuntimeError("Empty answer from Ollama")
-        return answer, debug
+        debug = f"{prep.info}; engine=ollama"
+        fallback = False
     except Exception as e:
-        fallback = generate_answer_rule_based(question, ctx)
-        debug = f"{info}; engine=rule_based; ollama_error={e}"
-        return fallback, debug
+        answer = generate_answer_rule_based(question, prep.ctx)
+        debug = _fallback_debug(prep.info, e)
+        fallback = True
+    _remember_answer(prep, answer, debug, fallback)
+    return answer, debug
 
+
+async def stream_answer(prep: PreparedAnswer) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Streaming counterpart of answer_question, fed by prepare_answer().
+
+    Yields (event, data) pairs: one or more ("token", {"content"}) followed
+    by a single trailing ("debug", {"debug"}).
+    """
+    if prep.answer is not None:
+        yield "token", {"content": prep.answer}
+        yield "debug", {"debug": prep.info}
+        return
+
+    pieces: List[str] = []
+    error: Optional[Exception] = None
+    try:
+        async for piece in ollama.stream_chat(prep.prompt):
+            pieces.append(piece)
+            yield "token", {"content": piece}
+    except Exception as e:
+        error = e
+
+    if error is None and pieces:
+        debug = f"{prep.info}; engine=ollama"
+        _remember_answer(prep, "".join(pieces).strip(), debug, fallback=False)
+        yield "debug", {"debug": debug}
+    elif not pieces:
+        # nothing reached the client yet: fall back like answer_question does
+        if error is None:
+            error = RuntimeError("Empty answer from Ollama")
+        answer = generate_answer_rule_based(prep.question, prep.ctx)
+        debug = _fallback_debug(prep.info, error)
+        _remember_answer(prep, answer, debug, fallback=True)
+        yield "token", {"content": answer}
+        yield "debug", {"debug": debug}
+    else:
+        yield "debug", {"debug": f"{prep.info}; engine=ollama; stream_error={error}"}
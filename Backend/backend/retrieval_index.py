@@ -0,0 +1,153 @@
+"""
+In-process BM25 index over each user's transactions, for RAG row selection.
+
+retrieve_context() used to hand the model every transaction of one month.
+With this index it can also pull the rows most relevant to the question
+(by description and category words) from any month, so "how much did I
+spend on Uber this year?" has the data it needs while the prompt stays
+small.
+
+Each user's index is built from the DB on first use and then extended
+incrementally: transactions are append-only, so when the user's
+data_version has moved on, only rows with an id above the last indexed
+one are fetched and added. Writes from any process (API, CSV loader) are
+picked up this way. Indexes of the least recently used users are dropped
+beyond RETRIEVAL_INDEX_USERS (default 256). Pure Python, no dependencies.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+from cache import LRUCache, data_version
+
+RAG_RETRIEVAL_TOP_K = int(os.environ.get("RAG_RETRIEVAL_TOP_K", 200))
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words with a naive plural strip, so 'Pizzas' finds 'Pizza'."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class UserIndex:
+    """BM25 postings for one user's transactions."""
+
+    def __init__(self) -> None:
+        self.rows: List[tuple] = []          # (date, amount, description, category_name)
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.total_len = 0
+        self.last_id = 0
+        self.version: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def add(self, tx_id: int, row: tuple) -> None:
+        _, _, desc, cat_name = row
+        doc = len(self.rows)
+        counts = Counter(tokenize(desc) + tokenize(cat_name))
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[doc] = tf
+        self.rows.append(row)
+        self.doc_len.append(sum(counts.values()))
+        self.total_len += self.doc_len[-1]
+        self.last_id = max(self.last_id, tx_id)
+
+    def search(
+        self, terms: Sequence[str], k: int, months: Optional[Sequence[str]] = None
+    ) -> Tuple[List[tuple], int]:
+        """
+        Top-k rows by BM25 score (ties: most recent first), optionally only
+        from `months` (YYYY-MM). Returns (rows, number of matching rows).
+        """
+        n_docs = len(self.rows)
+        if not n_docs:
+            return [], 0
+        avg_len = self.total_len / n_docs
+        month_set = set(months or ())
+
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(" ".join(terms))):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc, tf in posting.items():
+                if month_set and self.rows[doc][0][:7] not in month_set:
+                    continue
+                norm = tf + K1 * (1 - B + B * self.doc_len[doc] / avg_len)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / norm
+
+        # best score first; among equal scores the most recent rows
+        ranked = sorted(scores, key=lambda d: (round(scores[d], 9), self.rows[d][0]), reverse=True)
+        return [self.rows[d] for d in ranked[:k]], len(ranked)
+
+
+class TransactionIndex:
+    def __init__(self, max_users: int = 256):
+        self._indexes = LRUCache(maxsize=max_users, ttl_seconds=float("inf"))
+        self._lock = threading.Lock()
+
+    def _user_index(self, user_id: int) -> UserIndex:
+        with self._lock:
+            hit, index = self._indexes.get(user_id)
+            if not hit:
+                index = UserIndex()
+                self._indexes.put(user_id, index)
+            return index
+
+    def refresh(self, db: Session, user_id: int) -> UserIndex:
+        """Index of `user_id`, with any transactions added since the last call."""
+        index = self._user_index(user_id)
+        version = data_version(db, user_id)
+        with index.lock:
+            if index.version != version or version is None:
+                new_rows = (
+                    db.query(
+                        models.Transaction.id,
+                        models.Transaction.transaction_date,
+                        models.Transaction.amount,
+                        models.Transaction.description,
+                        models.Category.name,
+                    )
+                    .join(models.Category, models.Transaction.category_id == models.Category.id)
+                    .filter(models.Transaction.user_id == user_id)
+                    .filter(models.Transaction.id > index.last_id)
+                    .order_by(models.Transaction.id.asc())
+                    .all()
+                )
+                for tx_id, date, amount, desc, cat_name in new_rows:
+                    index.add(tx_id, (date, float(amount), desc or "", cat_name or ""))
+                index.version = version
+        return index
+
+    def search(
+        self,
+        db: Session,
+        user_id: int,
+        terms: Sequence[str],
+        k: int = RAG_RETRIEVAL_TOP_K,
+        months: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[tuple], int]:
+        index = self.refresh(db, user_id)
+        with index.lock:
+            return index.search(terms, k, months)
+
+
+transaction_index = TransactionIndex(max_users=int(os.environ.get("RETRIEVAL_INDEX_USERS", 256)))
@@ -0,0 +1,320 @@
+"""
+Monthly and daily rollups of transactions.
+
+  - monthly_rollups: (user, month, category) -> sum, count, min, max
+  - daily_rollups:   (user, day, category)   -> sum, count
+
+Every code path that inserts transactions calls apply_transactions() in the
+same DB transaction, so both tables always match the raw rows. Dashboard
+and anomaly reads are then O(categories) / O(days x categories) instead of
+O(transactions).
+
+Maintenance:
+
+    python rollups.py verify    # report rollup rows that disagree with raw data
+    python rollups.py rebuild   # recompute both tables from transactions
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import models
+
+MONTHLY_AGGREGATE = """
+    SELECT user_id, month_key, category_id,
+           SUM(amount) AS total_amount,
+           COUNT(*) AS tx_count,
+           MIN(amount) AS min_amount,
+           MAX(amount) AS max_amount
+    FROM transactions
+    GROUP BY user_id, month_key, category_id
+"""
+
+DAILY_AGGREGATE = """
+    SELECT user_id, month_key, transaction_date, category_id,
+           SUM(amount) AS total_amount,
+           COUNT(*) AS tx_count
+    FROM transactions
+    GROUP BY user_id, month_key, transaction_date, category_id
+"""
+
+
+# =======================
+# Writes
+# =======================
+
+def _upsert(db: Session, table, keys: List[str], rows: List[Dict], set_builder) -> None:
+    if not rows:
+        return
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys],
+        set_=set_builder(table, stmt.excluded),
+    )
+    db.execute(stmt, rows)
+
+
+def apply_transactions(db: Session, rows: Iterable[Mapping]) -> None:
+    """
+    Fold newly inserted transactions into monthly_rollups and daily_rollups.
+
+    rows: mappings with user_id, category_id, amount and transaction_date.
+    Does not commit; the caller commits together with the transactions.
+    """
+    monthly: Dict[Tuple[int, int, int], Dict] = {}
+    daily: Dict[Tuple[int, str, int], Dict] = {}
+    for row in rows:
+        amount = float(row["amount"])
+        user_id = row["user_id"]
+        category_id = row["category_id"]
+        date_str = row["transaction_date"]
+        mkey = models.month_key(date_str)
+
+        agg = monthly.get((user_id, mkey, category_id))
+        if agg is None:
+            monthly[(user_id, mkey, category_id)] = {
+                "user_id": user_id,
+                "month_key": mkey,
+                "category_id": category_id,
+                "total_amount": amount,
+                "tx_count": 1,
+                "min_amount": amount,
+                "max_amount": amount,
+            }
+        else:
+            agg["total_amount"] += amount
+            agg["tx_count"] += 1
+            agg["min_amount"] = min(agg["min_amount"], amount)
+            agg["max_amount"] = max(agg["max_amount"], amount)
+
+        agg = daily.get((user_id, date_str, category_id))
+        if agg is None:
+            daily[(user_id, date_str, category_id)] = {
+                "user_id": user_id,
+                "month_key": mkey,
+                "transaction_date": date_str,
+                "category_id": category_id,
+                "total_amount": amount,
+                "tx_count": 1,
+            }
+        else:
+            agg["total_amount"] += amount
+            agg["tx_count"] += 1
+
+    _upsert(
+        db,
+        models.MonthlyRollup.__table__,
+        ["user_id", "month_key", "category_id"],
+        list(monthly.values()),
+        lambda t, excluded: {
+            "total_amount": t.c.total_amount + excluded.total_amount,
+            "tx_count": t.c.tx_count + excluded.tx_count,
+            "min_amount": func.min(t.c.min_amount, excluded.min_amount),
+            "max_amount": func.max(t.c.max_amount, excluded.max_amount),
+        },
+    )
+    _upsert(
+        db,
+        models.DailyRollup.__table__,
+        ["user_id", "month_key", "transaction_date", "category_id"],
+        list(daily.values()),
+        lambda t, excluded: {
+            "total_amount": t.c.total_amount + excluded.total_amount,
+            "tx_count": t.c.tx_count + excluded.tx_count,
+        },
+    )
+
+
+def rebuild(db: Session) -> Dict[str, int]:
+    """Recompute both rollup tables from raw transactions. Returns row counts."""
+    db.execute(text("DELETE FROM monthly_rollups"))
+    db.execute(
+        text(
+            "INSERT INTO monthly_rollups "
+            "(user_id, month_key, category_id, total_amount, tx_count, min_amount, max_amount) "
+            + MONTHLY_AGGREGATE
+        )
+    )
+    db.execute(text("DELETE FROM daily_rollups"))
+    db.execute(
+        text(
+            "INSERT INTO daily_rollups "
+            "(user_id, month_key, transaction_date, category_id, total_amount, tx_count) "
+            + DAILY_AGGREGATE
+        )
+    )
+    db.commit()
+    return {
+        "monthly_rollups": db.query(func.count()).select_from(models.MonthlyRollup).scalar(),
+        "daily_rollups": db.query(func.count()).select_from(models.DailyRollup).scalar(),
+    }
+
+
+def _mismatches(
+    db: Session,
+    table: str,
+    aggregate: str,
+    keys: Tuple[str, ...],
+    fields: Tuple[str, ...],
+    tolerance: float,
+) -> List[Dict]:
+    on = " AND ".join(f"r.{k} = a.{k}" for k in keys)
+    differs = " OR ".join(
+        f"abs(r.{f} - a.{f}) > :tol * max(1.0, abs(a.{f}))" for f in fields
+    )
+    key_cols = ", ".join(f"{{side}}.{k}" for k in keys)
+    a_cols = ", ".join(f"a.{f}" for f in fields)
+    r_cols = ", ".join(f"r.{f}" for f in fields)
+    nulls = ", ".join("NULL" for _ in fields)
+    rows = db.execute(
+        text(
+            f"""
+            SELECT {key_cols.format(side="a")}, {a_cols}, {r_cols}
+            FROM ({aggregate}) AS a
+            LEFT JOIN {table} AS r ON {on}
+            WHERE r.{keys[0]} IS NULL OR {differs}
+            UNION ALL
+            SELECT {key_cols.format(side="r")}, {nulls}, {r_cols}
+            FROM {table} AS r
+            LEFT JOIN ({aggregate}) AS a ON {on}
+            WHERE a.{keys[0]} IS NULL
+            """
+        ),
+        {"tol": tolerance},
+    ).all()
+
+    n_keys, n_fields = len(keys), len(fields)
+    return [
+        {
+            "table": table,
+            **dict(zip(keys, row[:n_keys])),
+            "raw": dict(zip(fields, row[n_keys:n_keys + n_fields])),
+            "rollup": dict(zip(fields, row[n_keys + n_fields:])),
+        }
+        for row in rows
+    ]
+
+
+def verify(db: Session, tolerance: float = 1e-6) -> List[Dict]:
+    """
+    Compare both rollup tables against a fresh aggregate of transactions.
+    Returns one dict per mismatching rollup key.
+    """
+    return _mismatches(
+        db,
+        "monthly_rollups",
+        MONTHLY_AGGREGATE,
+        ("user_id", "month_key", "category_id"),
+        ("total_amount", "tx_count", "min_amount", "max_amount"),
+        tolerance,
+    ) + _mismatches(
+        db,
+        "daily_rollups",
+        DAILY_AGGREGATE,
+        ("user_id", "month_key", "transaction_date", "category_id"),
+        ("total_amount", "tx_count"),
+        tolerance,
+    )
+
+
+# =======================
+# Reads
+# =======================
+
+def month_totals_by_type(db: Session, user_id: int, month: str) -> Dict[str, float]:
+    """{'expense': total, 'income': total} for one user and month."""
+    rows = (
+        db.query(
+            models.Category.type,
+            func.coalesce(func.sum(models.MonthlyRollup.total_amount), 0.0),
+        )
+        .join(models.Category, models.MonthlyRollup.category_id == models.Category.id)
+        .filter(models.MonthlyRollup.user_id == user_id)
+        .filter(models.MonthlyRollup.month_key == models.month_key(month))
+        .group_by(models.Category.type)
+        .all()
+    )
+    totals = {"expense": 0.0, "income": 0.0}
+    for ctype, total in rows:
+        totals[ctype] = float(total)
+    return totals
+
+
+def category_totals(
+    db: Session, user_id: int, month: str, category_type: str = "expense"
+) -> List[Tuple[str, float]]:
+    """[(category_name, total)] for one user and month, largest first."""
+    rows = (
+        db.query(
+            models.Category.name,
+            func.sum(models.MonthlyRollup.total_amount).label("total"),
+        )
+        .join(models.Category, models.MonthlyRollup.category_id == models.Category.id)
+        .filter(models.MonthlyRollup.user_id == user_id)
+        .filter(models.MonthlyRollup.month_key == models.month_key(month))
+        .filter(models.Category.type == category_type)
+        .group_by(models.Category.id, models.Category.name)
+        .order_by(func.sum(models.MonthlyRollup.total_amount).desc())
+        .all()
+    )
+    return [(name, float(total)) for name, total in rows]
+
+
+def budget_vs_actual(db: Session, user_id: int, month: str) -> List[Tuple[str, str, float, float]]:
+    """[(category_name, month, budget_amount, actual_spent)] for budgets in this month."""
+    rows = (
+        db.query(
+            models.Category.name,
+            models.Budget.month,
+            models.Budget.amount,
+            func.coalesce(func.sum(models.MonthlyRollup.total_amount), 0.0),
+        )
+        .join(models.Category, models.Budget.category_id == models.Category.id)
+        .outerjoin(
+            models.MonthlyRollup,
+            (models.MonthlyRollup.user_id == models.Budget.user_id)
+            & (models.MonthlyRollup.category_id == models.Budget.category_id)
+            & (models.MonthlyRollup.month_key == models.month_key(month)),
+        )
+        .filter(models.Budget.user_id == user_id)
+        .filter(models.Budget.month == month)
+        .group_by(models.Category.name, models.Budget.month, models.Budget.amount)
+        .all()
+    )
+    return [(name, m, float(budget), float(actual)) for name, m, budget, actual in rows]
+
+
+if __name__ == "__main__":
+    from db import SessionLocal, engine, Base
+    from migrate import run_migrations
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    session = SessionLocal()
+    try:
+        if command == "rebuild":
+            for table, count in rebuild(session).items():
+                print(f"Rebuilt {table}: {count} rows.")
+        elif command == "verify":
+            mismatches = verify(session)
+            if not mismatches:
+                print("monthly_rollups and daily_rollups match transactions.")
+            else:
+                print(f"{len(mismatches)} mismatching rollup rows, e.g.:")
+                for m in mismatches[:20]:
+                    print(f"  {m}")
+                print("Run `python rollups.py rebuild` to reconcile.")
+                sys.exit(1)
+        else:
+            print("usage: python rollups.py [verify|rebuild]")
+            sys.exit(2)
+    finally:
+        session.close()
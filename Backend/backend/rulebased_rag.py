@@ -7,6 +7,7 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 import models
+from query_planner import answer_with_plan
 
 
 def _month_from_date_str(date_str: str) -> str:
@@ -43,7 +44,7 @@ def build_monthly_summary(
         .join(models.Category, models.Transaction.category_id == models.Category.id)
         .filter(models.Transaction.user_id == user_id)
         .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
+        .filter(models.Transaction.month_key == models.month_key(month))
         .scalar()
     )
 
@@ -53,7 +54,7 @@ def build_monthly_summary(
         .join(models.Category, models.Transaction.category_id == models.Category.id)
         .filter(models.Transaction.user_id == user_id)
         .filter(models.Category.type == "income")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
+        .filter(models.Transaction.month_key == models.month_key(month))
         .scalar()
     )
 
@@ -69,7 +70,7 @@ def build_monthly_summary(
         .join(models.Category, models.Transaction.category_id == models.Category.id)
         .filter(models.Transaction.user_id == user_id)
         .filter(models.Category.type == "expense")
-        .filter(func.substr(models.Transaction.transaction_date, 1, 7) == month)
+        .filter(models.Transaction.month_key == models.month_key(month))
         .group_by(models.Category.id, models.Category.name)
         .order_by(func.sum(models.Transaction.amount).desc())
         .limit(3)
@@ -97,10 +98,7 @@ def build_monthly_summary(
             models.Transaction,
             (models.Transaction.user_id == models.Budget.user_id)
             & (models.Transaction.category_id == models.Budget.category_id)
-            & (
-                func.substr(models.Transaction.transaction_date, 1, 7)
-                == models.Budget.month
-            ),
+            & (models.Transaction.month_key == models.month_key(month)),
         )
         .filter(models.Budget.user_id == user_id)
         .filter(models.Budget.month == month)
@@ -196,6 +194,11 @@ def answer_question(db: Session, user_id: int, question: str) -> Tuple[str, str]
     - ensures monthly summary exists
     - returns text answer + debug info
     """
+    # Aggregate questions over any date range, in one SQL query
+    planned = answer_with_plan(db, user_id, question)
+    if planned is not None:
+        return planned
+
     q_lower = question.lower().strip()
 
     month, month_note = _extract_month_from_question(db, user_id, q_lower)
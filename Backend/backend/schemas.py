@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from typing import Literal, Optional
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
 
 # ---------- Users ----------
@@ -60,11 +60,34 @@ class TransactionCreate(BaseModel):
 
 class TransactionOut(TransactionBase):
     id: int
+    z_score: Optional[float] = None  # amount vs its category when written; None = too little history
 
     class Config:
         orm_mode = True
 
 
+class TransactionSearchOut(BaseModel):
+    query: str
+    count: int
+    total: float
+    transactions: list[TransactionOut]
+
+
+class TransactionBulkCreate(BaseModel):
+    transactions: list[TransactionCreate] = Field(..., max_length=50_000)
+
+
+class BulkRowError(BaseModel):
+    index: int  # position in the request's transactions list
+    error: str
+
+
+class TransactionBulkResult(BaseModel):
+    inserted: int
+    categories_created: int
+    errors: list[BulkRowError]
+
+
 # ---------- Budgets ----------
 
 class BudgetBase(BaseModel):
@@ -114,17 +137,24 @@ class QAResponse(BaseModel):
     debug: Optional[str] = None
 
 
+# ---------- Anomaly Detection (Step 7 extended) ----------
+
 class DailyAnomalyPoint(BaseModel):
     date: str
     total_amount: float
-    z_score: float
+    z_score: float  # the method's score (see anomaly_detectors.py)
     is_anomaly: bool
+    ewma: Optional[float] = None  # method="ewma" only
 
 
 class DetectDailyAnomaliesRequest(BaseModel):
     user_id: int
     month: str              # 'YYYY-MM'
     z_threshold: float = 2.0
+    # zscore (default), mad (median/MAD), iqr (Tukey fences), ewma (control chart)
+    method: Literal["zscore", "mad", "iqr", "ewma"] = "zscore"
+    # daily totals of this many months, ending at `month`, form the baseline
+    baseline_months: int = Field(1, ge=1, le=60)
 
 
 class DetectDailyAnomaliesResponse(BaseModel):
@@ -134,40 +164,44 @@ class DetectDailyAnomaliesResponse(BaseModel):
     std: float
     z_threshold: float
     points: list[DailyAnomalyPoint]
+    method: str = "zscore"
+    baseline_months: int = 1
+    baseline_days: Optional[int] = None
+    lower_limit: Optional[float] = None
+    upper_limit: Optional[float] = None
 
 
-# ---------- Anomaly Detection (Step 7 extended) ----------
+class DetectDailyAnomaliesByCategoryRequest(BaseModel):
+    user_id: int
+    month: str
+    category_name: str
+    z_threshold: float = 2.0
 
-class DailyAnomalyPoint(BaseModel):
-    date: str
-    total_amount: float
-    z_score: float
-    is_anomaly: bool
 
+# same response type as DetectDailyAnomaliesResponse
 
-class DetectDailyAnomaliesRequest(BaseModel):
+
+class DetectAllCategoriesRequest(BaseModel):
     user_id: int
-    month: str              # 'YYYY-MM'
+    month: str
     z_threshold: float = 2.0
+    top_k: Optional[int] = Field(None, ge=1, le=100)  # rank categories for the dashboard card
 
 
-class DetectDailyAnomaliesResponse(BaseModel):
-    user_id: int
-    month: str
+class CategoryDailyAnomalies(BaseModel):
     mean: float
     std: float
-    z_threshold: float
+    max_abs_z: float
+    anomaly_count: int
     points: list[DailyAnomalyPoint]
 
 
-class DetectDailyAnomaliesByCategoryRequest(BaseModel):
+class DetectAllCategoriesResponse(BaseModel):
     user_id: int
     month: str
-    category_name: str
-    z_threshold: float = 2.0
-
-
-# same response type as DetectDailyAnomaliesResponse
+    z_threshold: float
+    categories: dict[str, CategoryDailyAnomalies]  # keyed by category name
+    top: list[str]  # top_k names, largest |z| first; empty without top_k
 
 
 class TransactionAnomalyPoint(BaseModel):
@@ -195,6 +229,23 @@ class DetectTransactionAnomaliesResponse(BaseModel):
     points: list[TransactionAnomalyPoint]
 
 
+class AnomalyBaselineStats(BaseModel):
+    count: int
+    mean: float
+    std: float
+
+
+class AnomalyBaselineCategory(AnomalyBaselineStats):
+    category_id: int
+    category_name: Optional[str] = None
+
+
+class AnomalyBaselineOut(BaseModel):
+    user_id: int
+    daily: Optional[AnomalyBaselineStats] = None  # daily expense totals
+    categories: list[AnomalyBaselineCategory]  # transaction amounts per category
+
+
 class DailyPlotPoint(BaseModel):
     date: str
     total_amount: float
@@ -209,6 +260,23 @@ class DailyPlotSeriesResponse(BaseModel):
     lower_band: float
     points: list[DailyPlotPoint]
 
+
+class AnomalyReportRequest(BaseModel):
+    user_id: int
+    month: str  # 'YYYY-MM'
+    z_threshold: float = 2.0  # also the plot's band width in sigmas
+
+
+class AnomalyReportResponse(BaseModel):
+    user_id: int
+    month: str
+    z_threshold: float
+    daily: DetectDailyAnomaliesResponse
+    transactions: DetectTransactionAnomaliesResponse
+    by_category: dict[str, DetectDailyAnomaliesResponse]  # every category with spending
+    plot: DailyPlotSeriesResponse
+
+
 class ClusterRequest(BaseModel):
     user_id: int
     month: str
@@ -241,6 +309,61 @@ class GlobalClusterResponse(BaseModel):
     items: list[GlobalClusterItem]
 
 
+# ---------- Analytics (frontend dashboard) ----------
+
+class AnalyticsSummaryOut(BaseModel):
+    user_id: int
+    month: str
+    total_income: float
+    total_expense: float
+    net_savings: float
+
+
+class AnalyticsByCategoryOut(BaseModel):
+    category: str
+    total_expense: float
+
+
+class BudgetCompareOut(BaseModel):
+    category: str
+    month: str
+    budget: float
+    actual: float
+    difference: float  # actual - budget
+
+
+class CacheStatsOut(BaseModel):
+    size: int
+    maxsize: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    hit_ratio: float
+
+
+class LLMStatsOut(BaseModel):
+    base_url: str
+    breaker_state: str  # closed | open | half_open
+    consecutive_failures: int
+    times_opened: int
+    retry_in_seconds: float
+    max_in_flight: int
+    in_flight: int
+    queued: int
+    requests: int
+    successes: int
+    failures: int
+    timeouts: int
+    short_circuited: int
+    cancelled: int
+    queue_timeouts: int  # deadline hit while queued for a slot (not an Ollama failure)
+    rag_db_workers: int
+    rag_db_pending: int   # questions waiting for or running DB work
+    rag_db_rejected: int  # turned away with 503 (RAG_MAX_QUEUED)
+
+
 # class BudgetOut(BaseModel):
 #     id: int
 #     user_id: int
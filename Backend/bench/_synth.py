@@ -0,0 +1,172 @@
+"""
+Synthetic data shared by the benchmark scripts in this folder.
+
+Builds a throwaway SQLite file with the same schema as the app
+(models.Base.metadata) and fills it with random users, categories and
+transactions using plain sqlite3 executemany, which is much faster than
+going through the ORM for millions of rows. Rollup tables and
+anomaly_stats are filled from the raw rows at the end.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+CATEGORY_NAMES = [
+    ("Food", "expense"),
+    ("Travel", "expense"),
+    ("Rent", "expense"),
+    ("Shopping", "expense"),
+    ("Coffee", "expense"),
+    ("Utilities", "expense"),
+    ("Health", "expense"),
+    ("Salary", "income"),
+]
+
+DESCRIPTIONS = ["Pizza", "Pasta", "Uber", "Coffee", "Groceries", "Rent", "Movie", "Book"]
+
+
+def temp_db_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{name}.db")
+
+
+def use_bench_db(name: str) -> str:
+    """
+    Point the app at temp_db_path(name) and return that path. db.py reads
+    DATABASE_URL when it is first imported, so call this before importing
+    any app module (this module imports them only inside build_db).
+    """
+    path = temp_db_path(name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+def build_db(
+    path: str,
+    n_rows: int,
+    n_users: int,
+    months: list[str],
+    seed: int = 42,
+    batch: int = 200_000,
+) -> None:
+    """
+    (Re)create an SQLite file at `path` with n_users users, one set of
+    CATEGORY_NAMES per user and n_rows transactions spread over `months`.
+    """
+    import models
+    from anomaly_stats import AMOUNT_STATS_AGGREGATE, DAILY_STATS_AGGREGATE
+    from db import Base
+    from rollups import DAILY_AGGREGATE, MONTHLY_AGGREGATE
+
+    for stale in (path, path + "-wal", path + "-shm", path + "-journal"):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    now = "2025-01-01 00:00:00"
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((uid, f"user{uid}", f"user{uid}@example.com", "plain::x", now) for uid in range(1, n_users + 1)),
+    )
+
+    cat_ids: dict[int, list[tuple[int, str]]] = {}
+    next_id = 1
+    cat_rows = []
+    for uid in range(1, n_users + 1):
+        ids = []
+        for name, ctype in CATEGORY_NAMES:
+            cat_rows.append((next_id, uid, name, ctype, now))
+            ids.append((next_id, ctype))
+            next_id += 1
+        cat_ids[uid] = ids
+    conn.executemany(
+        "INSERT INTO categories (id, user_id, name, type, created_at) VALUES (?, ?, ?, ?, ?)",
+        cat_rows,
+    )
+
+    start = time.perf_counter()
+    inserted = 0
+    while inserted < n_rows:
+        chunk = []
+        for _ in range(min(batch, n_rows - inserted)):
+            uid = rnd.randint(1, n_users)
+            cat_id, ctype = rnd.choice(cat_ids[uid])
+            month = rnd.choice(months)
+            date = f"{month}-{rnd.randint(1, 28):02d}"
+            amount = round(rnd.uniform(1000, 3000) if ctype == "income" else rnd.expovariate(1 / 25), 2)
+            chunk.append(
+                (uid, cat_id, amount, date, models.month_key(date), rnd.choice(DESCRIPTIONS), now)
+            )
+        conn.executemany(
+            "INSERT INTO transactions "
+            "(user_id, category_id, amount, transaction_date, month_key, description, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            chunk,
+        )
+        inserted += len(chunk)
+        conn.commit()
+    conn.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions(user_id, transaction_date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_category
+        ON transactions(category_id);
+        """
+    )
+    conn.execute(
+        "INSERT INTO monthly_rollups "
+        "(user_id, month_key, category_id, total_amount, tx_count, min_amount, max_amount) "
+        + MONTHLY_AGGREGATE
+    )
+    conn.execute(
+        "INSERT INTO daily_rollups "
+        "(user_id, month_key, transaction_date, category_id, total_amount, tx_count) "
+        + DAILY_AGGREGATE
+    )
+    for aggregate in (AMOUNT_STATS_AGGREGATE, DAILY_STATS_AGGREGATE):
+        conn.execute(
+            "INSERT INTO anomaly_stats (user_id, kind, category_id, count, mean, m2) " + aggregate
+        )
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    print(f"built {path}: {n_rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+
+def months_range(first: str, count: int) -> list[str]:
+    year, month = (int(x) for x in first.split("-"))
+    out = []
+    for _ in range(count):
+        out.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return out
+
+
+def timed(fn, repeat: int) -> float:
+    """Run fn() `repeat` times and return mean seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
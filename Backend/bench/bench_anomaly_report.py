@@ -0,0 +1,100 @@
+"""
+Anomaly page: separate detector calls vs one build_anomaly_report.
+
+    python bench/bench_anomaly_report.py --rows 500000 --users 50
+
+Builds a synthetic DB and, for every user and month, produces what the
+anomaly page needs two ways: the separate functions behind
+/anomalies/daily, /anomalies/transactions, /anomalies/daily/plot and
+/anomalies/daily/by-category (once per expense category), and
+anomaly.build_anomaly_report, which fetches the month's expense rows once.
+Counts SQL statements and time per page (result cache not involved), and
+checks both produce the same numbers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from _synth import CATEGORY_NAMES, build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_anomaly_report")
+
+from sqlalchemy import event  # noqa: E402
+
+from anomaly import (  # noqa: E402
+    build_anomaly_report,
+    build_daily_plot_series,
+    detect_daily_anomalies,
+    detect_daily_anomalies_by_category,
+    detect_transaction_anomalies,
+)
+from db import SessionLocal, engine  # noqa: E402
+
+EXPENSE_CATEGORIES = [name for name, ctype in CATEGORY_NAMES if ctype == "expense"]
+
+
+def _separate(db, uid: int, month: str, z: float) -> dict:
+    return {
+        "daily": detect_daily_anomalies(db, uid, month, z),
+        "transactions": detect_transaction_anomalies(db, uid, month, z),
+        "plot": build_daily_plot_series(db, uid, month, z),
+        "by_category": {
+            name: detect_daily_anomalies_by_category(db, uid, month, name, z)
+            for name in EXPENSE_CATEGORIES
+        },
+    }
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return abs(a - b) <= 1e-6 * max(1.0, abs(a))
+    if isinstance(a, dict):
+        return all(_same(v, b.get(k)) for k, v in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--z", type=float, default=2.0)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    build_db(PATH, args.rows, args.users, months)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        statements[0] += 1
+
+    results = {}
+    mismatches = 0
+    with SessionLocal() as db:
+        for name, build in [("separate calls", _separate), ("build_anomaly_report", build_anomaly_report)]:
+            statements[0] = 0
+            pages = {}
+            start = time.perf_counter()
+            for uid in range(1, args.users + 1):
+                for month in months:
+                    pages[(uid, month)] = build(db, uid, month, args.z)
+            results[name] = (time.perf_counter() - start, statements[0], pages)
+
+        separate, report = results["separate calls"][2], results["build_anomaly_report"][2]
+        for key, page in separate.items():
+            page["by_category"] = {k: v for k, v in page["by_category"].items() if v["points"]}
+            mismatches += not _same(page, report[key])
+
+    pages = args.users * len(months)
+    print(f"{args.rows:,} transactions, {pages:,} pages (user x month); mismatched pages: {mismatches}")
+    for name, (seconds, count, _) in results.items():
+        print(f"{name:22}{seconds / pages * 1000:8.2f} ms/page{count / pages:8.1f} statements/page")
+
+
+if __name__ == "__main__":
+    main()
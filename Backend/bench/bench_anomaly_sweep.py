@@ -0,0 +1,71 @@
+"""
+Nightly anomaly sweep: detect_daily_anomalies per (user, month) vs anomaly_batch.
+
+    python bench/bench_anomaly_sweep.py --rows 2000000 --users 2000
+
+Builds a synthetic DB and scores every user's daily expense totals for
+all 12 months twice: the old way (one detect_daily_anomalies call, i.e.
+one query plus Python arithmetic, per user and month) and with
+anomaly_batch.sweep_daily_anomalies (one streaming query, NumPy segment
+reductions, flagged days written to the anomalies table). Checks both
+flag the same days and reports time, days scored per second and the
+sweep's peak Python memory (tracemalloc, measured on a second run), which
+depends on --chunk-rows rather than on --rows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+from _synth import build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_anomaly_sweep")
+
+import models  # noqa: E402
+from anomaly import detect_daily_anomalies  # noqa: E402
+from anomaly_batch import sweep_daily_anomalies  # noqa: E402
+from db import SessionLocal  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--z", type=float, default=2.0)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    build_db(PATH, args.rows, args.users, months)
+
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        legacy = set()
+        for uid in range(1, args.users + 1):
+            for month in months:
+                result = detect_daily_anomalies(db, uid, month, args.z)
+                legacy |= {(uid, p["date"]) for p in result["points"] if p["is_anomaly"]}
+        legacy_s = time.perf_counter() - start
+
+        stats = sweep_daily_anomalies(db, months[0], months[-1], args.z, chunk_rows=args.chunk_rows)
+
+        # second run only to measure memory (tracemalloc slows Python down a lot)
+        tracemalloc.start()
+        sweep_daily_anomalies(db, months[0], months[-1], args.z, chunk_rows=args.chunk_rows)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        swept = {(a.user_id, a.anomaly_date) for a in db.query(models.Anomaly.user_id, models.Anomaly.anomaly_date)}
+
+    pairs = args.users * len(months)
+    print(f"{args.rows:,} transactions, {stats['days']:,} user-days, {pairs:,} user-months")
+    print(f"{'per (user, month)':22}{legacy_s:9.2f} s{stats['days'] / legacy_s:14,.0f} days/s")
+    print(f"{'anomaly_batch sweep':22}{stats['seconds']:9.2f} s{stats['days'] / stats['seconds']:14,.0f} days/s"
+          f"   peak {peak / 2**20:.1f} MiB (chunk {args.chunk_rows:,})")
+    print(f"flagged: {len(legacy):,} vs {stats['flagged']:,}; same days: {legacy == swept}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Load test: API_MODE=sync vs API_MODE=async under many in-flight requests.
+
+    python bench/bench_async_api.py --concurrency 100 --requests 2000
+
+Starts a real uvicorn worker per mode on a synthetic DB and fires a mix of
+dashboard and anomaly requests (GET /analytics/summary, GET
+/analytics/by_category, POST /anomalies/daily) from an httpx AsyncClient,
+keeping --concurrency requests in flight. Reports throughput and latency
+percentiles per mode. Server-side failures (e.g. pool checkout timeouts
+once the sync threadpool is saturated) show up in the errors column.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from _synth import BACKEND_DIR, build_db, months_range, temp_db_path
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _start_server(mode: str, path: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", API_MODE=mode)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/users/1", timeout=1).raise_for_status()
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"uvicorn ({mode}) did not start")
+
+
+async def _load(port: int, args, months: list[str]) -> dict:
+    rnd = random.Random(3)
+    latencies: list[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+
+        async def one(i: int) -> None:
+            nonlocal errors
+            uid, month = rnd.randint(1, args.users), rnd.choice(months)
+            async with sem:
+                start = time.perf_counter()
+                kind = i % 3
+                try:
+                    if kind == 0:
+                        resp = await client.get("/analytics/summary", params={"user_id": uid, "month": month})
+                    elif kind == 1:
+                        resp = await client.get("/analytics/by_category", params={"user_id": uid, "month": month})
+                    else:
+                        resp = await client.post("/anomalies/daily", json={"user_id": uid, "month": month})
+                    ok = resp.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "req/s": args.requests / elapsed,
+        "p50 ms": _percentile(latencies, 0.50) * 1000,
+        "p99 ms": _percentile(latencies, 0.99) * 1000,
+        "max ms": max(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--modes", default="sync,async")
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    path = temp_db_path("bench_async_api")
+    build_db(path, args.rows, args.users, months)
+
+    results = {}
+    for mode in args.modes.split(","):
+        port = _free_port()
+        proc = _start_server(mode, path, port)
+        try:
+            results[mode] = asyncio.run(_load(port, args, months))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"{args.requests:,} requests, {args.concurrency} in flight")
+    print(f"{'':10}" + "".join(f"{mode:>12}" for mode in results))
+    for key in next(iter(results.values())):
+        print(f"{key:10}" + "".join(f"{r[key]:12,.1f}" for r in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Ingest throughput: POST /transactions/ per row vs POST /transactions/bulk.
+
+    python bench/bench_bulk_ingest.py --rows 20000
+
+Both paths go through the real FastAPI app (in-process TestClient) against
+a fresh SQLite file; the single-row path is timed on --single-rows rows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from _synth import build_db, use_bench_db
+
+_DB_PATH = use_bench_db("bench_bulk_ingest")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+import main  # noqa: E402
+import models  # noqa: E402
+from db import SessionLocal, engine  # noqa: E402
+
+
+def _rows(n: int, n_users: int, seed: int) -> list[dict]:
+    rnd = random.Random(seed)
+    names = ["Food", "Travel", "Coffee", "Books", "Gym", "Pets"]
+    return [
+        {
+            "user_id": rnd.randint(1, n_users),
+            "category_name": rnd.choice(names),
+            "amount": round(rnd.uniform(1, 80), 2),
+            "transaction_date": f"2025-12-{rnd.randint(1, 28):02d}",
+            "description": "bench",
+        }
+        for _ in range(n)
+    ]
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--single-rows", type=int, default=1_000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    engine.dispose()
+    build_db(_DB_PATH, 0, args.users, ["2025-12"])
+    client = TestClient(main.app)
+
+    single = _rows(args.single_rows, args.users, seed=1)
+    start = time.perf_counter()
+    for row in single:
+        client.post("/transactions/", json=row).raise_for_status()
+    t_single = time.perf_counter() - start
+
+    bulk = _rows(args.rows, args.users, seed=2)
+    start = time.perf_counter()
+    resp = client.post("/transactions/bulk", json={"transactions": bulk})
+    resp.raise_for_status()
+    t_bulk = time.perf_counter() - start
+    assert resp.json()["inserted"] == args.rows, resp.json()
+
+    with SessionLocal() as db:
+        total = db.query(func.count(models.Transaction.id)).scalar()
+    assert total == args.rows + args.single_rows
+
+    single_rate = args.single_rows / t_single
+    bulk_rate = args.rows / t_bulk
+    print(f"single-row POST /transactions/ : {single_rate:10,.0f} rows/s ({args.single_rows:,} rows)")
+    print(f"POST /transactions/bulk        : {bulk_rate:10,.0f} rows/s ({args.rows:,} rows)")
+    print(f"speedup                        : {bulk_rate / single_rate:10.1f}x")
+
+
+if __name__ == "__main__":
+    main_()
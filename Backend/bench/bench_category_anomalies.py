@@ -0,0 +1,87 @@
+"""
+Per-category daily anomalies: one request per category vs all at once.
+
+    python bench/bench_category_anomalies.py --rows 500000 --users 50
+
+Builds a synthetic DB and, for every user and month, scores every expense
+category's daily totals two ways: detect_daily_anomalies_by_category once
+per category (what a dashboard card had to do), and
+detect_daily_anomalies_all_categories (one grouped query, NumPy segment
+z-scores, top 3 categories ranked). Reports ms and SQL statements per
+user-month and checks the z-scores agree.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from _synth import CATEGORY_NAMES, build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_category_anomalies")
+
+from sqlalchemy import event  # noqa: E402
+
+from anomaly import (  # noqa: E402
+    detect_daily_anomalies_all_categories,
+    detect_daily_anomalies_by_category,
+)
+from db import SessionLocal, engine  # noqa: E402
+
+EXPENSE_CATEGORIES = [name for name, ctype in CATEGORY_NAMES if ctype == "expense"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--z", type=float, default=2.0)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    build_db(PATH, args.rows, args.users, months)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        statements[0] += 1
+
+    def per_category(db, uid, month):
+        return {
+            name: detect_daily_anomalies_by_category(db, uid, month, name, args.z)
+            for name in EXPENSE_CATEGORIES
+        }
+
+    def all_at_once(db, uid, month):
+        return detect_daily_anomalies_all_categories(db, uid, month, args.z, top_k=3)["categories"]
+
+    results = {}
+    with SessionLocal() as db:
+        for name, run in [("one call per category", per_category), ("all categories", all_at_once)]:
+            statements[0] = 0
+            out = {}
+            start = time.perf_counter()
+            for uid in range(1, args.users + 1):
+                for month in months:
+                    out[(uid, month)] = run(db, uid, month)
+            results[name] = (time.perf_counter() - start, statements[0], out)
+
+    mismatches = 0
+    separate, combined = results["one call per category"][2], results["all categories"][2]
+    for key, cats in separate.items():
+        for name, one in cats.items():
+            if not one["points"]:
+                continue
+            zs = [p["z_score"] for p in combined[key][name]["points"]]
+            mismatches += any(abs(a["z_score"] - b) > 1e-9 for a, b in zip(one["points"], zs))
+
+    pairs = args.users * len(months)
+    print(f"{args.rows:,} transactions, {pairs:,} user-months x {len(EXPENSE_CATEGORIES)} categories; "
+          f"mismatched series: {mismatches}")
+    for name, (seconds, count, _) in results.items():
+        print(f"{name:24}{seconds / pairs * 1000:8.2f} ms{count / pairs:8.1f} statements per user-month")
+
+
+if __name__ == "__main__":
+    main()
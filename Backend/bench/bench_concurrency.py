@@ -0,0 +1,153 @@
+"""
+Mixed read/write throughput: the old bare SQLite engine vs db.EngineProfile.
+
+    python bench/bench_concurrency.py --readers 16 --writers 4 --seconds 10
+
+Reader threads run the dashboard queries (rollup category totals plus a raw
+month scan of transactions); writer threads insert single transactions the
+way POST /transactions/ does, one commit each. Both profiles run against the
+same synthetic file, like uvicorn's threadpool would.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+
+from _synth import build_db, months_range, temp_db_path
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import ingest
+import models
+import rollups
+from db import EngineProfile, make_engine
+
+
+def _legacy_profile(url: str) -> EngineProfile:
+    """What `create_engine(url, check_same_thread=False)` gave us before."""
+    return EngineProfile(
+        url=url,
+        pool_size=5,
+        max_overflow=10,
+        journal_mode="DELETE",
+        synchronous="FULL",
+        busy_timeout_ms=5000,  # pysqlite's default timeout
+        cache_size_kb=2000,
+        mmap_size=0,
+        temp_store="DEFAULT",
+    )
+
+
+def _p99(samples: list[float]) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def _run(profile: EngineProfile, args, months: list[str]) -> dict:
+    engine = make_engine(profile)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "locked": 0, "read_lat": [], "write_lat": []}
+
+    def reader(seed: int) -> None:
+        rnd = random.Random(seed)
+        while not stop.is_set():
+            uid, month = rnd.randint(1, args.users), rnd.choice(months)
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    rollups.category_totals(db, uid, month)
+                    (
+                        db.query(func.count(models.Transaction.id), func.sum(models.Transaction.amount))
+                        .filter(models.Transaction.user_id == uid)
+                        .filter(models.Transaction.month_key == models.month_key(month))
+                        .one()
+                    )
+            except OperationalError:
+                with lock:
+                    stats["locked"] += 1
+                continue
+            with lock:
+                stats["reads"] += 1
+                stats["read_lat"].append(time.perf_counter() - start)
+
+    def writer(seed: int) -> None:
+        rnd = random.Random(seed)
+        cache = ingest.IngestCache()
+        while not stop.is_set():
+            month = rnd.choice(months)
+            row = {
+                "user_id": rnd.randint(1, args.users),
+                "category_name": "Food",
+                "amount": -round(rnd.uniform(1, 80), 2),
+                "transaction_date": f"{month}-{rnd.randint(1, 28):02d}",
+                "description": "bench",
+            }
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    ingest.insert_transactions(db, [row], cache=cache)
+                    db.commit()
+            except OperationalError:
+                with lock:
+                    stats["locked"] += 1
+                continue
+            with lock:
+                stats["writes"] += 1
+                stats["write_lat"].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    return {
+        "reads/s": stats["reads"] / args.seconds,
+        "writes/s": stats["writes"] / args.seconds,
+        "read p99 ms": _p99(stats["read_lat"]) * 1000,
+        "write p99 ms": _p99(stats["write_lat"]) * 1000,
+        "locked errors": stats["locked"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    results = {}
+    for name in ("legacy", "profile"):
+        path = temp_db_path(f"bench_concurrency_{name}")
+        build_db(path, args.rows, args.users, months)
+        url = f"sqlite:///{path}"
+        profile = _legacy_profile(url) if name == "legacy" else EngineProfile.from_env()
+        if name == "profile":
+            profile.url = url
+        results[name] = _run(profile, args, months)
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s each")
+    print(f"{'':16}{'legacy':>12}{'profile':>12}")
+    for key in results["legacy"]:
+        print(f"{key:16}{results['legacy'][key]:12,.1f}{results['profile'][key]:12,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Global clustering features: per-user loop vs one streamed grouped query.
+
+    python bench/bench_feature_matrix.py                   # 100k users
+    python bench/bench_feature_matrix.py --users 10000     # quicker run
+
+The per-user path (collect_all_user_features_for_month) is timed on a
+sample of users and extrapolated; running it for 100k users takes hours.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from _synth import build_db, temp_db_path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from cluster import build_feature_matrix, build_spending_feature_vector
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--tx-per-user", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing bench DB")
+    args = parser.parse_args()
+
+    month = "2025-12"
+    rows = args.users * args.tx_per_user
+    path = temp_db_path(f"bench_feature_matrix_{args.users}")
+    if not args.reuse:
+        build_db(path, rows, args.users, [month])
+
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as db:
+        start = time.perf_counter()
+        user_ids, X, names = build_feature_matrix(db, month)
+        t_matrix = time.perf_counter() - start
+
+        sample = user_ids[: args.sample].tolist()
+        start = time.perf_counter()
+        for uid in sample:
+            build_spending_feature_vector(db, uid, month)
+        t_loop = (time.perf_counter() - start) / max(len(sample), 1) * len(user_ids)
+
+    print(f"users={len(user_ids):,} rows={rows:,} matrix={X.shape} ({X.nbytes / 1e6:.1f} MB)")
+    print(f"per-user loop (extrapolated) : {t_loop:10.2f} s")
+    print(f"build_feature_matrix         : {t_matrix:10.2f} s")
+    print(f"speedup                      : {t_loop / t_matrix:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Per-question routing cost: the old regex/substring routing vs intent_router.
+
+    python bench/bench_intent_router.py --repeat 20
+
+Routes a corpus of realistic chat questions (greetings, item totals,
+month comparisons, anomaly "why" questions, segments, privacy probes)
+with a copy of the routing code rag.py used before intent_router, and
+with intent_router.route_question (its lru_cache cleared, so every call
+does the full scan). Also checks that both find the same months, date
+and intents for every question. No database needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from intent_router import INTENT_KEYWORDS, route_question  # noqa: E402
+
+TEMPLATES = [
+    "hi",
+    "Hello there",
+    "hey, what can you do?",
+    "How much did I spend in {ym}?",
+    "How much did I spend on pizza in {ym}?",
+    "how much did i spend on Uber in {name} {y}",
+    "What was my top category in {name} {y}?",
+    "what is my top category this month",
+    "Compare {ym} and {ym2}",
+    "What changed between {name} {y} and {name2} {y}?",
+    "What's the difference in my spending from {my} to {ym2}?",
+    "Why was {ym}-{d} flagged as an anomaly?",
+    "why did I have a spike on {ym}-{d}",
+    "Was there anything unusual on {ym}-{d}?",
+    "What is my spending segment in {ym}?",
+    "which cluster am I in",
+    "Show my spending profile for {name} {y}",
+    "What was my income in {ym}?",
+    "What are my net savings for {ym}?",
+    "Give me a summary of {name} {y}",
+    "overview please",
+    "How much did other users spend on coffee?",
+    "Show me my friend's account balance",
+    "Where can I save money next month?",
+    "Is my grocery spending going up since {ym}?",
+]
+NAMES = ["january", "Feb", "march", "Apr", "may", "June", "jul", "August", "sept", "October", "nov", "December"]
+
+
+def _legacy_months(question: str) -> list[str]:
+    """rag._extract_months_from_question before intent_router."""
+    q = question.lower()
+    months: list[str] = []
+    for year, mm in re.findall(r"\b(\d{4})-(\d{2})\b", q):
+        if f"{year}-{mm}" not in months:
+            months.append(f"{year}-{mm}")
+    for mm, year in re.findall(r"\b(\d{2})-(\d{4})\b", q):
+        if f"{year}-{mm}" not in months:
+            months.append(f"{year}-{mm}")
+    month_map = {
+        "january": "01", "jan": "01", "february": "02", "feb": "02", "march": "03", "mar": "03",
+        "april": "04", "apr": "04", "may": "05", "june": "06", "jun": "06", "july": "07",
+        "jul": "07", "august": "08", "aug": "08", "september": "09", "sep": "09", "sept": "09",
+        "october": "10", "oct": "10", "november": "11", "nov": "11", "december": "12", "dec": "12",
+    }
+    for name, mm in month_map.items():
+        for year in re.findall(rf"\b{name}\s+(\d{{4}})\b", q):
+            if f"{year}-{mm}" not in months:
+                months.append(f"{year}-{mm}")
+    return months
+
+
+def _legacy_route(question: str) -> tuple:
+    """Month/date extraction plus the keyword checks answer_question ran."""
+    q = question.strip().lower()
+    greeting_words = ["hi", "hii", "hiii", "hello", "hey", "hola", "namaste"]
+    greeting = q in greeting_words or any(q.startswith(w + " ") for w in greeting_words)
+    intents = set()
+    for intent, phrases in INTENT_KEYWORDS.items():
+        if any(p in q for p in phrases):
+            intents.add(intent)
+    months = _legacy_months(question)
+    m = re.search(r"\d{4}-\d{2}-\d{2}", question)
+    return set(months), (m.group(0) if m else None), intents, greeting
+
+
+def _corpus(n: int) -> list[str]:
+    rnd = random.Random(7)
+    out = []
+    for _ in range(n):
+        m1, m2 = rnd.randint(1, 12), rnd.randint(1, 12)
+        y = rnd.choice([2024, 2025, 2026])
+        out.append(
+            rnd.choice(TEMPLATES).format(
+                ym=f"{y}-{m1:02d}", ym2=f"{y}-{m2:02d}", my=f"{m1:02d}-{y}",
+                name=NAMES[m1 - 1], name2=NAMES[m2 - 1], y=y, d=f"{rnd.randint(1, 28):02d}",
+            )
+        )
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus = _corpus(args.questions)
+
+    mismatches = 0
+    for q in corpus:
+        route = route_question(q)
+        if _legacy_route(q) != (set(route.months), route.date, set(route.intents), route.greeting):
+            mismatches += 1
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for q in corpus:
+            _legacy_route(q)
+    legacy = (time.perf_counter() - start) / (args.repeat * len(corpus))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        route_question.cache_clear()
+        for q in corpus:
+            route_question(q)
+    router = (time.perf_counter() - start) / (args.repeat * len(corpus))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for q in corpus:
+            route_question(q)
+    cached = (time.perf_counter() - start) / (args.repeat * len(corpus))
+
+    print(f"{len(corpus):,} questions x {args.repeat}; routing disagreements: {mismatches}")
+    print(f"{'legacy regex + substring scans':34}{legacy * 1e6:10.1f} us/question")
+    print(f"{'intent_router (one pass)':34}{router * 1e6:10.1f} us/question")
+    print(f"{'intent_router (repeat question)':34}{cached * 1e6:10.1f} us/question")
+
+
+if __name__ == "__main__":
+    main()
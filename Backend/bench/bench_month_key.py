@@ -0,0 +1,80 @@
+"""
+Per-user monthly lookup: substr(transaction_date, 1, 7) vs stored month_key.
+
+    python bench/bench_month_key.py                 # 10M transactions
+    python bench/bench_month_key.py --rows 1000000  # quicker run
+
+Both variants run the same expense-total query the dashboard uses
+(/analytics/summary) for random (user, month) pairs on the same file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from _synth import build_db, months_range, temp_db_path, timed
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+import models
+
+
+def _total_expense(db: Session, user_id: int, month_filter) -> float:
+    return (
+        db.query(func.coalesce(func.sum(models.Transaction.amount), 0.0))
+        .join(models.Category, models.Transaction.category_id == models.Category.id)
+        .filter(models.Transaction.user_id == user_id)
+        .filter(models.Category.type == "expense")
+        .filter(month_filter)
+        .scalar()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing bench DB")
+    args = parser.parse_args()
+
+    path = temp_db_path(f"bench_month_key_{args.rows}")
+    months = months_range("2024-01", args.months)
+    if not args.reuse:
+        build_db(path, args.rows, args.users, months)
+
+    engine = create_engine(f"sqlite:///{path}")
+    rnd = random.Random(7)
+    pairs = [(rnd.randint(1, args.users), rnd.choice(months)) for _ in range(args.queries)]
+
+    with Session(engine) as db:
+        # correctness: both filters must agree
+        for uid, month in pairs[:20]:
+            a = _total_expense(db, uid, func.substr(models.Transaction.transaction_date, 1, 7) == month)
+            b = _total_expense(db, uid, models.Transaction.month_key == models.month_key(month))
+            assert abs(a - b) < 1e-6, (uid, month, a, b)
+
+        it = iter(pairs * 2)
+
+        def run_substr():
+            uid, month = next(it)
+            _total_expense(db, uid, func.substr(models.Transaction.transaction_date, 1, 7) == month)
+
+        def run_month_key():
+            uid, month = next(it)
+            _total_expense(db, uid, models.Transaction.month_key == models.month_key(month))
+
+        t_substr = timed(run_substr, args.queries)
+        t_key = timed(run_month_key, args.queries)
+
+    print(f"rows={args.rows:,} users={args.users:,} months={args.months} queries={args.queries}")
+    print(f"substr(transaction_date)  : {t_substr * 1000:8.3f} ms/query")
+    print(f"month_key index seek      : {t_key * 1000:8.3f} ms/query")
+    print(f"speedup                   : {t_substr / t_key:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Prompt size: raw 200-row transaction dump vs prompt_budget compaction.
+
+    python bench/bench_prompt_budget.py --rows 60000 --users 5
+    python bench/bench_prompt_budget.py --ollama-url http://localhost:11434
+
+Builds a synthetic DB with a few heavy users (~1,000 transactions a month
+each), retrieves the RAG context for a set of questions and renders the
+prompt both ways. Reports estimated prompt tokens, build time, how many
+of the month's transactions the prompt accounts for, and whether the
+Pizza total can be read off the prompt. With --ollama-url, each prompt is
+also sent to a real Ollama server and the answer latency is reported
+(prefill time grows with prompt length).
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from _synth import build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_prompt_budget")
+
+import httpx  # noqa: E402
+
+from db import SessionLocal  # noqa: E402
+from llm_client import chat_payload  # noqa: E402
+from prompt_budget import RAG_PROMPT_TOKEN_BUDGET, estimate_tokens  # noqa: E402
+from rag import build_prompt, render_prompt, retrieve_context  # noqa: E402
+
+QUESTIONS = [
+    "How much did I spend on Pizza in {month}?",
+    "What was my top category in {month}?",
+    "Where can I save money in {month}?",
+]
+
+
+def _legacy_block(ctx) -> str:
+    """build_prompt's transaction block before compaction: first 200 raw rows."""
+    lines = ["date | amount | description | category_name"]
+    for date, amount, desc, cat_name in ctx.transactions[:200]:
+        lines.append(f"{date} | {amount:.2f} | {desc or ''} | {cat_name}")
+    return "\n".join(lines)
+
+
+def _item_total_in_block(prompt: str, item: str) -> float:
+    """Sum of the `item` lines of a compacted block (description | category | count | total | dates)."""
+    total = 0.0
+    for line in prompt.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 5 and parts[0] == item:
+            total += float(parts[3])
+    return total
+
+
+def _ollama_latency(url: str, prompt: str) -> float:
+    start = time.perf_counter()
+    resp = httpx.post(f"{url}/api/chat", json=chat_payload(prompt, "llama3.2", stream=False), timeout=600)
+    resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=60_000)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=RAG_PROMPT_TOKEN_BUDGET)
+    parser.add_argument("--ollama-url", default=None)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    build_db(PATH, args.rows, args.users, months)
+    month = months[-1]
+
+    results = {"raw 200 rows": [], "compacted": []}
+    with SessionLocal() as db:
+        for uid in range(1, args.users + 1):
+            for template in QUESTIONS:
+                question = template.format(month=month)
+                ctx, _ = retrieve_context(db, uid, question)
+                n_tx = len(ctx.transactions)
+                pizza_total = sum(float(a) for _, a, d, _ in ctx.transactions if d == "Pizza")
+
+                start = time.perf_counter()
+                legacy = render_prompt(question, ctx, _legacy_block(ctx))
+                legacy_ms = (time.perf_counter() - start) * 1000
+                legacy_pizza = sum(float(a) for _, a, d, _ in ctx.transactions[:200] if d == "Pizza")
+
+                start = time.perf_counter()
+                compact = build_prompt(question, ctx, token_budget=args.budget)
+                compact_ms = (time.perf_counter() - start) * 1000
+
+                results["raw 200 rows"].append({
+                    "tokens": estimate_tokens(legacy),
+                    "build ms": legacy_ms,
+                    "tx covered %": 100 * min(n_tx, 200) / n_tx,
+                    "pizza exact": abs(legacy_pizza - pizza_total) < 0.005,
+                    "prompt": legacy,
+                })
+                results["compacted"].append({
+                    "tokens": estimate_tokens(compact),
+                    "build ms": compact_ms,
+                    "tx covered %": 100.0,  # every row is in a line or the "not shown" total
+                    "pizza exact": abs(_item_total_in_block(compact, "Pizza") - pizza_total) < 0.01,
+                    "prompt": compact,
+                })
+                if ctx.transactions and uid == 1 and template == QUESTIONS[0]:
+                    print(f"user 1, {month}: {n_tx} transactions; true Pizza total {pizza_total:.2f}")
+
+    print(f"{'':16}{'tokens p50':>12}{'tokens max':>12}{'build ms':>10}{'covered %':>11}{'pizza ok':>10}")
+    for name, rows in results.items():
+        tokens = [r["tokens"] for r in rows]
+        print(
+            f"{name:16}{statistics.median(tokens):12,.0f}{max(tokens):12,}"
+            f"{statistics.mean(r['build ms'] for r in rows):10.2f}"
+            f"{statistics.mean(r['tx covered %'] for r in rows):11.0f}"
+            f"{sum(r['pizza exact'] for r in rows[::len(QUESTIONS)]):>7}/{len(rows[::len(QUESTIONS)])}"
+        )
+
+    if args.ollama_url:
+        print(f"\nOllama answer latency ({args.ollama_url}):")
+        for name, rows in results.items():
+            lat = [_ollama_latency(args.ollama_url, r["prompt"]) for r in rows[: len(QUESTIONS)]]
+            print(f"{name:16}{statistics.median(lat) * 1000:12,.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
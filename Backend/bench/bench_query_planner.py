@@ -0,0 +1,92 @@
+"""
+Aggregate questions: retrieve_context + rule-based answer vs query_planner.
+
+    python bench/bench_query_planner.py --rows 60000 --users 5
+
+Builds a synthetic DB and answers the same aggregate questions (item
+spend, month totals, income, savings, top categories, month-over-month)
+two ways: the old path, which loads the month into a RAGContext and reads
+the figures back out of it, and query_planner.answer_with_plan (one SQL
+query per question). Reports ms/question and checks the item totals
+against a direct SUM over the month's matching transactions. The old path
+can only answer about one month, so ranges are not compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from _synth import build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_query_planner")
+
+from sqlalchemy import text  # noqa: E402
+
+from db import SessionLocal  # noqa: E402
+from query_planner import answer_with_plan, plan_question  # noqa: E402
+from rag import generate_answer_rule_based, retrieve_context  # noqa: E402
+
+QUESTIONS = [
+    "How much did I spend on Pizza in {month}?",
+    "How much did I spend in {month}?",
+    "What was my income in {month}?",
+    "What are my net savings for {month}?",
+    "What was my top category in {month}?",
+    "How did my spending change month over month in {month}?",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=60_000)
+    parser.add_argument("--users", type=int, default=5)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    build_db(PATH, args.rows, args.users, months)
+
+    timings = {"retrieve_context + rules": [], "query_planner": []}
+    mismatches = 0
+    with SessionLocal() as db:
+        for uid in range(1, args.users + 1):
+            for month in months:
+                for template in QUESTIONS:
+                    question = template.format(month=month)
+
+                    start = time.perf_counter()
+                    ctx, _ = retrieve_context(db, uid, question)
+                    generate_answer_rule_based(question, ctx)
+                    timings["retrieve_context + rules"].append(time.perf_counter() - start)
+
+                    plan_question.cache_clear()
+                    start = time.perf_counter()
+                    planned = answer_with_plan(db, uid, question)
+                    timings["query_planner"].append(time.perf_counter() - start)
+                    if planned is None:
+                        mismatches += 1
+                        continue
+
+                    if template == QUESTIONS[0]:
+                        true_total = db.execute(
+                            text(
+                                "SELECT COALESCE(SUM(amount), 0) FROM transactions "
+                                "WHERE user_id = :uid AND description = 'Pizza' "
+                                "AND substr(transaction_date, 1, 7) = :month"
+                            ),
+                            {"uid": uid, "month": month},
+                        ).scalar()
+                        if f"was {abs(true_total):.2f}" not in planned[0]:
+                            mismatches += 1
+
+    n = len(timings["query_planner"])
+    print(f"{args.users} users x {len(months)} months x {len(QUESTIONS)} questions = {n}; "
+          f"unanswered or wrong: {mismatches}")
+    for name, values in timings.items():
+        ms = sorted(v * 1000 for v in values)
+        print(f"{name:28}{statistics.median(ms):8.2f} ms p50{ms[int(len(ms) * 0.95)]:8.2f} ms p95")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Load test: CRUD/analytics latency with and without concurrent chat load.
+
+    python bench/bench_rag_load.py --chats 32 --seconds 10
+
+Runs fake_ollama.py in-process (slow first token, like a real model on a
+laptop) and a real uvicorn worker pointed at it, on a synthetic DB. A
+fixed stream of CRUD and dashboard requests (GET /transactions/,
+POST /transactions/, GET /analytics/summary) is measured twice: alone,
+and while --chats clients keep asking /rag/ask questions that need the
+LLM. With the RAG DB work on its own pool and the Ollama wait awaited,
+the CRUD percentiles should barely move. Chat answers, 503s from the
+RAG queue limit and errors are counted too.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from _synth import BACKEND_DIR, build_db, months_range, temp_db_path
+from fake_ollama import serve
+
+CHAT_QUESTIONS = [
+    "Where can I save money in {month}?",
+    "Why was my spending in {month} so different, and what should I change?",
+    "Give me three tips to cut costs based on {month}",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _start_server(path: str, port: int, ollama_url: str, mode: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", OLLAMA_BASE_URL=ollama_url, API_MODE=mode)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/users/1", timeout=1).raise_for_status()
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def _crud(client: httpx.AsyncClient, args, months: list[str], stop: float) -> dict:
+    rnd = random.Random(5)
+    latencies: list[float] = []
+    errors = 0
+    i = 0
+    while time.perf_counter() < stop:
+        uid, month = rnd.randint(1, args.users), rnd.choice(months)
+        start = time.perf_counter()
+        try:
+            if i % 3 == 0:
+                resp = await client.get("/transactions/", params={"user_id": uid})
+            elif i % 3 == 1:
+                resp = await client.post("/transactions/", json={
+                    "user_id": uid, "category_name": "Coffee", "amount": 12.5,
+                    "transaction_date": f"{month}-15", "description": "Coffee",
+                })
+            else:
+                resp = await client.get("/analytics/summary", params={"user_id": uid, "month": month})
+            ok = resp.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        errors += not ok
+        i += 1
+        await asyncio.sleep(1 / args.crud_rate)
+    return {
+        "requests": len(latencies),
+        "p50 ms": _percentile(latencies, 0.50) * 1000,
+        "p99 ms": _percentile(latencies, 0.99) * 1000,
+        "max ms": max(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+async def _chats(client: httpx.AsyncClient, args, months: list[str], stop: float, counts: dict) -> None:
+    async def one_client(c: int) -> None:
+        rnd = random.Random(c)
+        n = 0
+        while time.perf_counter() < stop:
+            # vary the question so the answer cache does not short-circuit it
+            question = rnd.choice(CHAT_QUESTIONS).format(month=rnd.choice(months)) + f" (#{c}-{n})"
+            n += 1
+            try:
+                resp = await client.post(
+                    "/rag/ask", json={"user_id": rnd.randint(1, args.users), "question": question}
+                )
+                key = {200: "answered", 503: "rejected"}.get(resp.status_code, "errors")
+            except httpx.HTTPError:
+                key = "errors"
+            counts[key] += 1
+
+    await asyncio.gather(*(one_client(c) for c in range(args.chats)))
+
+
+async def _run(port: int, args, months: list[str], with_chats: bool) -> dict:
+    limits = httpx.Limits(max_connections=args.chats + 10)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        stop = time.perf_counter() + args.seconds
+        counts = {"answered": 0, "rejected": 0, "errors": 0}
+        tasks = [_crud(client, args, months, stop)]
+        if with_chats:
+            tasks.append(_chats(client, args, months, stop, counts))
+        crud, *_ = await asyncio.gather(*tasks)
+        return {**crud, **{f"chat {k}": v for k, v in counts.items()}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--crud-rate", type=float, default=50, help="CRUD requests per second")
+    parser.add_argument("--first-token-ms", type=float, default=3000)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--mode", default="sync", help="API_MODE of the server")
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    path = temp_db_path("bench_rag_load")
+    build_db(path, args.rows, args.users, months)
+
+    ollama_port = _free_port()
+    fake = serve(ollama_port, args.first_token_ms, args.token_ms, 40)
+    port = _free_port()
+    proc = _start_server(path, port, f"http://127.0.0.1:{ollama_port}", args.mode)
+    try:
+        results = {
+            "CRUD alone": asyncio.run(_run(port, args, months, with_chats=False)),
+            f"+ {args.chats} chats": asyncio.run(_run(port, args, months, with_chats=True)),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+        fake.shutdown()
+
+    print(f"API_MODE={args.mode}; fake model first token {args.first_token_ms:.0f} ms; "
+          f"CRUD at {args.crud_rate:.0f} req/s for {args.seconds:.0f} s")
+    print(f"{'':16}" + "".join(f"{name:>16}" for name in results))
+    for key in results[f"+ {args.chats} chats"]:
+        print(f"{key:16}" + "".join(f"{r.get(key, 0):16,.1f}" for r in results.values()))
+
+
+if __name__ == "__main__":
+    main()
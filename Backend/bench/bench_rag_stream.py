@@ -0,0 +1,128 @@
+"""
+Chat latency: POST /rag/ask vs POST /rag/ask/stream, fully offline.
+
+    python bench/bench_rag_stream.py --first-token-ms 800 --token-ms 40
+
+Runs fake_ollama.py in-process and a real uvicorn worker pointed at it
+(OLLAMA_BASE_URL) on a synthetic DB. For each endpoint it reports the
+time until the client has something to show (whole body for /rag/ask,
+first `token` event for the stream) and the total time. A last round
+disconnects from the stream after the first token and checks that the
+fake server saw the request cancelled instead of generating to the end.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from _synth import BACKEND_DIR, build_db, months_range, temp_db_path
+from fake_ollama import serve
+
+QUESTION = "How much did I spend on Coffee in 2025-03 and where can I save?"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(path: str, port: int, ollama_url: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", OLLAMA_BASE_URL=ollama_url)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/users/1", timeout=1).raise_for_status()
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("uvicorn did not start")
+
+
+def _ask(client: httpx.Client) -> tuple[float, float]:
+    start = time.perf_counter()
+    resp = client.post("/rag/ask", json={"user_id": 1, "question": QUESTION})
+    resp.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def _ask_stream(client: httpx.Client, disconnect_after_first: bool = False) -> tuple[float, float]:
+    start = time.perf_counter()
+    first = None
+    event = None
+    with client.stream("POST", "/rag/ask/stream", json={"user_id": 1, "question": QUESTION}) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "token" and first is None:
+                first = time.perf_counter() - start
+                if disconnect_after_first:
+                    break
+            elif event == "done":
+                break
+    return first or 0.0, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--first-token-ms", type=float, default=800)
+    parser.add_argument("--token-ms", type=float, default=40)
+    parser.add_argument("--tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    path = temp_db_path("bench_rag_stream")
+    build_db(path, args.rows, args.users, months_range("2025-01", 12))
+
+    ollama_port = _free_port()
+    fake = serve(ollama_port, args.first_token_ms, args.token_ms, args.tokens)
+    port = _free_port()
+    proc = _start_server(path, port, f"http://127.0.0.1:{ollama_port}")
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            results = {
+                "/rag/ask": [_ask(client) for _ in range(args.rounds)],
+                "/rag/ask/stream": [_ask_stream(client) for _ in range(args.rounds)],
+            }
+
+            before = dict(fake.stats)
+            _ask_stream(client, disconnect_after_first=True)
+            time.sleep(args.token_ms * 5 / 1000 + 0.5)
+            after = dict(fake.stats)
+    finally:
+        proc.terminate()
+        proc.wait()
+        fake.shutdown()
+
+    print(f"fake model: first token {args.first_token_ms:.0f} ms, "
+          f"{args.tokens} tokens at {args.token_ms:.0f} ms, {args.rounds} rounds")
+    print(f"{'':18}{'first ms':>12}{'total ms':>12}")
+    for name, samples in results.items():
+        first = statistics.median(s[0] for s in samples) * 1000
+        total = statistics.median(s[1] for s in samples) * 1000
+        print(f"{name:18}{first:12,.0f}{total:12,.0f}")
+    cancelled = after["cancelled"] - before["cancelled"]
+    print(f"client disconnect after first token -> cancelled at model server: {'yes' if cancelled else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Daily anomaly detectors: one-month z-score vs robust trailing baselines.
+
+    python bench/bench_robust_detectors.py --rows 500000 --users 50 --baseline-months 24
+
+Builds a synthetic DB over 24 months and, for every user, scores the last
+month's daily expense totals with today's detector (mean/std of that
+month only) and with each method in anomaly_detectors (zscore, mad, iqr,
+ewma) over a --baseline-months trailing window. Reports ms per call and
+the share of days flagged. One huge day is added to every user's last
+month first, to show how much it inflates the one-month std it is judged
+against (its own z-score) compared with the robust baselines.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from _synth import build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_robust_detectors")
+
+import ingest  # noqa: E402
+from anomaly import detect_daily_anomalies  # noqa: E402
+from db import SessionLocal  # noqa: E402
+
+METHODS = ["zscore", "mad", "iqr", "ewma"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--baseline-months", type=int, default=24)
+    parser.add_argument("--z", type=float, default=3.0)
+    args = parser.parse_args()
+
+    months = months_range("2024-01", 24)
+    month = months[-1]
+    build_db(PATH, args.rows, args.users, months)
+
+    runs = [("one month (today)", "zscore", 1)] + [
+        (f"{m}, {args.baseline_months} months", m, args.baseline_months) for m in METHODS
+    ]
+    timings = {name: [] for name, _, _ in runs}
+    flagged = {name: 0 for name, _, _ in runs}
+    spike_z = {name: [] for name, _, _ in runs}
+    days = 0
+    with SessionLocal() as db:
+        ingest.insert_transactions(
+            db,
+            [
+                {"user_id": uid, "category_name": "Shopping", "amount": 5_000.0,
+                 "transaction_date": f"{month}-28", "description": "Spike"}
+                for uid in range(1, args.users + 1)
+            ],
+        )
+        db.commit()
+        for uid in range(1, args.users + 1):
+            for name, method, window in runs:
+                start = time.perf_counter()
+                result = detect_daily_anomalies(db, uid, month, args.z, method, window)
+                timings[name].append(time.perf_counter() - start)
+                flagged[name] += sum(p["is_anomaly"] for p in result["points"])
+                spike_z[name] += [p["z_score"] for p in result["points"] if p["date"] == f"{month}-28"]
+            days += len(result["points"])
+
+    print(f"{args.rows:,} transactions, {args.users} users, scoring {month} ({days:,} days), threshold {args.z}")
+    print(f"{'':26}{'ms p50':>9}{'flagged':>9}{'spike score':>13}")
+    for name, _, _ in runs:
+        ms = statistics.median(timings[name]) * 1000
+        print(f"{name:26}{ms:9.2f}{flagged[name] / days:9.1%}{statistics.median(spike_z[name]):13.1f}")
+
+
+if __name__ == "__main__":
+    main()
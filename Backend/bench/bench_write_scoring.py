@@ -0,0 +1,93 @@
+"""
+Anomaly score of a new transaction: at write time vs by rescanning.
+
+    python bench/bench_write_scoring.py --rows 500000 --users 50 --inserts 300
+
+Builds a synthetic DB and inserts --inserts transactions one at a time
+through ingest.insert_transactions (the POST /transactions/ work: rollups
+plus anomaly_stats, so each row comes back with its z-score). The old way
+to learn whether a new row was unusual was to run detect_transaction_anomalies
+over its month afterwards, which reads every transaction of the month; that
+is timed for the same rows. Finally the running statistics are checked
+against a direct aggregate over the transactions table.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from _synth import CATEGORY_NAMES, build_db, months_range, use_bench_db
+
+PATH = use_bench_db("bench_write_scoring")
+
+from sqlalchemy import text  # noqa: E402
+
+import ingest  # noqa: E402
+from anomaly import detect_transaction_anomalies  # noqa: E402
+from anomaly_stats import AMOUNT_STATS_AGGREGATE  # noqa: E402
+from db import SessionLocal  # noqa: E402
+
+
+def _ms(samples: list[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    return f"{statistics.median(ms):8.2f} ms p50{ms[int(len(ms) * 0.95)]:8.2f} ms p95"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--inserts", type=int, default=300)
+    args = parser.parse_args()
+
+    months = months_range("2025-01", 12)
+    build_db(PATH, args.rows, args.users, months)
+
+    rnd = random.Random(7)
+    write, rescan = [], []
+    with SessionLocal() as db:
+        cache = ingest.IngestCache()
+        for _ in range(args.inserts):
+            uid, month = rnd.randint(1, args.users), rnd.choice(months)
+            row = {
+                "user_id": uid,
+                "category_name": rnd.choice(CATEGORY_NAMES[:-1])[0],
+                "amount": round(rnd.uniform(1, 400), 2),
+                "transaction_date": f"{month}-{rnd.randint(1, 28):02d}",
+            }
+            start = time.perf_counter()
+            ingest.insert_transactions(db, [row], cache=cache)
+            db.commit()
+            write.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            detect_transaction_anomalies(db, uid, month)
+            rescan.append(time.perf_counter() - start)
+
+        unscored = db.execute(
+            text("SELECT COUNT(*) FROM transactions WHERE z_score IS NULL "
+                 "AND id > (SELECT MAX(id) FROM transactions) - :n"),
+            {"n": args.inserts},
+        ).scalar()
+        direct = {r[:3]: r[3:] for r in db.execute(text(AMOUNT_STATS_AGGREGATE))}
+        stored = {
+            r[:3]: r[3:]
+            for r in db.execute(text("SELECT user_id, kind, category_id, count, mean, m2 FROM anomaly_stats"))
+        }
+    drift = max(
+        abs(stored[key][1] - mean) + abs(stored[key][2] - m2) / max(count, 1)
+        for key, (count, mean, m2) in direct.items()
+    )
+    counts_ok = all(stored[key][0] == value[0] for key, value in direct.items())
+
+    print(f"{args.rows:,} transactions, {args.inserts} single-row inserts")
+    print(f"{'insert + write-time z':28}{_ms(write)}")
+    print(f"{'month rescan per insert':28}{_ms(rescan)}")
+    print(f"unscored new rows: {unscored}; counts match: {counts_ok}; max mean/M2 drift: {drift:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Minimal stand-in for the Ollama HTTP API, for offline latency tests.
+
+    python bench/fake_ollama.py --port 11434 --first-token-ms 800 --token-ms 40
+
+Serves POST /api/chat (streaming NDJSON or a single JSON body, like
+Ollama) with a canned answer, paced by --first-token-ms (time to the
+first chunk, i.e. prompt processing) and --token-ms (per chunk after
+that). GET /api/tags answers so health checks pass, and GET /_stats
+reports how many chat requests were completed or abandoned by the client
+mid-stream, which is how the benchmarks check that cancellation reaches
+the model server. Uses only the standard library.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "Based on your transactions this month, most of your spending went to "
+    "Food and Rent. Your coffee purchases added up to a noticeable share, "
+    "so setting a small weekly limit there would be the easiest saving."
+)
+
+
+class FakeOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, first_token_ms: float, token_ms: float, tokens: int):
+        super().__init__(address, _Handler)
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "cancelled": 0}
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def pieces(self) -> list[str]:
+        words = ANSWER.split(" ")
+        out = []
+        for i in range(self.tokens):
+            word = words[i % len(words)]
+            out.append(word if i == 0 else " " + word)
+        return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeOllama
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _json(self, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._json({"models": [{"name": "llama3.2"}]})
+        elif self.path == "/_stats":
+            with self.server.lock:
+                self._json(dict(self.server.stats))
+        else:
+            self.send_error(404)
+
+    def do_POST(self) -> None:
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        model = payload.get("model", "llama3.2")
+        self.server.count("requests")
+
+        srv = self.server
+        pieces = srv.pieces()
+        time.sleep(srv.first_token_ms / 1000)
+
+        if not payload.get("stream", True):
+            time.sleep(srv.token_ms * (len(pieces) - 1) / 1000)
+            self._json({"model": model, "message": {"role": "assistant", "content": "".join(pieces)}, "done": True})
+            srv.count("completed")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(srv.token_ms / 1000)
+                self._chunk({"model": model, "message": {"role": "assistant", "content": piece}, "done": False})
+            self._chunk({"model": model, "message": {"role": "assistant", "content": ""}, "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            srv.count("cancelled")
+            self.close_connection = True
+            return
+        srv.count("completed")
+
+    def _chunk(self, body: dict) -> None:
+        data = (json.dumps(body) + "\n").encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(port: int, first_token_ms: float, token_ms: float, tokens: int) -> FakeOllama:
+    """Start the fake server on a background thread and return it."""
+    server = FakeOllama(("127.0.0.1", port), first_token_ms, token_ms, tokens)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-ms", type=float, default=800)
+    parser.add_argument("--token-ms", type=float, default=40)
+    parser.add_argument("--tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    server = FakeOllama(("127.0.0.1", args.port), args.first_token_ms, args.token_ms, args.tokens)
+    print(f"fake ollama on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,7 @@ ORDER BY t.user_id, month;
 
 ------------------------------------------------
 -- Q2: Total expense per category for a user in a month
--- Replace :user_id and :month with real values, e.g. 1, '2025-12'
+-- Replace :user_id and :month_key with real values, e.g. 1, 202512
 ------------------------------------------------
 -- Relational Algebra version: RA2
 SELECT
@@ -33,7 +33,7 @@ FROM transactions t
 JOIN categories c ON t.category_id = c.id
 WHERE t.user_id = :user_id
   AND c.type = 'expense'
-  AND SUBSTR(t.transaction_date, 1, 7) = :month
+  AND t.month_key = :month_key
 GROUP BY c.id, c.name
 ORDER BY total_expense DESC;
 
@@ -48,7 +48,7 @@ FROM transactions t
 JOIN categories c ON t.category_id = c.id
 WHERE t.user_id = :user_id
   AND c.type = 'expense'
-  AND SUBSTR(t.transaction_date, 1, 7) = :month
+  AND t.month_key = :month_key
 GROUP BY c.id, c.name
 ORDER BY total_expense DESC
 LIMIT 3;
@@ -107,7 +107,7 @@ SELECT
         JOIN categories c2 ON t2.category_id = c2.id
         WHERE t2.user_id = :user_id
           AND c2.type = 'expense'
-          AND SUBSTR(t2.transaction_date, 1, 7) = :month
+          AND t2.month_key = :month_key
       ),
       2
     ) AS percent_share
@@ -115,7 +115,7 @@ FROM transactions t
 JOIN categories c ON t.category_id = c.id
 WHERE t.user_id = :user_id
   AND c.type = 'expense'
-  AND SUBSTR(t.transaction_date, 1, 7) = :month
+  AND t.month_key = :month_key
 GROUP BY c.id, c.name
 ORDER BY percent_share DESC;
 
@@ -135,7 +135,7 @@ FROM (
     JOIN categories c ON t.category_id = c.id
     WHERE t.user_id = :user_id
       AND c.type = 'expense'
-      AND SUBSTR(t.transaction_date, 1, 7) = :month
+      AND t.month_key = :month_key
     GROUP BY t.transaction_date
 ) AS per_day;
 
@@ -4,6 +4,11 @@ PRAGMA foreign_keys = ON;
 CREATE INDEX IF NOT EXISTS idx_transactions_user_date
 ON transactions(user_id, transaction_date);
 
+-- Index for per-user month filters (month_key = yyyymm of transaction_date).
+-- SUBSTR(transaction_date, 1, 7) = :month cannot use an index; month_key can.
+CREATE INDEX IF NOT EXISTS idx_transactions_user_month_cat
+ON transactions(user_id, month_key, category_id);
+
 -- Index to speed up category lookups for each user
 CREATE INDEX IF NOT EXISTS idx_categories_user
 ON categories(user_id);
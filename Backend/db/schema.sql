@@ -9,7 +9,8 @@ CREATE TABLE IF NOT EXISTS users (
     name          TEXT        NOT NULL,
     email         TEXT        NOT NULL UNIQUE,
     password_hash TEXT        NOT NULL,
-    created_at    TEXT        NOT NULL DEFAULT (datetime('now'))
+    created_at    TEXT        NOT NULL DEFAULT (datetime('now')),
+    data_version  INTEGER     NOT NULL DEFAULT 0  -- bumped on every write to the user's data
 );
 
 -- =========================
@@ -35,8 +36,10 @@ CREATE TABLE IF NOT EXISTS transactions (
     category_id      INTEGER     NOT NULL,
     amount           REAL        NOT NULL,      -- positive number
     transaction_date TEXT        NOT NULL,      -- ISO date string: YYYY-MM-DD
+    month_key        INTEGER     NOT NULL,      -- yyyymm of transaction_date, e.g. 202512
     description      TEXT,
     created_at       TEXT        NOT NULL DEFAULT (datetime('now')),
+    z_score          REAL,                      -- amount's z within its category at write time
     FOREIGN KEY (user_id)     REFERENCES users(id)      ON DELETE CASCADE,
     FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
 );
@@ -68,5 +71,119 @@ CREATE TABLE IF NOT EXISTS monthly_summaries (
     total_income  REAL        NOT NULL DEFAULT 0.0,
     summary_text  TEXT,
     created_at    TEXT        NOT NULL DEFAULT (datetime('now')),
+    data_version  INTEGER     NOT NULL DEFAULT -1,  -- users.data_version the summary was built from
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- =========================
+-- Table: monthly_rollups
+-- Per (user, month, category) aggregate of transactions,
+-- maintained on every transaction insert (backend/rollups.py)
+-- =========================
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id       INTEGER     NOT NULL,
+    month_key     INTEGER     NOT NULL,  -- yyyymm, e.g. 202512
+    category_id   INTEGER     NOT NULL,
+    total_amount  REAL        NOT NULL DEFAULT 0.0,
+    tx_count      INTEGER     NOT NULL DEFAULT 0,
+    min_amount    REAL        NOT NULL,
+    max_amount    REAL        NOT NULL,
+    PRIMARY KEY (user_id, month_key, category_id),
+    FOREIGN KEY (user_id)     REFERENCES users(id)      ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+-- =========================
+-- Table: daily_rollups
+-- Per (user, day, category) sum/count of transactions,
+-- maintained on every transaction insert (backend/rollups.py)
+-- =========================
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id          INTEGER     NOT NULL,
+    month_key        INTEGER     NOT NULL,  -- yyyymm, leads the date so a month is one range
+    transaction_date TEXT        NOT NULL,  -- YYYY-MM-DD
+    category_id      INTEGER     NOT NULL,
+    total_amount     REAL        NOT NULL DEFAULT 0.0,
+    tx_count         INTEGER     NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month_key, transaction_date, category_id),
+    FOREIGN KEY (user_id)     REFERENCES users(id)      ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+-- =========================
+-- Table: import_checkpoints
+-- Rows of a CSV export already committed by the chunked loader
+-- (backend/load_csv_demo_data.py), used to resume an interrupted import
+-- =========================
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    source      TEXT     PRIMARY KEY,   -- absolute path of the CSV file
+    rows_done   INTEGER  NOT NULL DEFAULT 0,
+    updated_at  TEXT     NOT NULL
+);
+
+-- =========================
+-- Table: anomalies
+-- Daily expense totals flagged by the batch sweep (backend/anomaly_batch.py),
+-- with the month mean/std they were scored against
+-- =========================
+CREATE TABLE IF NOT EXISTS anomalies (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id       INTEGER     NOT NULL,
+    detector      TEXT        NOT NULL,  -- e.g. 'daily_zscore'
+    month_key     INTEGER     NOT NULL,  -- yyyymm
+    anomaly_date  TEXT        NOT NULL,  -- YYYY-MM-DD
+    total_amount  REAL        NOT NULL,
+    mean          REAL        NOT NULL,
+    std           REAL        NOT NULL,
+    z_score       REAL        NOT NULL,
+    z_threshold   REAL        NOT NULL,
+    detected_at   TEXT        NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_anomalies_user_month ON anomalies(user_id, month_key);
+CREATE INDEX IF NOT EXISTS idx_anomalies_detector_month ON anomalies(detector, month_key);
+
+-- =========================
+-- Table: anomaly_stats
+-- Running count/mean/M2 (Welford) per user: transaction amounts per category
+-- ('amount') and daily expense totals ('daily_total', category_id 0),
+-- updated on every insert (backend/anomaly_stats.py)
+-- =========================
+CREATE TABLE IF NOT EXISTS anomaly_stats (
+    user_id      INTEGER     NOT NULL,
+    kind         TEXT        NOT NULL,  -- 'amount' or 'daily_total'
+    category_id  INTEGER     NOT NULL,  -- 0 for 'daily_total'
+    count        INTEGER     NOT NULL DEFAULT 0,
+    mean         REAL        NOT NULL DEFAULT 0,
+    m2           REAL        NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, kind, category_id),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+
+-- =========================
+-- Table: transactions_fts
+-- FTS5 full-text index over transactions.description (external content),
+-- kept in sync by triggers; used by GET /transactions/search (backend/fulltext.py)
+-- =========================
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+    description,
+    content = 'transactions',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+    INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description ON transactions BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+    INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+END;
@@ -0,0 +1,79 @@
+"""
+Circuit breaker recovery when the re-probe of Ollama never completes.
+
+    python -m pytest Backend/tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from llm_client import CircuitBreaker, CircuitOpenError, OllamaClient  # noqa: E402
+
+COOLDOWN = 0.3
+
+
+def _opened_breaker(**kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=COOLDOWN, **kwargs)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(COOLDOWN)
+    return breaker
+
+
+async def _silent_server():
+    """Accepts connections and never answers, like a wedged Ollama."""
+
+    async def handle(reader, writer):
+        await asyncio.sleep(3600)
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_cancelled_probe_reopens_and_reprobes_after_cooldown():
+    breaker = _opened_breaker()
+
+    async def run():
+        server, port = await _silent_server()
+        client = OllamaClient(
+            base_url=f"http://127.0.0.1:{port}",
+            connect_timeout_seconds=30,
+            breaker=breaker,
+        )
+        try:
+            probing = asyncio.create_task(client.chat("hi"))
+            await asyncio.sleep(0.1)  # the probe is waiting on the silent server
+            assert breaker.state == "half_open"
+            probing.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probing
+        finally:
+            await client.aclose()
+            server.close()
+
+    asyncio.run(run())
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()  # still cooling down
+    time.sleep(COOLDOWN)
+    assert breaker.acquire() == "probe"
+
+
+def test_lost_probe_expires_after_probe_timeout():
+    breaker = _opened_breaker(probe_timeout_seconds=COOLDOWN)
+    assert breaker.acquire() == "probe"  # this caller never reports back
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()  # one probe at a time
+    time.sleep(COOLDOWN)
+    assert breaker.acquire() == "probe"
@@ -73,14 +73,10 @@ export default function AnomaliesPage() {
     const fetchData = async () => {
       setLoading(true)
       try {
-        const [plotRes, dailyRes, txRes] = await Promise.all([
-          api.getDailyPlot(userId, month, zThreshold),
-          api.getDailyAnomalies(userId, month, zThreshold),
-          api.getTransactionAnomalies(userId, month, zThreshold),
-        ])
-        setPlotData(plotRes)
-        setDailyAnomalies(dailyRes)
-        setTransactionAnomalies(txRes)
+        const report = await api.getAnomalyReport(userId, month, zThreshold)
+        setPlotData(report.plot)
+        setDailyAnomalies(report.daily)
+        setTransactionAnomalies(report.transactions)
       } catch (error) {
         toast({
           title: "Error",
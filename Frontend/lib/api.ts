@@ -132,6 +132,17 @@ export const api = {
     return res.json()
   },
 
+  // Daily, transaction, per-category and plot data for the anomalies page in one request
+  async getAnomalyReport(userId: number, month: string, zThreshold = 2.0) {
+    const res = await fetch(`${API_BASE_URL}/anomalies/report`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ user_id: userId, month, z_threshold: zThreshold }),
+    })
+    if (!res.ok) throw new Error("Failed to fetch anomaly report")
+    return res.json()
+  },
+
   // ============ CLUSTERING / SPENDING PROFILE ============
 
   async getSegment(userId: number, month: string) {